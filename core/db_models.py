@@ -37,7 +37,7 @@ class COGSRun:
     validation_errors_count: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class InventoryMovement:
     """Records every inventory change for audit trail"""
     movement_id: str
@@ -53,7 +53,7 @@ class InventoryMovement:
     reference_id: Optional[str]  # Sale ID or other reference
 
 
-@dataclass
+@dataclass(slots=True)
 class InventorySnapshot:
     """Point-in-time snapshot of inventory state"""
     snapshot_id: str
@@ -225,7 +225,8 @@ async def upload_sales_enhanced(
     results = upload_pipeline.process_upload(
         file_path=file.filename,  # Save file first
         tenant_id=tenant_id,
-        filename=file.filename
+        filename=file.filename,
+        materialize='records'
     )
     
     if results['preview']['safe_to_import']:
@@ -8,12 +8,116 @@ Ensures that one bad SKU never stops processing of hundreds of good ones.
 import logging
 import json
 import csv
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 import os
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used when unavailable
+    orjson = None
+
+# Large write buffer for quarantine CSVs so big error batches flush in few syscalls
+CSV_WRITE_BUFFER_SIZE = 1 << 20
+
+# Machine-consumed reports are written without whitespace
+COMPACT_JSON_SEPARATORS = (',', ':')
+
+# Shared context for errors recorded without one; treat as read-only
+_EMPTY_CONTEXT: Dict[str, Any] = {}
+
+
+def _dumps(obj: Any, pretty: bool = False) -> str:
+    """Serialize to JSON text, preferring orjson when it is installed"""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS writes int/float/bool/None keys as json does ("1", "true", "null")
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode()
+    if pretty:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=COMPACT_JSON_SEPARATORS)
+
+
+def _has_only_str_keys(obj: Any) -> bool:
+    """Whether every dict nested in obj is keyed by strings only"""
+    if isinstance(obj, dict):
+        return all(isinstance(key, str) and _has_only_str_keys(value) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return all(_has_only_str_keys(value) for value in obj)
+    return True
+
+
+def _context_key(data_context: Dict[str, Any]) -> Optional[bytes]:
+    """
+    Canonical key for interning identical data contexts, or None if the context is not
+    serializable or has non-str keys, which JSON would merge with str ones ({1: x} and {'1': x}).
+    """
+    try:
+        if orjson is not None:
+            # Without OPT_NON_STR_KEYS, orjson raises TypeError on any non-str key
+            return orjson.dumps(data_context, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        if not _has_only_str_keys(data_context):
+            return None
+        return json.dumps(data_context, sort_keys=True, separators=COMPACT_JSON_SEPARATORS).encode()
+    except TypeError:
+        return None
+
+
+def _same_context(cached: Any, data_context: Any) -> bool:
+    """
+    Whether data_context holds the same values of the same types as cached. JSON keys are
+    type-lossy (None and NaN, a date and its ISO string, a tuple and a list serialize alike),
+    so a matching key alone does not make a cached context safe to reuse.
+    """
+    if type(cached) is not type(data_context):
+        return False
+    if isinstance(cached, dict):
+        return cached.keys() == data_context.keys() and all(
+            _same_context(value, data_context[key]) for key, value in cached.items()
+        )
+    if isinstance(cached, (list, tuple)):
+        return len(cached) == len(data_context) and all(
+            _same_context(a, b) for a, b in zip(cached, data_context)
+        )
+    try:
+        return bool(cached == data_context)
+    except ValueError:  # array-valued comparison
+        return False
+
+
+# Suggested-fix templates, joined once at import instead of per recorded error
+_MISSING_LOTS_FIX = " | ".join([
+    "Upload purchase lots for SKU {sku}",
+    "Check if {sku} is a valid/active SKU",
+    "Verify SKU spelling and format",
+    "Review sales data for potential SKU mapping errors",
+])
+_DATE_MISMATCH_FIX = " | ".join([
+    "Verify sale date {sale_date} for SKU {sku}",
+    "Check if older lots exist before {earliest_lot_date}",
+    "Sales date may be incorrect or lot data incomplete",
+    "Consider adjusting sale date or uploading missing historical lots",
+])
+_COST_ANOMALY_FIX = " | ".join([
+    "Verify cost data for SKU {sku} - {variance:.1f}% {direction}",
+    "Check for data entry errors in unit price or freight cost",
+    "Confirm if cost change is legitimate (supplier change, etc.)",
+    "Review PO details for accuracy",
+])
+
+# Static "By Severity" block of the summary report; only the counts vary
+_SEVERITY_SUMMARY_TEMPLATE = "\n".join([
+    "  🔴 Critical: {critical}",
+    "  🟡 High: {high}",
+    "  🟠 Medium: {medium}",
+    "  ⚪ Low: {low}",
+])
+
 class ErrorSeverity(Enum):
     """Error severity levels"""
     CRITICAL = "critical"      # System cannot continue
@@ -31,7 +135,7 @@ class ErrorCategory(Enum):
     SYSTEM_ERROR = "system_error"
     VALIDATION_ERROR = "validation_error"
 
-@dataclass
+@dataclass(slots=True)
 class FIFOError:
     """Represents a single error encountered during FIFO processing"""
     error_id: str
@@ -44,14 +148,27 @@ class FIFOError:
     timestamp: datetime
     processed: bool = False
     resolution: Optional[str] = None
+    # ISO timestamp rendered once at creation and reused by every export
+    timestamp_iso: str = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        self.timestamp_iso = self.timestamp.isoformat()
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization"""
-        result = asdict(self)
-        result['category'] = self.category.value
-        result['severity'] = self.severity.value
-        result['timestamp'] = self.timestamp.isoformat()
-        return result
+        # Built by hand: asdict() deep-copies data_context (including lot_details)
+        return {
+            'error_id': self.error_id,
+            'category': self.category.value,
+            'severity': self.severity.value,
+            'sku': self.sku,
+            'message': self.message,
+            'suggested_fix': self.suggested_fix,
+            'data_context': self.data_context,
+            'timestamp': self.timestamp_iso,
+            'processed': self.processed,
+            'resolution': self.resolution,
+        }
 
 class ErrorRecoveryManager:
     """
@@ -65,12 +182,50 @@ class ErrorRecoveryManager:
         self.error_counter = 0
         self.logger = logging.getLogger(__name__)
         
-        # Ensure output directory exists
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        # Initialize error tracking files
-        self.error_log_file = os.path.join(self.output_dir, f"error_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        self.quarantine_file = os.path.join(self.output_dir, f"quarantine_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        # Running tallies so summaries don't have to rescan every error
+        self._category_counts: Counter = Counter()
+        self._severity_counts: Counter = Counter()
+        self._sku_counts: Counter = Counter()
+        
+        # Identical data contexts (e.g. repeated lot_details) share one object.
+        # Contexts must be treated as immutable once recorded.
+        self._context_cache: Dict[bytes, Dict[str, Any]] = {}
+        
+        # error_id prefix is only reformatted when the wall-clock second changes
+        self._last_sec: Optional[datetime] = None
+        self._ts_prefix = ''
+        
+        # Output directory and report paths are created on first use, so a
+        # clean run with no errors leaves nothing behind on disk
+        self._output_dir_ready = False
+        self._error_log_file: Optional[str] = None
+        self._quarantine_file: Optional[str] = None
+        
+    @property
+    def error_log_file(self) -> str:
+        """Path of the JSON error log"""
+        if self._error_log_file is None:
+            self._init_report_paths()
+        return self._error_log_file
+    
+    @property
+    def quarantine_file(self) -> str:
+        """Path of the CSV quarantine report"""
+        if self._quarantine_file is None:
+            self._init_report_paths()
+        return self._quarantine_file
+    
+    def _init_report_paths(self):
+        """Compute timestamped report file paths"""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._error_log_file = os.path.join(self.output_dir, f"error_log_{stamp}.json")
+        self._quarantine_file = os.path.join(self.output_dir, f"quarantine_{stamp}.csv")
+    
+    def _ensure_output_dir(self):
+        """Create the output directory the first time a report is written"""
+        if not self._output_dir_ready:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._output_dir_ready = True
         
     def record_error(self, 
                     category: ErrorCategory,
@@ -78,13 +233,25 @@ class ErrorRecoveryManager:
                     sku: str,
                     message: str,
                     suggested_fix: str,
-                    data_context: Dict[str, Any] = None) -> str:
+                    data_context: Optional[Dict[str, Any]] = None) -> str:
         """
         Record an error for later handling.
         Returns error_id for tracking.
         """
         self.error_counter += 1
-        error_id = f"ERR_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.error_counter:04d}"
+        now = datetime.now()
+        sec_key = now.replace(microsecond=0)
+        if sec_key != self._last_sec:
+            self._last_sec = sec_key
+            self._ts_prefix = sec_key.strftime('%Y%m%d_%H%M%S')
+        error_id = f"ERR_{self._ts_prefix}_{self.error_counter:04d}"
+        
+        if data_context:
+            key = _context_key(data_context)
+            if key is not None:
+                cached = self._context_cache.setdefault(key, data_context)
+                if _same_context(cached, data_context):
+                    data_context = cached
         
         error = FIFOError(
             error_id=error_id,
@@ -93,17 +260,20 @@ class ErrorRecoveryManager:
             sku=sku,
             message=message,
             suggested_fix=suggested_fix,
-            data_context=data_context or {},
-            timestamp=datetime.now()
+            data_context=data_context if data_context is not None else _EMPTY_CONTEXT,
+            timestamp=now
         )
         
         self.errors.append(error)
+        self._category_counts[category.value] += 1
+        self._severity_counts[severity.value] += 1
+        self._sku_counts[sku] += 1
         
         # Log based on severity
         log_message = f"[{error_id}] {sku}: {message}"
-        if severity == ErrorSeverity.CRITICAL:
+        if severity is ErrorSeverity.CRITICAL:
             self.logger.error(log_message)
-        elif severity == ErrorSeverity.HIGH:
+        elif severity is ErrorSeverity.HIGH:
             self.logger.warning(log_message)
         else:
             self.logger.info(log_message)
@@ -151,19 +321,12 @@ class ErrorRecoveryManager:
     def handle_missing_lots(self, sku: str, sales_qty: int, sale_date: str) -> str:
         """Handle missing lots scenario"""
         
-        suggested_fixes = [
-            f"Upload purchase lots for SKU {sku}",
-            f"Check if {sku} is a valid/active SKU",
-            f"Verify SKU spelling and format",
-            f"Review sales data for potential SKU mapping errors"
-        ]
-        
         return self.record_error(
             category=ErrorCategory.MISSING_LOTS,
             severity=ErrorSeverity.HIGH,
             sku=sku,
             message=f"No purchase lots found for SKU {sku} (sales: {sales_qty} units on {sale_date})",
-            suggested_fix=" | ".join(suggested_fixes),
+            suggested_fix=_MISSING_LOTS_FIX.format(sku=sku),
             data_context={
                 'sales_qty': sales_qty,
                 'sale_date': sale_date
@@ -176,19 +339,14 @@ class ErrorRecoveryManager:
                            earliest_lot_date: str) -> str:
         """Handle sales before inventory received"""
         
-        suggested_fixes = [
-            f"Verify sale date {sale_date} for SKU {sku}",
-            f"Check if older lots exist before {earliest_lot_date}",
-            "Sales date may be incorrect or lot data incomplete",
-            "Consider adjusting sale date or uploading missing historical lots"
-        ]
-        
         return self.record_error(
             category=ErrorCategory.DATE_MISMATCH,
             severity=ErrorSeverity.MEDIUM,
             sku=sku,
             message=f"Sale date {sale_date} before earliest lot date {earliest_lot_date}",
-            suggested_fix=" | ".join(suggested_fixes),
+            suggested_fix=_DATE_MISMATCH_FIX.format(
+                sku=sku, sale_date=sale_date, earliest_lot_date=earliest_lot_date
+            ),
             data_context={
                 'sale_date': sale_date,
                 'earliest_lot_date': earliest_lot_date
@@ -206,20 +364,15 @@ class ErrorRecoveryManager:
             direction = "increase"
         else:
             direction = "decrease"
-            
-        suggested_fixes = [
-            f"Verify cost data for SKU {sku} - {abs(variance_percent):.1f}% {direction}",
-            "Check for data entry errors in unit price or freight cost",
-            "Confirm if cost change is legitimate (supplier change, etc.)",
-            "Review PO details for accuracy"
-        ]
         
         return self.record_error(
             category=ErrorCategory.COST_ANOMALY,
             severity=ErrorSeverity.LOW,
             sku=sku,
             message=f"Cost anomaly: current ${current_cost:.2f} vs average ${average_cost:.2f} ({variance_percent:+.1f}%)",
-            suggested_fix=" | ".join(suggested_fixes),
+            suggested_fix=_COST_ANOMALY_FIX.format(
+                sku=sku, variance=abs(variance_percent), direction=direction
+            ),
             data_context={
                 'current_cost': current_cost,
                 'average_cost': average_cost,
@@ -227,26 +380,44 @@ class ErrorRecoveryManager:
             }
         )
     
-    def get_errors_by_category(self, category: ErrorCategory) -> List[FIFOError]:
-        """Get all errors of a specific category"""
-        return [error for error in self.errors if error.category == category]
+    def get_errors_by_category(self, category: ErrorCategory,
+                               materialize: bool = False) -> Iterable[FIFOError]:
+        """
+        Get all errors of a specific category.
+        Returns a lazy iterator; pass materialize=True when a list is needed.
+        """
+        errors = (error for error in self.errors if error.category is category)
+        return list(errors) if materialize else errors
     
-    def get_errors_by_severity(self, severity: ErrorSeverity) -> List[FIFOError]:
-        """Get all errors of a specific severity"""
-        return [error for error in self.errors if error.severity == severity]
+    def get_errors_by_severity(self, severity: ErrorSeverity,
+                               materialize: bool = False) -> Iterable[FIFOError]:
+        """
+        Get all errors of a specific severity.
+        Returns a lazy iterator; pass materialize=True when a list is needed.
+        """
+        errors = (error for error in self.errors if error.severity is severity)
+        return list(errors) if materialize else errors
     
-    def get_errors_by_sku(self, sku: str) -> List[FIFOError]:
-        """Get all errors for a specific SKU"""
-        return [error for error in self.errors if error.sku == sku]
+    def get_errors_by_sku(self, sku: str, materialize: bool = False) -> Iterable[FIFOError]:
+        """
+        Get all errors for a specific SKU.
+        Returns a lazy iterator; pass materialize=True when a list is needed.
+        """
+        errors = (error for error in self.errors if error.sku == sku)
+        return list(errors) if materialize else errors
     
-    def get_blocking_errors(self) -> List[FIFOError]:
-        """Get errors that prevent processing (CRITICAL or HIGH severity)"""
-        return [error for error in self.errors 
-                if error.severity in [ErrorSeverity.CRITICAL, ErrorSeverity.HIGH]]
+    def get_blocking_errors(self, materialize: bool = False) -> Iterable[FIFOError]:
+        """
+        Get errors that prevent processing (CRITICAL or HIGH severity).
+        Returns a lazy iterator; pass materialize=True when a list is needed.
+        """
+        errors = (error for error in self.errors 
+                  if error.severity is ErrorSeverity.CRITICAL or error.severity is ErrorSeverity.HIGH)
+        return list(errors) if materialize else errors
     
     def get_skus_with_errors(self) -> List[str]:
         """Get list of SKUs that have errors"""
-        return list(set(error.sku for error in self.errors))
+        return list(self._sku_counts)
     
     def get_processable_skus(self, all_skus: List[str]) -> List[str]:
         """Get SKUs that can still be processed (no blocking errors)"""
@@ -261,40 +432,47 @@ class ErrorRecoveryManager:
                 error.resolution = resolution
                 break
     
-    def export_error_report(self) -> Dict[str, str]:
-        """Export comprehensive error report"""
+    def export_error_report(self, pretty: bool = False) -> Dict[str, str]:
+        """
+        Export comprehensive error report.
+        The JSON log is compact by default; pass pretty=True for an indented, human-readable log.
+        """
         
-        # JSON error log
-        error_data = [error.to_dict() for error in self.errors]
+        self._ensure_output_dir()
         
+        # JSON error log
         with open(self.error_log_file, 'w') as f:
-            json.dump({
-                'generated_at': datetime.now().isoformat(),
-                'total_errors': len(self.errors),
-                'error_summary': self._get_error_summary(),
-                'errors': error_data
-            }, f, indent=2)
+            if pretty:
+                f.write(_dumps({
+                    'generated_at': datetime.now().isoformat(),
+                    'total_errors': len(self.errors),
+                    'error_summary': self._get_error_summary(),
+                    'errors': [error.to_dict() for error in self.errors]
+                }, pretty=True))
+            else:
+                self._write_error_log(f)
         
         # CSV quarantine report
         if self.errors:
-            with open(self.quarantine_file, 'w', newline='') as f:
+            with open(self.quarantine_file, 'w', newline='', buffering=CSV_WRITE_BUFFER_SIZE) as f:
                 writer = csv.writer(f)
                 writer.writerow([
                     'Error_ID', 'Category', 'Severity', 'SKU', 'Message', 
                     'Suggested_Fix', 'Timestamp', 'Data_Context'
                 ])
-                
-                for error in self.errors:
-                    writer.writerow([
+                writer.writerows(
+                    (
                         error.error_id,
                         error.category.value,
                         error.severity.value,
                         error.sku,
                         error.message,
                         error.suggested_fix,
-                        error.timestamp.isoformat(),
-                        json.dumps(error.data_context)
-                    ])
+                        error.timestamp_iso,
+                        _dumps(error.data_context)
+                    )
+                    for error in self.errors
+                )
         
         return {
             'error_log': self.error_log_file,
@@ -302,35 +480,31 @@ class ErrorRecoveryManager:
             'summary': self._generate_summary_report()
         }
     
+    def _write_error_log(self, f) -> None:
+        """Stream the JSON error log one error at a time instead of building it in memory"""
+        f.write('{"generated_at":')
+        f.write(_dumps(datetime.now().isoformat()))
+        f.write(f',"total_errors":{len(self.errors)},"error_summary":')
+        f.write(_dumps(self._get_error_summary()))
+        f.write(',"errors":[')
+        for index, error in enumerate(self.errors):
+            if index:
+                f.write(',')
+            f.write(_dumps(error.to_dict()))
+        f.write(']}')
+
     def _get_error_summary(self) -> Dict[str, Any]:
         """Generate error summary statistics"""
         total = len(self.errors)
         if total == 0:
             return {"total_errors": 0}
         
-        by_category = {}
-        by_severity = {}
-        by_sku = {}
-        
-        for error in self.errors:
-            # By category
-            category = error.category.value
-            by_category[category] = by_category.get(category, 0) + 1
-            
-            # By severity
-            severity = error.severity.value
-            by_severity[severity] = by_severity.get(severity, 0) + 1
-            
-            # By SKU
-            sku = error.sku
-            by_sku[sku] = by_sku.get(sku, 0) + 1
-        
         return {
             'total_errors': total,
-            'by_category': by_category,
-            'by_severity': by_severity,
-            'affected_skus': len(by_sku),
-            'top_problem_skus': sorted(by_sku.items(), key=lambda x: x[1], reverse=True)[:10]
+            'by_category': dict(self._category_counts),
+            'by_severity': dict(self._severity_counts),
+            'affected_skus': len(self._sku_counts),
+            'top_problem_skus': self._sku_counts.most_common(10)
         }
     
     def _generate_summary_report(self) -> str:
@@ -347,10 +521,9 @@ class ErrorRecoveryManager:
             f"Affected SKUs: {summary['affected_skus']}",
             "",
             "By Severity:",
-            f"  🔴 Critical: {summary['by_severity'].get('critical', 0)}",
-            f"  🟡 High: {summary['by_severity'].get('high', 0)}",
-            f"  🟠 Medium: {summary['by_severity'].get('medium', 0)}",
-            f"  ⚪ Low: {summary['by_severity'].get('low', 0)}",
+            _SEVERITY_SUMMARY_TEMPLATE.format(**{
+                severity.value: self._severity_counts[severity.value] for severity in ErrorSeverity
+            }),
             "",
             "By Category:",
         ]
@@ -366,7 +539,8 @@ class ErrorRecoveryManager:
             for sku, count in summary['top_problem_skus'][:5]:
                 report_lines.append(f"  • {sku}: {count} errors")
         
-        blocking_errors = len(self.get_blocking_errors())
+        blocking_errors = (self._severity_counts[ErrorSeverity.CRITICAL.value]
+                           + self._severity_counts[ErrorSeverity.HIGH.value])
         processable_errors = len(self.errors) - blocking_errors
         
         report_lines.extend([
@@ -386,48 +560,47 @@ class ErrorRecoveryManager:
         Determine if processing can continue and which SKUs can be processed.
         Returns (can_continue, processable_skus)
         """
-        critical_errors = self.get_errors_by_severity(ErrorSeverity.CRITICAL)
-        
-        if critical_errors:
+        if self._severity_counts[ErrorSeverity.CRITICAL.value]:
             return False, []
         
+        # Single pass to find SKUs blocked by high-severity errors
+        blocked_skus = set()
+        for error in self.errors:
+            if error.severity is ErrorSeverity.HIGH:
+                blocked_skus.add(error.sku)
+        
         # Get SKUs that don't have blocking errors
-        all_skus = list(set(error.sku for error in self.errors))
-        processable_skus = self.get_processable_skus(all_skus)
+        processable_skus = [sku for sku in self._sku_counts if sku not in blocked_skus]
         
         return True, processable_skus
     
     def get_actionable_steps(self) -> List[str]:
         """Get prioritized list of actionable steps to resolve errors"""
-        steps = []
+        steps: List[str] = []
         
         # Critical errors first
-        critical_errors = self.get_errors_by_severity(ErrorSeverity.CRITICAL)
-        if critical_errors:
+        if self._severity_counts[ErrorSeverity.CRITICAL.value]:
             steps.append("🔴 CRITICAL: Fix these issues before any processing:")
-            for error in critical_errors:
-                steps.append(f"  • {error.sku}: {error.suggested_fix}")
+            steps.extend(f"  • {error.sku}: {error.suggested_fix}"
+                         for error in self.get_errors_by_severity(ErrorSeverity.CRITICAL))
             steps.append("")
         
         # High severity errors
-        high_errors = self.get_errors_by_severity(ErrorSeverity.HIGH)
-        if high_errors:
+        if self._severity_counts[ErrorSeverity.HIGH.value]:
             steps.append("🟡 HIGH PRIORITY: Fix to process affected SKUs:")
-            for error in high_errors:
-                steps.append(f"  • {error.sku}: {error.suggested_fix}")
+            steps.extend(f"  • {error.sku}: {error.suggested_fix}"
+                         for error in self.get_errors_by_severity(ErrorSeverity.HIGH))
             steps.append("")
         
         # Missing lots
-        missing_lots = self.get_errors_by_category(ErrorCategory.MISSING_LOTS)
-        if missing_lots:
-            skus = [error.sku for error in missing_lots]
-            steps.append(f"📦 Upload missing purchase lots for: {', '.join(skus)}")
+        if self._category_counts[ErrorCategory.MISSING_LOTS.value]:
+            skus = ', '.join(error.sku for error in self.get_errors_by_category(ErrorCategory.MISSING_LOTS))
+            steps.append(f"📦 Upload missing purchase lots for: {skus}")
         
         # Negative inventory
-        negative_inv = self.get_errors_by_category(ErrorCategory.NEGATIVE_INVENTORY)
-        if negative_inv:
-            skus = [error.sku for error in negative_inv]
-            steps.append(f"📉 Check inventory/sales data for: {', '.join(skus)}")
+        if self._category_counts[ErrorCategory.NEGATIVE_INVENTORY.value]:
+            skus = ', '.join(error.sku for error in self.get_errors_by_category(ErrorCategory.NEGATIVE_INVENTORY))
+            steps.append(f"📉 Check inventory/sales data for: {skus}")
         
         if not steps:
             steps.append("✅ No critical issues found")
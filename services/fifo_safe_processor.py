@@ -5,8 +5,13 @@ Enhanced FIFO processor with comprehensive error recovery.
 Isolates errors to prevent one bad SKU from stopping processing of good SKUs.
 """
 
+import numpy as np
 import pandas as pd
 import logging
+import multiprocessing
+import queue
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import os
@@ -15,34 +20,387 @@ import json
 # Import existing production components
 from error_recovery_manager import ErrorRecoveryManager, ErrorCategory, ErrorSeverity
 
+ATTRIBUTION_WRITE_BUFFER_SIZE = 1 << 20
+LOG_WRITE_BUFFER_SIZE = 1 << 16
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used when unavailable
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # optional JIT; the allocation kernel runs as plain Python without it
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+
+def _column_values(df: pd.DataFrame, column: str, default: Any) -> np.ndarray:
+    """Column as a NumPy array, or an array filled with default when the column is absent"""
+    if column in df.columns:
+        return df[column].to_numpy()
+    return np.full(len(df), default, dtype=object if isinstance(default, str) else None)
+
+
+def _with_datetime64(df: pd.DataFrame, column: str) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Frame with column coerced to datetime64, if it is not already, and a mask of the rows
+    whose value was present but could not be parsed (those become NaT). Each value is parsed
+    on its own, so a column mixing date formats is not read in the format of its first value.
+    """
+    if column not in df.columns or pd.api.types.is_datetime64_any_dtype(df[column]):
+        return df, np.zeros(len(df), dtype=bool)
+    parsed = pd.to_datetime(df[column], format='mixed', errors='coerce')
+    unparseable = (parsed.isna() & df[column].notna()).to_numpy()
+    return df.assign(**{column: parsed}), unparseable
+
+
+def _with_shared_sku_categories(clean_sales: pd.DataFrame,
+                                clean_lots: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Recode both SKU columns as Categoricals over one shared set of categories, so grouping
+    compares small integer codes instead of strings. Values read back out of the column are
+    category values; convert with .astype(str) before putting them in error reports.
+    """
+    sales_skus = clean_sales['SKU'].astype('category')
+    lots_skus = clean_lots['SKU'].astype('category')
+    categories = sales_skus.cat.categories.union(lots_skus.cat.categories)
+    return (clean_sales.assign(SKU=sales_skus.cat.set_categories(categories)),
+            clean_lots.assign(SKU=lots_skus.cat.set_categories(categories)))
+
+
+def _with_used_sku_categories(frame: pd.DataFrame) -> pd.DataFrame:
+    """Drop the SKU categories a frame does not use, keeping a per-SKU slice small to pickle."""
+    return frame.assign(SKU=frame['SKU'].cat.remove_unused_categories())
+
+
+def _read_sku_blocks(path: str, chunksize: int):
+    """
+    Read a CSV sorted by SKU chunksize rows at a time, yielding frames that each hold every
+    row of the SKUs they contain. Rows of the SKU straddling a chunk boundary are carried over.
+    Dates are left as read; validation parses them and reports the rows it cannot.
+    """
+    carry = None
+    with pd.read_csv(path, chunksize=chunksize, dtype={'SKU': str}) as reader:
+        for chunk in reader:
+            chunk = chunk.dropna(subset=['SKU'])
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            if chunk.empty:
+                continue
+            
+            skus = chunk['SKU']
+            if not skus.is_monotonic_increasing:
+                raise ValueError(f"Streaming input must be sorted by SKU: {path}")
+            tail = (skus == skus.iloc[-1]).to_numpy()
+            carry = chunk[tail]
+            if not tail.all():
+                yield chunk[~tail]
+    
+    if carry is not None and not carry.empty:
+        yield carry
+
+
+@njit()
+def _fifo_allocate_kernel(sale_qty, lot_remaining):
+    """
+    Allocate date-ordered sales against date-ordered lots, consuming lot_remaining in place.
+    Returns (sale_index, lot_index, allocated, failed_sale) where failed_sale is the index
+    of the first sale that could not be fully allocated, or -1.
+    """
+    # Every allocation either finishes a sale or empties a lot, which bounds the output size
+    max_allocs = len(sale_qty) + len(lot_remaining)
+    sale_idx_out = np.empty(max_allocs, dtype=np.int64)
+    lot_idx_out = np.empty(max_allocs, dtype=np.int64)
+    allocated_out = np.empty(max_allocs, dtype=lot_remaining.dtype)
+    count = 0
+    lot_ptr = 0
+    
+    for sale_idx in range(len(sale_qty)):
+        remaining_to_allocate = sale_qty[sale_idx]
+        
+        while remaining_to_allocate > 0 and lot_ptr < len(lot_remaining):
+            available = lot_remaining[lot_ptr]
+            if available <= 0:
+                # Depleted (or negative) lots never refill, so move past them for good
+                lot_ptr += 1
+                continue
+            
+            allocated = min(remaining_to_allocate, available)
+            sale_idx_out[count] = sale_idx
+            lot_idx_out[count] = lot_ptr
+            allocated_out[count] = allocated
+            count += 1
+            
+            lot_remaining[lot_ptr] -= allocated
+            remaining_to_allocate -= allocated
+        
+        if remaining_to_allocate > 0:
+            return sale_idx_out[:count], lot_idx_out[:count], allocated_out[:count], sale_idx
+    
+    return sale_idx_out[:count], lot_idx_out[:count], allocated_out[:count], -1
+
+
+def _process_sku(sku: str,
+                 sku_sales: pd.DataFrame,
+                 sku_lots: pd.DataFrame,
+                 existing_fifo_processor,
+                 error_manager: ErrorRecoveryManager,
+                 logger: logging.Logger,
+                 total_sales=None,
+                 total_available=None,
+                 earliest_sale_date=None,
+                 earliest_lot_date=None,
+                 already_sorted: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Process a single SKU with comprehensive error handling.
+    Per-SKU totals and earliest dates may be passed in when the caller has
+    already aggregated them for the whole batch; otherwise they are computed here.
+    Pass already_sorted when sales and lots are already in date order.
+    Errors are recorded on error_manager. Returns processing results including
+    attributions, or None if SKU should be skipped.
+    """
+    try:
+        logger.debug(f"Processing SKU {sku}: {len(sku_sales)} sales, {len(sku_lots)} lots")
+        
+        # Pre-processing validation
+        if total_sales is None:
+            total_sales = sku_sales['Quantity_Sold'].sum()
+        if total_available is None:
+            total_available = sku_lots['Remaining_Unit_Qty'].sum()
+        if earliest_sale_date is None:
+            earliest_sale_date = sku_sales['Sale_Date'].min()
+        
+        # Check for missing lots
+        if sku_lots.empty:
+            error_manager.handle_missing_lots(
+                sku=sku,
+                sales_qty=int(total_sales),
+                sale_date=str(earliest_sale_date)
+            )
+            return None
+        
+        # Check for insufficient inventory
+        if total_available < total_sales:
+            lot_details = []
+            for _, lot in sku_lots.iterrows():
+                lot_details.append({
+                    'lot_id': lot.get('Lot_ID', 'UNKNOWN'),
+                    'received_date': str(lot.get('Received_Date', '')),
+                    'remaining': int(lot['Remaining_Unit_Qty'])
+                })
+            
+            error_manager.handle_negative_inventory(
+                sku=sku,
+                requested_qty=int(total_sales),
+                available_qty=int(total_available),
+                lot_details=lot_details
+            )
+            return None
+        
+        # Check for date mismatches
+        if earliest_lot_date is None:
+            earliest_lot_date = sku_lots['Received_Date'].min()
+        
+        if pd.notna(earliest_lot_date) and pd.notna(earliest_sale_date):
+            if earliest_sale_date < earliest_lot_date:
+                error_manager.handle_date_mismatch(
+                    sku=sku,
+                    sale_date=str(earliest_sale_date),
+                    earliest_lot_date=str(earliest_lot_date)
+                )
+                # Continue processing with warning (not blocking)
+        
+        # Attempt FIFO processing using existing processor
+        # This would integrate with the existing fifo_calculator_supabase.py logic
+        result = _process_fifo_for_sku(sku, sku_sales, sku_lots, existing_fifo_processor, logger,
+                                       already_sorted=already_sorted)
+        
+        if result:
+            logger.debug(f"✅ Successfully processed SKU {sku}: COGS ${result.get('total_cogs', 0):.2f}")
+            return result
+        else:
+            logger.warning(f"⚠️ SKU {sku} processing returned no results")
+            return None
+            
+    except Exception as e:
+        # Catch any unexpected errors and isolate them
+        logger.error(f"❌ Error processing SKU {sku}: {e}")
+        error_manager.record_error(
+            category=ErrorCategory.SYSTEM_ERROR,
+            severity=ErrorSeverity.HIGH,
+            sku=sku,
+            message=f"Unexpected error during processing: {str(e)}",
+            suggested_fix="Review SKU data and processing logs for details",
+            data_context={'exception': str(e), 'exception_type': type(e).__name__}
+        )
+        return None
+
+def _process_fifo_for_sku(sku: str,
+                          sku_sales: pd.DataFrame,
+                          sku_lots: pd.DataFrame,
+                          existing_processor,
+                          logger: logging.Logger,
+                          already_sorted: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Wrapper for existing FIFO processing logic.
+    This would integrate with the production fifo_calculator_supabase.py
+    Sales and lots are sorted by date unless already_sorted says the caller did it.
+    """
+    # This is a placeholder for integration with existing FIFO logic
+    # In real implementation, this would call the existing FIFO calculator
+    # while maintaining error isolation
+    
+    try:
+        if already_sorted:
+            sorted_lots = sku_lots
+            sorted_sales = sku_sales
+        else:
+            # Sort lots by date (FIFO order)
+            sorted_lots = sku_lots.sort_values('Received_Date', kind='stable')
+            
+            # Sort sales by date
+            sorted_sales = sku_sales.sort_values('Sale_Date', kind='stable')
+        
+        # Simulate FIFO processing (in real implementation, use existing logic).
+        # Lots and sales are handed to the allocation kernel as parallel
+        # NumPy arrays; only the remaining quantities are mutated.
+        lot_ids = _column_values(sorted_lots, 'Lot_ID', 'UNKNOWN')
+        unit_costs = (_column_values(sorted_lots, 'Unit_Price', 0)
+                      + _column_values(sorted_lots, 'Freight_Cost_Per_Unit', 0))
+        lot_remaining = pd.to_numeric(sorted_lots['Remaining_Unit_Qty']).to_numpy()
+        sale_qty = pd.to_numeric(sorted_sales['Quantity_Sold']).to_numpy()
+        qty_dtype = np.result_type(lot_remaining.dtype, sale_qty.dtype)
+        lot_remaining = lot_remaining.astype(qty_dtype)  # always a copy; mutated by the kernel
+        sale_qty = sale_qty.astype(qty_dtype, copy=False)
+        sale_dates = sorted_sales['Sale_Date'].to_numpy()
+        
+        if len(lot_remaining) == 1 and lot_remaining[0] >= sale_qty[sale_qty > 0].sum():
+            # Single-lot fast path: every sale is drawn whole from the one lot
+            sale_idx_out = np.flatnonzero(sale_qty > 0)
+            lot_idx_out = np.zeros(len(sale_idx_out), dtype=np.int64)
+            allocated_out = sale_qty[sale_idx_out]
+            failed_sale = -1
+        else:
+            sale_idx_out, lot_idx_out, allocated_out, failed_sale = _fifo_allocate_kernel(sale_qty, lot_remaining)
+        
+        if failed_sale >= 0:
+            # This should have been caught earlier, but double-check
+            remaining_to_allocate = sale_qty[failed_sale] - allocated_out[sale_idx_out == failed_sale].sum()
+            raise ValueError(f"Could not fully allocate sale: {remaining_to_allocate} units remaining")
+        
+        # Attribution records stay columnar, one row per allocation; per-row
+        # dicts are only built when they are written out
+        attr_unit_costs = unit_costs[lot_idx_out]
+        attr_total_costs = allocated_out * attr_unit_costs
+        attributions = pd.DataFrame({
+            'sale_date': sale_dates[sale_idx_out],
+            'sku': sku,
+            'lot_id': lot_ids[lot_idx_out],
+            'allocated_qty': allocated_out,
+            'unit_cost': attr_unit_costs,
+            'total_cost': attr_total_costs
+        })
+        
+        # Calculate totals
+        total_cogs = sum(attr_total_costs.tolist())  # summed in allocation order
+        total_qty = allocated_out.sum().item()
+        
+        return {
+            'sku': sku,
+            'attributions': attributions,
+            'total_cogs': total_cogs,
+            'total_quantity': total_qty,
+            'average_cost': total_cogs / total_qty if total_qty > 0 else 0
+        }
+        
+    except Exception as e:
+        logger.error(f"FIFO processing error for {sku}: {e}")
+        raise
+
+
+class _BufferedFileHandler(logging.FileHandler):
+    """
+    FileHandler that lets records accumulate in a write buffer instead of flushing after
+    every record. The buffer is flushed when full, on close(), and by logging's exit hook.
+    """
+    
+    def __init__(self, filename: str, buffer_size: int = LOG_WRITE_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        super().__init__(filename, delay=True)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+_worker_existing_processor = None
+
+
+def _init_sku_worker(log_queue, existing_processor):
+    """Pool initializer: send this worker's log records to the parent's listener"""
+    global _worker_existing_processor
+    logger = logging.getLogger(__name__)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    # Errors are logged once, when the parent re-records them
+    logging.getLogger(ErrorRecoveryManager.__module__).disabled = True
+    _worker_existing_processor = existing_processor
+
+
+def _process_sku_task(task) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+    """Pool worker: process one SKU, returning its result and the errors it recorded"""
+    sku, sku_sales, sku_lots, totals = task
+    error_manager = ErrorRecoveryManager()
+    result = _process_sku(sku, sku_sales, sku_lots, _worker_existing_processor,
+                          error_manager, logging.getLogger(__name__), **totals)
+    return result, error_manager.errors
+
+
 class FIFOSafeProcessor:
     """
     Enhanced FIFO processor that handles errors gracefully.
     Wraps existing FIFO logic with comprehensive error handling.
     """
     
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, max_detail_errors: Optional[int] = 20):
         self.output_dir = output_dir or f"safe_processing_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         os.makedirs(self.output_dir, exist_ok=True)
         
         # Initialize error recovery manager
         self.error_manager = ErrorRecoveryManager(os.path.join(self.output_dir, "errors"))
         
-        # Set up logging
+        # Set up logging. Records are queued and written to processing.log by a
+        # background listener so the per-SKU loop never blocks on file I/O.
         self.logger = logging.getLogger(__name__)
-        log_file = os.path.join(self.output_dir, "processing.log")
-        handler = logging.FileHandler(log_file)
-        handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s'
-        ))
-        self.logger.addHandler(handler)
+        self._log_queue = queue.Queue(-1)
+        self._queue_handler = QueueHandler(self._log_queue)
+        self._listener = None
         self.logger.setLevel(logging.INFO)
         
+        # Attributions are streamed here per SKU rather than held for the report
+        self.attributions_file = os.path.join(self.output_dir, "attributions.jsonl")
+        self._attr_file = None
+        self._open_outputs()
+        
         # Processing statistics
         self.stats = {
             'total_skus': 0,
             'processed_skus': 0,
             'skipped_skus': 0,
+            'inventory_only_skus': 0,
             'total_sales': 0,
             'processed_sales': 0,
             'total_errors': 0,
@@ -54,6 +412,37 @@ class FIFOSafeProcessor:
         self.successful_attributions = []
         self.successful_summaries = []
         self.skipped_skus = []
+        
+        # Per-row validation errors itemized per check; the rest are summarized (None = all)
+        self.max_detail_errors = max_detail_errors
+    
+    def _open_outputs(self):
+        """
+        Open attributions.jsonl and start writing queued log records to processing.log,
+        unless already open. Each batch reopens what the previous batch's close() closed;
+        the attributions file is rewritten per batch, like processing_results.json.
+        """
+        if self._attr_file is None or self._attr_file.closed:
+            self._attr_file = open(self.attributions_file, 'w', buffering=ATTRIBUTION_WRITE_BUFFER_SIZE)
+        if self._listener is not None:
+            return
+        self._file_handler = _BufferedFileHandler(os.path.join(self.output_dir, "processing.log"))
+        self._file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s'
+        ))
+        self._listener = QueueListener(self._log_queue, self._file_handler)
+        self._listener.start()
+        self.logger.addHandler(self._queue_handler)
+    
+    def close(self):
+        """Flush attributions and queued log records to disk and detach this processor's handlers"""
+        self._attr_file.close()
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+        self.logger.removeHandler(self._queue_handler)
+        self._file_handler.close()
     
     def validate_sales_data(self, sales_df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
         """
@@ -78,22 +467,21 @@ class FIFOSafeProcessor:
             )
             raise ValueError(error_msg)
         
-        # Clean and validate data
-        clean_df = sales_df.copy()
+        # Clean and validate data with one fused mask, so the frame is sliced only once
+        sku_null = sales_df['SKU'].isna().to_numpy()
+        qty_valid = (sales_df['Quantity_Sold'] > 0).to_numpy()
         
         # Remove rows with missing SKU
-        before_sku_clean = len(clean_df)
-        clean_df = clean_df.dropna(subset=['SKU'])
-        after_sku_clean = len(clean_df)
-        if before_sku_clean != after_sku_clean:
-            warnings.append(f"Removed {before_sku_clean - after_sku_clean} rows with missing SKU")
+        missing_sku_count = int(sku_null.sum())
+        if missing_sku_count:
+            warnings.append(f"Removed {missing_sku_count} rows with missing SKU")
         
         # Remove rows with zero or negative quantities
-        before_qty_clean = len(clean_df)
-        clean_df = clean_df[clean_df['Quantity_Sold'] > 0]
-        after_qty_clean = len(clean_df)
-        if before_qty_clean != after_qty_clean:
-            warnings.append(f"Removed {before_qty_clean - after_qty_clean} rows with invalid quantities")
+        invalid_qty_count = int((~sku_null & ~qty_valid).sum())
+        if invalid_qty_count:
+            warnings.append(f"Removed {invalid_qty_count} rows with invalid quantities")
+        
+        clean_df = self._with_parsed_dates(sales_df[~sku_null & qty_valid], 'Sale_Date', 'sales', warnings)
         
         # Check for duplicate sales (same SKU, date, quantity)
         duplicates = clean_df.duplicated(subset=['SKU', 'Sale_Date', 'Quantity_Sold'])
@@ -102,14 +490,21 @@ class FIFOSafeProcessor:
             warnings.append(f"Found {dup_count} potential duplicate sales records")
             
             # Log details but don't remove (might be legitimate)
-            for idx, row in clean_df[duplicates].iterrows():
+            dup_view = clean_df.loc[duplicates, ['SKU', 'Sale_Date', 'Quantity_Sold']]
+            detail = dup_view.iloc[:self.max_detail_errors]
+            for sku, sale_date, qty in zip(detail['SKU'].tolist(),
+                                           detail['Sale_Date'].tolist(),
+                                           detail['Quantity_Sold'].tolist()):
                 self.error_manager.record_error(
                     category=ErrorCategory.DATA_CONFLICT,
                     severity=ErrorSeverity.MEDIUM,
-                    sku=row['SKU'],
-                    message=f"Potential duplicate sale: {row['Quantity_Sold']} units on {row['Sale_Date']}",
+                    sku=sku,
+                    message=f"Potential duplicate sale: {qty} units on {sale_date}",
                     suggested_fix="Verify if this is a legitimate duplicate sale or data error"
                 )
+            self._record_undetailed(dup_view, ErrorCategory.DATA_CONFLICT, ErrorSeverity.MEDIUM,
+                                    "potential duplicate sales",
+                                    "Verify if these are legitimate duplicate sales or data errors")
         
         self.logger.info(f"Sales validation: {original_count} → {len(clean_df)} records ({len(warnings)} warnings)")
         return clean_df, warnings
@@ -121,256 +516,366 @@ class FIFOSafeProcessor:
         """
         warnings = []
         original_count = len(lots_df)
+        lots_df = self._with_parsed_dates(lots_df, 'Received_Date', 'lots', warnings)
         
         # Check for negative remaining quantities
         negative_remaining = lots_df[lots_df['Remaining_Unit_Qty'] < 0]
         if not negative_remaining.empty:
             warnings.append(f"Found {len(negative_remaining)} lots with negative remaining quantities")
-            for idx, lot in negative_remaining.iterrows():
+            detail = negative_remaining.iloc[:self.max_detail_errors]
+            for sku, lot_id, remaining in zip(_column_values(detail, 'SKU', 'UNKNOWN').tolist(),
+                                              _column_values(detail, 'Lot_ID', 'UNKNOWN').tolist(),
+                                              detail['Remaining_Unit_Qty'].tolist()):
                 self.error_manager.record_error(
                     category=ErrorCategory.DATA_CONFLICT,
                     severity=ErrorSeverity.HIGH,
-                    sku=lot.get('SKU', 'UNKNOWN'),
-                    message=f"Lot {lot.get('Lot_ID', 'UNKNOWN')} has negative remaining quantity: {lot['Remaining_Unit_Qty']}",
+                    sku=sku,
+                    message=f"Lot {lot_id} has negative remaining quantity: {remaining}",
                     suggested_fix="Check lot data for errors or adjust quantities"
                 )
+            self._record_undetailed(negative_remaining, ErrorCategory.DATA_CONFLICT, ErrorSeverity.HIGH,
+                                    "lots with negative remaining quantities",
+                                    "Check lot data for errors or adjust quantities")
         
         # Check for remaining > original quantities
         invalid_quantities = lots_df[lots_df['Remaining_Unit_Qty'] > lots_df['Original_Unit_Qty']]
         if not invalid_quantities.empty:
             warnings.append(f"Found {len(invalid_quantities)} lots with remaining > original quantities")
-            for idx, lot in invalid_quantities.iterrows():
+            detail = invalid_quantities.iloc[:self.max_detail_errors]
+            for sku, lot_id, remaining, original in zip(_column_values(detail, 'SKU', 'UNKNOWN').tolist(),
+                                                        _column_values(detail, 'Lot_ID', 'UNKNOWN').tolist(),
+                                                        detail['Remaining_Unit_Qty'].tolist(),
+                                                        detail['Original_Unit_Qty'].tolist()):
                 self.error_manager.record_error(
                     category=ErrorCategory.DATA_CONFLICT,
                     severity=ErrorSeverity.HIGH,
-                    sku=lot.get('SKU', 'UNKNOWN'),
-                    message=f"Lot {lot.get('Lot_ID', 'UNKNOWN')} has impossible quantities: remaining {lot['Remaining_Unit_Qty']} > original {lot['Original_Unit_Qty']}",
+                    sku=sku,
+                    message=f"Lot {lot_id} has impossible quantities: remaining {remaining} > original {original}",
                     suggested_fix="Correct lot quantities or check for data corruption"
                 )
+            self._record_undetailed(invalid_quantities, ErrorCategory.DATA_CONFLICT, ErrorSeverity.HIGH,
+                                    "lots with remaining > original quantities",
+                                    "Correct lot quantities or check for data corruption")
         
         # Check for cost anomalies
         if 'Unit_Price' in lots_df.columns:
-            for sku in lots_df['SKU'].unique():
-                sku_lots = lots_df[lots_df['SKU'] == sku]
-                if len(sku_lots) > 1:
-                    avg_cost = sku_lots['Unit_Price'].mean()
-                    for idx, lot in sku_lots.iterrows():
-                        cost_variance = ((lot['Unit_Price'] - avg_cost) / avg_cost) * 100
-                        if abs(cost_variance) > 50:  # More than 50% variance
-                            self.error_manager.handle_cost_anomaly(
-                                sku=sku,
-                                current_cost=lot['Unit_Price'],
-                                average_cost=avg_cost,
-                                variance_percent=cost_variance
-                            )
+            # One groupby pass for every SKU's mean cost; only anomalous lots are visited
+            avg_series = lots_df.groupby('SKU')['Unit_Price'].transform('mean')
+            variance_series = (lots_df['Unit_Price'] - avg_series) / avg_series * 100
+            anomalous = variance_series.abs() > 50  # More than 50% variance
+            if anomalous.any():
+                # Report grouped by SKU in order of first appearance, as the lots are listed
+                mask = anomalous.to_numpy()
+                order = np.argsort(pd.factorize(lots_df['SKU'])[0][mask], kind='stable')
+                for sku, unit_price, avg_cost, cost_variance in zip(lots_df['SKU'].to_numpy()[mask][order].tolist(),
+                                                                    lots_df['Unit_Price'].to_numpy()[mask][order].tolist(),
+                                                                    avg_series.to_numpy()[mask][order].tolist(),
+                                                                    variance_series.to_numpy()[mask][order].tolist()):
+                    self.error_manager.handle_cost_anomaly(
+                        sku=sku,
+                        current_cost=unit_price,
+                        average_cost=avg_cost,
+                        variance_percent=cost_variance
+                    )
         
         self.logger.info(f"Inventory validation: {original_count} lots ({len(warnings)} warnings)")
         return lots_df, warnings
     
+    def _with_parsed_dates(self, df: pd.DataFrame, column: str, rows: str,
+                           warnings: List[str]) -> pd.DataFrame:
+        """
+        Coerce a date column to datetime64 and remove the rows whose date cannot be parsed,
+        recording an error for each so they are reported rather than processed with NaT dates.
+        """
+        parsed, unparseable = _with_datetime64(df, column)
+        if not unparseable.any():
+            return parsed
+        
+        # Report the values as given, before coercion turned them into NaT
+        flagged = df[unparseable]
+        warnings.append(f"Removed {len(flagged)} {rows} with unparseable {column}")
+        detail = flagged.iloc[:self.max_detail_errors]
+        for sku, value in zip(_column_values(detail, 'SKU', 'UNKNOWN').tolist(), detail[column].tolist()):
+            self.error_manager.record_error(
+                category=ErrorCategory.VALIDATION_ERROR,
+                severity=ErrorSeverity.HIGH,
+                sku=sku,
+                message=f"Unparseable {column} '{value}'; row excluded from processing",
+                suggested_fix=f"Correct {column} to a valid date and reprocess"
+            )
+        self._record_undetailed(flagged, ErrorCategory.VALIDATION_ERROR, ErrorSeverity.HIGH,
+                                f"{rows} with unparseable {column}",
+                                f"Correct {column} to a valid date and reprocess")
+        return parsed[~unparseable]
+    
+    def _record_undetailed(self, flagged: pd.DataFrame, category: ErrorCategory,
+                           severity: ErrorSeverity, description: str, suggested_fix: str):
+        """Record one summary error for flagged rows past max_detail_errors instead of one per row"""
+        if self.max_detail_errors is None or len(flagged) <= self.max_detail_errors:
+            return
+        undetailed = flagged.iloc[self.max_detail_errors:]
+        self.error_manager.record_error(
+            category=category,
+            severity=severity,
+            sku="SYSTEM",
+            message=f"{len(undetailed)} more {description} not itemized",
+            suggested_fix=suggested_fix,
+            data_context={'affected_skus': pd.unique(_column_values(undetailed, 'SKU', 'UNKNOWN')).tolist()}
+        )
+    
     def process_sku_safely(self, 
                           sku: str, 
                           sku_sales: pd.DataFrame, 
                           sku_lots: pd.DataFrame,
-                          existing_fifo_processor) -> Optional[Dict[str, Any]]:
+                          existing_fifo_processor,
+                          total_sales=None,
+                          total_available=None,
+                          earliest_sale_date=None,
+                          earliest_lot_date=None,
+                          already_sorted: bool = False) -> Optional[Dict[str, Any]]:
         """
         Process a single SKU with comprehensive error handling.
-        Returns processing results or None if SKU should be skipped.
+        Per-SKU totals and earliest dates may be passed in when the caller has
+        already aggregated them for the whole batch; otherwise they are computed here.
+        Pass already_sorted when sales and lots are already in date order.
+        Returns the SKU's totals, with its attributions written to attributions.jsonl,
+        or None if SKU should be skipped.
         """
-        try:
-            self.logger.info(f"Processing SKU {sku}: {len(sku_sales)} sales, {len(sku_lots)} lots")
-            
-            # Pre-processing validation
-            total_sales = sku_sales['Quantity_Sold'].sum()
-            total_available = sku_lots['Remaining_Unit_Qty'].sum()
-            
-            # Check for missing lots
-            if sku_lots.empty:
-                self.error_manager.handle_missing_lots(
-                    sku=sku,
-                    sales_qty=int(total_sales),
-                    sale_date=str(sku_sales['Sale_Date'].min())
-                )
-                return None
-            
-            # Check for insufficient inventory
-            if total_available < total_sales:
-                lot_details = []
-                for _, lot in sku_lots.iterrows():
-                    lot_details.append({
-                        'lot_id': lot.get('Lot_ID', 'UNKNOWN'),
-                        'received_date': str(lot.get('Received_Date', '')),
-                        'remaining': int(lot['Remaining_Unit_Qty'])
-                    })
-                
-                self.error_manager.handle_negative_inventory(
-                    sku=sku,
-                    requested_qty=int(total_sales),
-                    available_qty=int(total_available),
-                    lot_details=lot_details
-                )
-                return None
-            
-            # Check for date mismatches
-            earliest_lot_date = sku_lots['Received_Date'].min()
-            earliest_sale_date = sku_sales['Sale_Date'].min()
-            
-            if pd.notna(earliest_lot_date) and pd.notna(earliest_sale_date):
-                if earliest_sale_date < earliest_lot_date:
-                    self.error_manager.handle_date_mismatch(
-                        sku=sku,
-                        sale_date=str(earliest_sale_date),
-                        earliest_lot_date=str(earliest_lot_date)
-                    )
-                    # Continue processing with warning (not blocking)
-            
-            # Attempt FIFO processing using existing processor
-            # This would integrate with the existing fifo_calculator_supabase.py logic
-            result = self._process_fifo_for_sku(sku, sku_sales, sku_lots, existing_fifo_processor)
-            
-            if result:
-                self.logger.info(f"✅ Successfully processed SKU {sku}: COGS ${result.get('total_cogs', 0):.2f}")
-                return result
-            else:
-                self.logger.warning(f"⚠️ SKU {sku} processing returned no results")
-                return None
-                
-        except Exception as e:
-            # Catch any unexpected errors and isolate them
-            self.logger.error(f"❌ Error processing SKU {sku}: {e}")
+        result = _process_sku(sku, sku_sales, sku_lots, existing_fifo_processor,
+                              self.error_manager, self.logger,
+                              total_sales=total_sales,
+                              total_available=total_available,
+                              earliest_sale_date=earliest_sale_date,
+                              earliest_lot_date=earliest_lot_date,
+                              already_sorted=already_sorted)
+        return self._emit_attributions(result)
+    
+    def _merge_worker_result(self, result: Optional[Dict[str, Any]], errors) -> Optional[Dict[str, Any]]:
+        """Re-record errors from a pool worker on this processor and emit its attributions"""
+        for error in errors:
             self.error_manager.record_error(
-                category=ErrorCategory.SYSTEM_ERROR,
-                severity=ErrorSeverity.HIGH,
-                sku=sku,
-                message=f"Unexpected error during processing: {str(e)}",
-                suggested_fix="Review SKU data and processing logs for details",
-                data_context={'exception': str(e), 'exception_type': type(e).__name__}
+                category=error.category,
+                severity=error.severity,
+                sku=error.sku,
+                message=error.message,
+                suggested_fix=error.suggested_fix,
+                data_context=error.data_context or None
             )
-            return None
+        return self._emit_attributions(result)
     
-    def _process_fifo_for_sku(self, 
-                             sku: str, 
-                             sku_sales: pd.DataFrame, 
-                             sku_lots: pd.DataFrame,
-                             existing_processor) -> Optional[Dict[str, Any]]:
+    def _emit_attributions(self, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Write a SKU result's attributions to attributions.jsonl, keeping only its totals"""
+        if result:
+            attributions = result.pop('attributions', None)
+            if attributions is not None:
+                self._attr_file.writelines(json.dumps(attr, default=str) + '\n'
+                                           for attr in attributions.to_dict('records'))
+        return result
+    
+    def process_batch_safely(self, 
+                           sales_df: pd.DataFrame, 
+                           lots_df: pd.DataFrame,
+                           existing_processor=None,
+                           processes: Optional[int] = 1) -> Dict[str, Any]:
         """
-        Wrapper for existing FIFO processing logic.
-        This would integrate with the production fifo_calculator_supabase.py
+        Process entire batch with comprehensive error handling and isolation.
+        With processes > 1 (or None for one per CPU) SKUs are processed in a worker pool.
         """
-        # This is a placeholder for integration with existing FIFO logic
-        # In real implementation, this would call the existing FIFO calculator
-        # while maintaining error isolation
+        try:
+            self._open_outputs()
+            self.logger.info("Starting safe batch processing...")
+            self.stats['start_time'] = datetime.now()
+        
+            # Validate input data
+            try:
+                clean_sales, sales_warnings = self.validate_sales_data(sales_df)
+                clean_lots, lots_warnings = self.validate_inventory_data(lots_df)
+            except ValueError as e:
+                # Critical validation error - cannot continue
+                self.logger.error(f"Critical validation error: {e}")
+                return self._generate_failure_report(str(e))
+            clean_sales, clean_lots = _with_shared_sku_categories(clean_sales, clean_lots)
+        
+            # One stable sort per frame puts every SKU's rows in FIFO order, so the
+            # per-SKU groups need no further sorting. Lots without Received_Date are
+            # left to each SKU, which reports the missing column as its own error.
+            lots_dated = 'Received_Date' in clean_lots.columns
+            clean_sales = clean_sales.sort_values(['SKU', 'Sale_Date'], kind='stable')
+            clean_lots = clean_lots.sort_values(['SKU', 'Received_Date'] if lots_dated else ['SKU'],
+                                                kind='stable')
+        
+            # Get unique SKUs and prepare for processing. The shared categories are
+            # sorted, so a union of category codes yields the SKUs in sorted order.
+            sales_codes = clean_sales['SKU'].cat.codes.unique()
+            inventory_codes = clean_lots['SKU'].cat.codes.unique()
+            sales_codes = sales_codes[sales_codes >= 0]
+            inventory_codes = inventory_codes[inventory_codes >= 0]
+            all_codes = np.union1d(sales_codes, inventory_codes)
+            all_skus = clean_sales['SKU'].cat.categories[all_codes]
         
+            sales_skus = clean_sales['SKU'].cat.categories[np.sort(sales_codes)]
+        
+            self.stats['total_skus'] = len(all_skus)
+            self.stats['inventory_only_skus'] = len(all_skus) - len(sales_skus)
+            self.stats['total_sales'] = len(clean_sales)
+        
+            self.logger.info(f"Processing {len(all_skus)} unique SKUs")
+            self.logger.info(f"SKUs with sales: {len(sales_codes)}")
+            self.logger.info(f"SKUs with inventory: {len(inventory_codes)}")
+            self.logger.info(f"Skipping {self.stats['inventory_only_skus']} inventory-only SKUs: no sales data")
+        
+            # Process each SKU with sales individually with error isolation
+            successful_results = []
+            with self._sku_worker_pool(processes, existing_processor) as pool:
+                self._process_sku_partitions(clean_sales, clean_lots, sales_skus,
+                                             existing_processor, successful_results, pool,
+                                             already_sorted=lots_dated)
+        
+            # Finalize processing
+            self.stats['end_time'] = datetime.now()
+            self.stats['total_errors'] = len(self.error_manager.errors)
+        
+            # Generate comprehensive results
+            return self._generate_processing_report(successful_results)
+        finally:
+            self.close()
+    
+    def process_batch_streaming(self,
+                                sales_path: str,
+                                lots_path: str,
+                                chunksize: int = 100_000,
+                                existing_processor=None,
+                                processes: Optional[int] = 1) -> Dict[str, Any]:
+        """
+        Process sales and lots CSV files that are both sorted by SKU without loading either
+        file whole. Rows are read chunksize at a time and each SKU is processed as soon as
+        all of its sales and lots have streamed through, so memory is bounded by a chunk.
+        Inputs are validated block by block; unsorted input fails the batch.
+        """
         try:
-            # Sort lots by date (FIFO order)
-            sorted_lots = sku_lots.sort_values('Received_Date')
-            
-            # Sort sales by date
-            sorted_sales = sku_sales.sort_values('Sale_Date')
+            self._open_outputs()
+            self.logger.info("Starting streaming batch processing...")
+            self.stats['start_time'] = datetime.now()
+            successful_results = []
+        
+            try:
+                # Fail fast on missing columns before any SKU is processed
+                self.validate_sales_data(pd.read_csv(sales_path, nrows=0))
             
-            # Simulate FIFO processing (in real implementation, use existing logic)
-            attributions = []
-            remaining_lots = sorted_lots.copy()
+                with self._sku_worker_pool(processes, existing_processor) as pool:
+                    lot_blocks = _read_sku_blocks(lots_path, chunksize)
+                    pending_lots = next(lot_blocks, None)
+                    lots_header = pd.read_csv(lots_path, nrows=0, dtype={'SKU': str})
             
-            for _, sale in sorted_sales.iterrows():
-                sale_qty = sale['Quantity_Sold']
-                sale_date = sale['Sale_Date']
-                remaining_to_allocate = sale_qty
+                    for sales_block in _read_sku_blocks(sales_path, chunksize):
+                        # Gather every lot up to and including the block's last SKU
+                        last_sku = sales_block['SKU'].iloc[-1]
+                        lot_parts = []
+                        while pending_lots is not None:
+                            through = (pending_lots['SKU'] <= last_sku).to_numpy()
+                            lot_parts.append(pending_lots[through])
+                            if not through.all():
+                                pending_lots = pending_lots[~through]
+                                break
+                            pending_lots = next(lot_blocks, None)
+                        lots_block = pd.concat(lot_parts, ignore_index=True) if lot_parts else lots_header
                 
-                for lot_idx, lot in remaining_lots.iterrows():
-                    if remaining_to_allocate <= 0:
-                        break
-                    
-                    available = lot['Remaining_Unit_Qty']
-                    if available <= 0:
-                        continue
-                    
-                    allocated = min(remaining_to_allocate, available)
-                    
-                    # Create attribution record
-                    attribution = {
-                        'sale_date': sale_date,
-                        'sku': sku,
-                        'lot_id': lot.get('Lot_ID', 'UNKNOWN'),
-                        'allocated_qty': allocated,
-                        'unit_cost': lot.get('Unit_Price', 0) + lot.get('Freight_Cost_Per_Unit', 0),
-                        'total_cost': allocated * (lot.get('Unit_Price', 0) + lot.get('Freight_Cost_Per_Unit', 0))
-                    }
-                    attributions.append(attribution)
-                    
-                    # Update remaining quantity
-                    remaining_lots.loc[lot_idx, 'Remaining_Unit_Qty'] -= allocated
-                    remaining_to_allocate -= allocated
-                
-                if remaining_to_allocate > 0:
-                    # This should have been caught earlier, but double-check
-                    raise ValueError(f"Could not fully allocate sale: {remaining_to_allocate} units remaining")
-            
-            # Calculate totals
-            total_cogs = sum(attr['total_cost'] for attr in attributions)
-            total_qty = sum(attr['allocated_qty'] for attr in attributions)
-            
-            return {
-                'sku': sku,
-                'attributions': attributions,
-                'total_cogs': total_cogs,
-                'total_quantity': total_qty,
-                'average_cost': total_cogs / total_qty if total_qty > 0 else 0
-            }
+                        clean_sales, _ = self.validate_sales_data(sales_block)
+                        clean_lots, _ = self.validate_inventory_data(lots_block)
+                        block_sales_skus = set(clean_sales['SKU'].unique())
+                        block_skus = block_sales_skus | set(clean_lots['SKU'].unique())
+                        self.stats['total_skus'] += len(block_skus)
+                        self.stats['inventory_only_skus'] += len(block_skus) - len(block_sales_skus)
+                        self.stats['total_sales'] += len(clean_sales)
+                        self._process_sku_partitions(clean_sales, clean_lots, sorted(block_sales_skus),
+                                                     existing_processor, successful_results, pool)
             
-        except Exception as e:
-            self.logger.error(f"FIFO processing error for {sku}: {e}")
-            raise
+                    # Lots sorting after the last sale only count as SKUs without sales
+                    while pending_lots is not None:
+                        clean_lots, _ = self.validate_inventory_data(pending_lots)
+                        block_skus = clean_lots['SKU'].nunique()
+                        self.stats['total_skus'] += block_skus
+                        self.stats['inventory_only_skus'] += block_skus
+                        pending_lots = next(lot_blocks, None)
+            except ValueError as e:
+                # Critical validation error - cannot continue
+                self.logger.error(f"Critical validation error: {e}")
+                return self._generate_failure_report(str(e))
+        
+            self.logger.info(f"Processed {self.stats['total_skus']} unique SKUs "
+                             f"({self.stats['inventory_only_skus']} inventory-only SKUs skipped: no sales data)")
+        
+            # Finalize processing
+            self.stats['end_time'] = datetime.now()
+            self.stats['total_errors'] = len(self.error_manager.errors)
+        
+            return self._generate_processing_report(successful_results)
+        finally:
+            self.close()
     
-    def process_batch_safely(self, 
-                           sales_df: pd.DataFrame, 
-                           lots_df: pd.DataFrame,
-                           existing_processor=None) -> Dict[str, Any]:
+    def _process_sku_partitions(self,
+                                clean_sales: pd.DataFrame,
+                                clean_lots: pd.DataFrame,
+                                sales_skus,
+                                existing_processor,
+                                successful_results: List[Dict],
+                                pool=None,
+                                already_sorted: bool = False):
         """
-        Process entire batch with comprehensive error handling and isolation.
+        Process every SKU in sales_skus, in the order given, against validated sales and lots
+        frames that hold all rows for those SKUs, appending successful results and updating
+        statistics. Every SKU in sales_skus must have rows in clean_sales. Pass already_sorted
+        when both frames are sorted by date within each SKU.
+        SKUs are farmed out to pool when one is given and results are taken in SKU order.
         """
-        self.logger.info("Starting safe batch processing...")
-        self.stats['start_time'] = datetime.now()
+        # Partition sales and lots by SKU in one pass each instead of
+        # re-scanning the full frames with a boolean mask for every SKU
+        sales_by_sku = clean_sales.groupby('SKU', sort=False, observed=True)
+        lots_by_sku = clean_lots.groupby('SKU', sort=False, observed=True)
+        sales_groups = {sku: group for sku, group in sales_by_sku}
+        lots_groups = {sku: group for sku, group in lots_by_sku}
+        empty_lots = clean_lots.iloc[:0]
         
-        # Validate input data
-        try:
-            clean_sales, sales_warnings = self.validate_sales_data(sales_df)
-            clean_lots, lots_warnings = self.validate_inventory_data(lots_df)
-        except ValueError as e:
-            # Critical validation error - cannot continue
-            self.logger.error(f"Critical validation error: {e}")
-            return self._generate_failure_report(str(e))
-        
-        # Get unique SKUs and prepare for processing
-        all_skus = set(clean_sales['SKU'].unique()) | set(clean_lots['SKU'].unique())
-        sales_skus = set(clean_sales['SKU'].unique())
-        inventory_skus = set(clean_lots['SKU'].unique())
-        
-        self.stats['total_skus'] = len(all_skus)
-        self.stats['total_sales'] = len(clean_sales)
-        
-        self.logger.info(f"Processing {len(all_skus)} unique SKUs")
-        self.logger.info(f"SKUs with sales: {len(sales_skus)}")
-        self.logger.info(f"SKUs with inventory: {len(inventory_skus)}")
-        
-        # Process each SKU individually with error isolation
-        successful_results = []
-        
-        for sku in sorted(all_skus):
-            sku_sales = clean_sales[clean_sales['SKU'] == sku]
-            sku_lots = clean_lots[clean_lots['SKU'] == sku]
-            
-            # Only process SKUs that have both sales and inventory
-            if sku_sales.empty:
-                self.logger.info(f"Skipping {sku}: no sales data")
-                continue
+        # Per-SKU totals and earliest dates, aggregated once for the batch
+        sales_totals = sales_by_sku['Quantity_Sold'].sum().to_dict()
+        earliest_sale_dates = sales_by_sku['Sale_Date'].min().to_dict()
+        lots_totals = lots_by_sku['Remaining_Unit_Qty'].sum().to_dict()
+        # Lots without dates fail per SKU in FIFO ordering, not here for the whole batch
+        earliest_lot_dates = (lots_by_sku['Received_Date'].min().to_dict()
+                              if 'Received_Date' in clean_lots.columns else {})
+        
+        tasks = []
+        for sku in sales_skus:
+            sku_sales = sales_groups[sku]
+            sku_lots = lots_groups.get(sku, empty_lots)
             
             if sku_lots.empty:
                 # This will be handled by process_sku_safely
                 pass
             
-            # Process SKU with error isolation
-            result = self.process_sku_safely(sku, sku_sales, sku_lots, existing_processor)
+            if pool is not None:
+                # Each task is pickled for a worker; without this every per-SKU
+                # frame would carry the batch's full list of SKU categories
+                sku_sales = _with_used_sku_categories(sku_sales)
+                sku_lots = _with_used_sku_categories(sku_lots)
             
+            tasks.append((sku, sku_sales, sku_lots, {
+                'total_sales': sales_totals[sku],
+                'total_available': lots_totals.get(sku, 0),
+                'earliest_sale_date': earliest_sale_dates[sku],
+                'earliest_lot_date': earliest_lot_dates.get(sku, pd.NaT),
+                'already_sorted': already_sorted
+            }))
+        
+        # Process SKU with error isolation
+        if pool is None:
+            results = (self.process_sku_safely(sku, sku_sales, sku_lots, existing_processor, **totals)
+                       for sku, sku_sales, sku_lots, totals in tasks)
+        else:
+            results = (self._merge_worker_result(result, errors)
+                       for result, errors in pool.imap(_process_sku_task, tasks, chunksize=32))
+        
+        for (sku, sku_sales, _, _), result in zip(tasks, results):
             if result:
                 successful_results.append(result)
                 self.stats['processed_skus'] += 1
@@ -378,13 +883,28 @@ class FIFOSafeProcessor:
             else:
                 self.skipped_skus.append(sku)
                 self.stats['skipped_skus'] += 1
+    
+    @contextmanager
+    def _sku_worker_pool(self, processes: Optional[int], existing_processor):
+        """
+        Worker pool for per-SKU processing whose log records drain into processing.log,
+        or None when processes is 1 or less and SKUs run in this process.
+        """
+        if processes is not None and processes <= 1:
+            yield None
+            return
         
-        # Finalize processing
-        self.stats['end_time'] = datetime.now()
-        self.stats['total_errors'] = len(self.error_manager.errors)
-        
-        # Generate comprehensive results
-        return self._generate_processing_report(successful_results)
+        log_queue = multiprocessing.Queue(-1)
+        listener = QueueListener(log_queue, self._file_handler)
+        listener.start()
+        pool = multiprocessing.Pool(processes, initializer=_init_sku_worker,
+                                    initargs=(log_queue, existing_processor))
+        try:
+            yield pool
+        finally:
+            pool.close()
+            pool.join()
+            listener.stop()
     
     def _generate_processing_report(self, successful_results: List[Dict]) -> Dict[str, Any]:
         """Generate comprehensive processing report"""
@@ -415,14 +935,22 @@ class FIFOSafeProcessor:
             'output_files': {
                 'processing_log': os.path.join(self.output_dir, "processing.log"),
                 'error_reports': error_reports,
+                'attributions_jsonl': self.attributions_file,
                 'results_json': os.path.join(self.output_dir, "processing_results.json")
             }
         }
         
         # Export detailed results
         results_file = report['output_files']['results_json']
-        with open(results_file, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        if orjson is not None:
+            # Datetimes are passed through to default=str so they render as with json
+            option = (orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+                      | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+            with open(results_file, 'wb') as f:
+                f.write(orjson.dumps(report, default=str, option=option))
+        else:
+            with open(results_file, 'w') as f:
+                json.dump(report, f, indent=2, default=str)
         
         # Log summary
         self.logger.info("=" * 60)
@@ -486,6 +1014,9 @@ def create_safe_wrapper_for_existing_processor(existing_processor_func, output_d
             
             # Return error report instead of crashing
             return processor._generate_failure_report(str(e))
+        
+        finally:
+            processor.close()
     
     return safe_wrapper
 
@@ -4,13 +4,19 @@ in uploaded CSV files before validation.
 """
 
 from typing import Dict, List, Optional, Tuple, Any
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 import re
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
+try:
+    import re2 as _name_regex
+except ImportError:  # optional; google-re2 matches column names in linear time
+    _name_regex = re
+
 
 class FileType(Enum):
     """Detected file types"""
@@ -39,6 +45,71 @@ class NumberFormat(Enum):
     UNKNOWN = "unknown"
 
 
+# Value patterns per format; formats are tried in order and the first match decides
+_DATE_PATTERNS = {
+    DateFormat.MONTH_YEAR: [
+        r'^[A-Za-z]{3,9}\s+\d{4}$',  # July 2024, January 2024
+        r'^[A-Za-z]{3}\s+\d{4}$',    # Jul 2024, Jan 2024
+    ],
+    DateFormat.FULL_DATE: [
+        r'^\d{4}-\d{1,2}-\d{1,2}$',  # 2024-07-31
+        r'^\d{1,2}/\d{1,2}/\d{2,4}$',  # 7/5/24, 7/5/2024
+        r'^[A-Za-z]{3}-\d{2}$',      # Jul-24
+    ],
+    DateFormat.MONTH_ONLY: [
+        r'^\d{4}-\d{1,2}$',          # 2024-07
+        r'^\d{1,2}/\d{4}$',          # 07/2024
+    ]
+}
+
+_NUMBER_PATTERNS = {
+    NumberFormat.CURRENCY: [r'^\$?[\d,]+\.?\d*$'],      # $1,234.56
+    NumberFormat.PERCENTAGE: [r'^\d+\.?\d*%$'],         # 15.5%
+    NumberFormat.SCIENTIFIC: [r'^\d+\.?\d*[eE][+-]?\d+$'], # 1.23E+04
+    NumberFormat.DECIMAL: [r'^\d+\.\d+$'],              # 123.45
+    NumberFormat.INTEGER: [r'^\d+$'],                   # 123
+}
+
+
+def _format_lexer(patterns: Dict[Enum, List[str]]) -> re.Pattern:
+    """Compile value patterns into one alternation with a group named after each format"""
+    return re.compile("|".join(
+        f"(?P<{fmt.name}>{'|'.join(pattern_list)})" for fmt, pattern_list in patterns.items()
+    ))
+
+
+_DATE_LEXER = _format_lexer(_DATE_PATTERNS)
+_NUMBER_LEXER = _format_lexer(_NUMBER_PATTERNS)
+
+# Column cleanup: pandas' placeholder names for headerless columns, and line breaks inside names
+_UNNAMED_COLUMN = re.compile(r'^Unnamed')
+_LINE_BREAK = re.compile(r'[\r\n]')
+
+# Word characters other than digits and underscores, i.e. letters in any script
+_LETTER_PATTERN = re.compile(r'[^\W\d_]')
+
+
+def _compile_patterns(patterns: Dict[str, List[str]]) -> Dict[str, re.Pattern]:
+    """Compile each field's column name patterns into one case-insensitive alternation"""
+    # One capturing group per pattern, so match.lastindex tells which pattern
+    # hit; inline (?i) rather than a flag argument, which re2 does not take
+    return {
+        field: _name_regex.compile("(?i)" + "|".join(f"({pattern})" for pattern in pattern_list))
+        for field, pattern_list in patterns.items()
+    }
+
+
+def _pattern_weight(pattern: re.Pattern, name: str) -> int:
+    """
+    Priority of the first of a field's patterns matching a column name, or 0.
+    
+    Every pattern starts with '.*', so all hits begin at position 0 and the
+    alternation picks the earliest listed pattern; earlier patterns weigh more.
+    """
+    match = pattern.search(name)
+    return pattern.groups + 1 - match.lastindex if match else 0
+
+
 @dataclass
 class ColumnInfo:
     """Information about a detected column"""
@@ -58,6 +129,23 @@ class ColumnInfo:
             self.issues = []
 
 
+def _columns_frame(columns: Dict[str, ColumnInfo]) -> pd.DataFrame:
+    """Column-per-field table of ColumnInfo attributes, indexed by original column name"""
+    infos = list(columns.values())
+    return pd.DataFrame(
+        {
+            'name': [col.name for col in infos],
+            'data_type': [col.data_type for col in infos],
+            'null_count': np.fromiter((col.null_count for col in infos), dtype=np.int64, count=len(infos)),
+            'null_percentage': np.fromiter((col.null_percentage for col in infos), dtype=np.float64, count=len(infos)),
+            'unique_count': np.fromiter((col.unique_count for col in infos), dtype=np.int64, count=len(infos)),
+            'format_type': [col.format_type for col in infos],
+            'confidence': np.fromiter((col.confidence for col in infos), dtype=np.float64, count=len(infos)),
+        },
+        index=pd.Index([col.original_name for col in infos], dtype=object, name='original_name')
+    )
+
+
 @dataclass 
 class FormatDetectionResult:
     """Complete format detection result"""
@@ -68,6 +156,16 @@ class FormatDetectionResult:
     issues: List[str]
     recommendations: List[str]
     sample_data: pd.DataFrame
+    # Standard field -> {column original name: match score} for the detected file type
+    pattern_hits: Dict[str, Dict[str, int]] = None
+    # The scalar ColumnInfo fields as one table, for bulk queries across columns
+    columns_meta: pd.DataFrame = None
+    
+    def __post_init__(self):
+        if self.pattern_hits is None:
+            self.pattern_hits = {}
+        if self.columns_meta is None:
+            self.columns_meta = _columns_frame(self.columns)
 
 
 class FormatDetector:
@@ -76,23 +174,24 @@ class FormatDetector:
     to determine the best processing approach.
     """
     
-    # Column name patterns for sales data
+    # Column name patterns for sales data, most preferred first; a pattern
+    # listed after a more general one could never win, so specific ones lead
     SALES_PATTERNS = {
         'sku': [
-            r'.*sku.*', r'.*product.*', r'.*item.*', r'.*part.*number.*',
-            r'.*product.*code.*', r'.*item.*code.*'
+            r'.*sku.*', r'.*product.*code.*', r'.*product.*', r'.*item.*code.*',
+            r'.*item.*', r'.*part.*number.*'
         ],
         'quantity': [
             r'.*units.*moved.*', r'.*quantity.*sold.*', r'.*qty.*', r'.*quantity.*',
             r'.*units.*', r'.*sold.*', r'.*volume.*'
         ],
         'date': [
-            r'.*month.*', r'.*date.*', r'.*period.*', r'.*sales.*date.*',
-            r'.*transaction.*date.*', r'.*sale.*date.*'
+            r'.*sales.*date.*', r'.*sale.*date.*', r'.*transaction.*date.*',
+            r'.*month.*', r'.*date.*', r'.*period.*'
         ]
     }
     
-    # Column name patterns for lots data
+    # Column name patterns for lots data, most preferred first (specific before general)
     LOTS_PATTERNS = {
         'lot_id': [
             r'.*lot.*id.*', r'.*po.*number.*', r'.*purchase.*order.*',
@@ -102,8 +201,8 @@ class FormatDetector:
             r'.*sku.*', r'.*product.*', r'.*item.*', r'.*part.*number.*'
         ],
         'received_date': [
-            r'.*received.*date.*', r'.*date.*', r'.*received.*', 
-            r'.*purchase.*date.*', r'.*delivery.*date.*'
+            r'.*received.*date.*', r'.*purchase.*date.*', r'.*delivery.*date.*',
+            r'.*date.*', r'.*received.*'
         ],
         'original_quantity': [
             r'.*original.*quantity.*', r'.*original.*unit.*qty.*',
@@ -117,54 +216,104 @@ class FormatDetector:
             r'.*unit.*price.*', r'.*price.*', r'.*cost.*', r'.*rate.*'
         ],
         'freight_cost': [
-            r'.*freight.*cost.*', r'.*freight.*', r'.*shipping.*cost.*',
-            r'.*delivery.*cost.*', r'.*actual.*freight.*'
+            r'.*freight.*cost.*', r'.*actual.*freight.*', r'.*freight.*',
+            r'.*shipping.*cost.*', r'.*delivery.*cost.*'
         ]
     }
     
-    def __init__(self):
+    _SALES_REGEXES = _compile_patterns(SALES_PATTERNS)
+    _LOTS_REGEXES = _compile_patterns(LOTS_PATTERNS)
+    
+    def __init__(self, cache_size: int = 32):
         self.issues = []
         self.recommendations = []
+        # Most recently used results, keyed by _fingerprint()
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, FormatDetectionResult]" = OrderedDict()
     
-    def detect_format(self, df: pd.DataFrame) -> FormatDetectionResult:
+    def detect_format(self, df: pd.DataFrame, *,
+                      max_rows: Optional[int] = 10_000) -> FormatDetectionResult:
         """
         Analyze dataframe structure and detect the most likely format.
         
         Args:
             df: Raw pandas DataFrame from CSV
+            max_rows: Analyze only the first max_rows rows (None for all). Rows
+                past the sample count toward row_count without the empty-row check.
             
         Returns:
             FormatDetectionResult with detailed analysis
         """
+        sampled = max_rows is not None and len(df) > max_rows
+        sample = df.head(max_rows) if sampled else df
+        
+        key = self._fingerprint(sample, len(df))
+        cached = self._cache.get(key) if key is not None else None
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.issues = cached.issues.copy()
+            self.recommendations = cached.recommendations.copy()
+            return self._detached(cached)
+        
         self.issues = []
         self.recommendations = []
         
         # Clean up dataframe for analysis
-        df_clean = self._clean_for_analysis(df)
+        df_clean = self._clean_for_analysis(sample)
         
-        # Analyze each column
+        # Analyze each column, with null and unique counts taken frame-wide
+        null_counts = df_clean.isna().sum().tolist()
+        unique_counts = df_clean.nunique().tolist()
         columns_info = {}
-        for col in df_clean.columns:
-            columns_info[col] = self._analyze_column(df_clean[col], col)
+        for (col, series), null_count, unique_count in zip(df_clean.items(), null_counts, unique_counts):
+            columns_info[col] = self._analyze_column(series, col, null_count, unique_count)
+        
+        columns_meta = _columns_frame(columns_info)
+        
+        # Match column names against both pattern sets once; mapping reuses the hits
+        column_names = pd.Index(columns_meta['name'], dtype=object)
+        sales_matches = self._match_matrix(column_names, self._SALES_REGEXES)
+        lots_matches = self._match_matrix(column_names, self._LOTS_REGEXES)
         
         # Determine file type
-        file_type, type_confidence = self._detect_file_type(columns_info)
+        file_type, type_confidence = self._detect_file_type(sales_matches, lots_matches)
+        if file_type == FileType.SALES_DATA:
+            pattern_hits = self._pattern_hits(columns_info, self._SALES_REGEXES, sales_matches)
+        elif file_type == FileType.LOTS_DATA:
+            pattern_hits = self._pattern_hits(columns_info, self._LOTS_REGEXES, lots_matches)
+        else:
+            pattern_hits = {}
         
         # Generate recommendations
-        self._generate_recommendations(columns_info, file_type)
+        self._generate_recommendations(columns_meta, file_type)
         
         # Create sample data (first 5 rows)
         sample_data = df_clean.head(5)
         
-        return FormatDetectionResult(
+        result = FormatDetectionResult(
             file_type=file_type,
             confidence=type_confidence,
             columns=columns_info,
-            row_count=len(df_clean),
+            row_count=len(df_clean) + (len(df) - len(sample)),
             issues=self.issues.copy(),
             recommendations=self.recommendations.copy(),
-            sample_data=sample_data
+            sample_data=sample_data,
+            pattern_hits=pattern_hits,
+            columns_meta=columns_meta
         )
+        
+        if key is not None and self.cache_size > 0:
+            self._cache[key] = self._detached(result)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
+        return result
+    
+    @staticmethod
+    def _detached(result: FormatDetectionResult) -> FormatDetectionResult:
+        """Copy of result whose issue and recommendation lists callers may mutate freely"""
+        return replace(result, issues=result.issues.copy(),
+                       recommendations=result.recommendations.copy())
     
     def suggest_column_mapping(self, detection_result: FormatDetectionResult) -> Dict[str, str]:
         """
@@ -176,49 +325,68 @@ class FormatDetector:
         Returns:
             Dictionary mapping standard names to detected column names
         """
-        columns = detection_result.columns
-        file_type = detection_result.file_type
+        mapping = {}
         
-        if file_type == FileType.SALES_DATA:
-            return self._suggest_sales_mapping(columns)
-        elif file_type == FileType.LOTS_DATA:
-            return self._suggest_lots_mapping(columns)
-        else:
-            return {}
+        # Highest scoring column per field; ties go to the earliest column
+        for standard_field, hits in detection_result.pattern_hits.items():
+            best_match = max(hits, key=hits.get) if hits else None
+            if best_match:
+                mapping[standard_field] = best_match
+        
+        return mapping
+    
+    def _fingerprint(self, sample: pd.DataFrame, row_count: int) -> Optional[tuple]:
+        """Cache key for an analyzed sample: its columns, shape and a hash of every cell"""
+        try:
+            content_hash = int(pd.util.hash_pandas_object(sample).sum())
+        except TypeError:
+            # Unhashable cell values (lists, dicts) - skip caching
+            return None
+        return (tuple(sample.columns), sample.shape, row_count, content_hash)
     
     def _clean_for_analysis(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean dataframe for analysis purposes"""
-        # Remove completely unnamed columns
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+        # Keep named columns up to the last one holding any data, dropping
+        # unnamed columns and trailing empty ones in a single projection
+        keep = ~df.columns.str.match(_UNNAMED_COLUMN)
+        has_data = keep & df.notna().any(axis=0).to_numpy()
+        if has_data.any():
+            keep &= np.arange(len(keep)) <= np.flatnonzero(has_data)[-1]
+        else:
+            keep[:] = False
+        df = df.loc[:, keep]
         
         # Remove completely empty rows
         df = df.dropna(how='all')
         
         # Clean column names
-        df.columns = df.columns.str.strip().str.replace('\n', ' ').str.replace('\r', ' ')
-        
-        # Remove trailing empty columns
-        for col in df.columns[::-1]:
-            if df[col].isna().all():
-                df = df.drop(columns=[col])
-            else:
-                break
+        df.columns = df.columns.str.strip().str.replace(_LINE_BREAK, ' ', regex=True)
         
         return df
     
-    def _analyze_column(self, series: pd.Series, col_name: str) -> ColumnInfo:
+    def _analyze_column(self, series: pd.Series, col_name: str,
+                        null_count: int, unique_count: int) -> ColumnInfo:
         """Analyze a single column to determine its characteristics"""
         # Basic statistics
-        null_count = series.isna().sum()
         null_percentage = null_count / len(series) if len(series) > 0 else 1.0
-        unique_count = series.nunique()
-        
-        # Sample non-null values
-        non_null_series = series.dropna()
-        sample_values = non_null_series.head(5).tolist() if len(non_null_series) > 0 else []
         
-        # Detect data type and format
-        data_type, format_type, confidence = self._detect_column_type(non_null_series)
+        is_empty = null_count == len(series)
+        if is_empty:
+            # Nothing to sample or type-detect
+            sample_values = []
+            data_type, format_type, confidence = str, None, 0.0
+        else:
+            # Sample non-null values
+            non_null_series = series.dropna()
+            values = non_null_series.to_numpy()
+            if values.dtype.kind in 'mM':
+                # Keep Timestamps rather than the raw datetime64 integers
+                sample_values = non_null_series.iloc[:5].tolist()
+            else:
+                sample_values = values[:5].tolist()
+            
+            # Detect data type and format
+            data_type, format_type, confidence = self._detect_column_type(non_null_series)
         
         # Column-specific issues
         issues = []
@@ -226,7 +394,7 @@ class FormatDetector:
             issues.append(f"High null percentage: {null_percentage:.1%}")
         if unique_count == 1:
             issues.append("Column has only one unique value")
-        if len(non_null_series) == 0:
+        if is_empty:
             issues.append("Column is completely empty")
         
         return ColumnInfo(
@@ -247,18 +415,30 @@ class FormatDetector:
         if len(series) == 0:
             return str, None, 0.0
         
+        # Columns pandas already parsed need no pattern matching
+        dtype = series.dtype
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return datetime, DateFormat.FULL_DATE, 1.0
+        if pd.api.types.is_integer_dtype(dtype):
+            return float, NumberFormat.INTEGER, 1.0
+        if pd.api.types.is_float_dtype(dtype):
+            return float, NumberFormat.DECIMAL, 1.0
+        
+        # Normalize the sample once for every detector below
+        sample = series.head(10).astype(str).str.strip()
+        
         # Try to detect dates first
-        date_format, date_confidence = self._detect_date_format(series)
+        date_format, date_confidence = self._detect_date_format(sample)
         if date_confidence > 0.7:
             return datetime, date_format, date_confidence
         
         # Try to detect numbers
-        number_format, number_confidence = self._detect_number_format(series)
+        number_format, number_confidence = self._detect_number_format(sample)
         if number_confidence > 0.7:
             return float, number_format, number_confidence
         
         # Check if it's mostly strings
-        string_confidence = self._detect_string_confidence(series)
+        string_confidence = self._detect_string_confidence(sample)
         
         # Return the most confident detection
         detections = [
@@ -270,10 +450,9 @@ class FormatDetector:
         best_detection = max(detections, key=lambda x: x[2])
         return best_detection
     
-    def _detect_date_format(self, series: pd.Series) -> Tuple[DateFormat, float]:
-        """Detect date format in a series"""
-        sample_size = min(10, len(series))
-        sample = series.head(sample_size).astype(str)
+    def _detect_date_format(self, sample: pd.Series) -> Tuple[DateFormat, float]:
+        """Detect date format in a sample of stripped string values"""
+        sample_size = len(sample)
         
         format_scores = {
             DateFormat.MONTH_YEAR: 0.0,
@@ -282,37 +461,15 @@ class FormatDetector:
             DateFormat.MIXED: 0.0
         }
         
-        # Date patterns to test
-        patterns = {
-            DateFormat.MONTH_YEAR: [
-                r'^[A-Za-z]{3,9}\s+\d{4}$',  # July 2024, January 2024
-                r'^[A-Za-z]{3}\s+\d{4}$',    # Jul 2024, Jan 2024
-            ],
-            DateFormat.FULL_DATE: [
-                r'^\d{4}-\d{1,2}-\d{1,2}$',  # 2024-07-31
-                r'^\d{1,2}/\d{1,2}/\d{2,4}$',  # 7/5/24, 7/5/2024
-                r'^[A-Za-z]{3}-\d{2}$',      # Jul-24
-            ],
-            DateFormat.MONTH_ONLY: [
-                r'^\d{4}-\d{1,2}$',          # 2024-07
-                r'^\d{1,2}/\d{4}$',          # 07/2024
-            ]
-        }
-        
         detected_formats = set()
         
-        for value in sample:
-            value = str(value).strip()
-            for date_format, pattern_list in patterns.items():
-                for pattern in pattern_list:
-                    if re.match(pattern, value):
-                        format_scores[date_format] += 1
-                        detected_formats.add(date_format)
-                        break
-        
-        # Normalize scores
-        for fmt in format_scores:
-            format_scores[fmt] = format_scores[fmt] / sample_size
+        # One lexer pass; each format's group is set where that format matched
+        hits = sample.str.extract(_DATE_LEXER).notna().sum()
+        for date_format in _DATE_PATTERNS:
+            hit_count = int(hits[date_format.name])
+            if hit_count:
+                detected_formats.add(date_format)
+            format_scores[date_format] = hit_count / sample_size
         
         # Check for mixed formats
         if len(detected_formats) > 1:
@@ -322,10 +479,9 @@ class FormatDetector:
         best_format = max(format_scores.items(), key=lambda x: x[1])
         return best_format[0], best_format[1]
     
-    def _detect_number_format(self, series: pd.Series) -> Tuple[NumberFormat, float]:
-        """Detect number format in a series"""
-        sample_size = min(10, len(series))
-        sample = series.head(sample_size).astype(str)
+    def _detect_number_format(self, sample: pd.Series) -> Tuple[NumberFormat, float]:
+        """Detect number format in a sample of stripped string values"""
+        sample_size = len(sample)
         
         format_scores = {
             NumberFormat.INTEGER: 0.0,
@@ -335,51 +491,31 @@ class FormatDetector:
             NumberFormat.PERCENTAGE: 0.0
         }
         
-        patterns = {
-            NumberFormat.CURRENCY: r'^\$?[\d,]+\.?\d*$',      # $1,234.56
-            NumberFormat.PERCENTAGE: r'^\d+\.?\d*%$',         # 15.5%
-            NumberFormat.SCIENTIFIC: r'^\d+\.?\d*[eE][+-]?\d+$', # 1.23E+04
-            NumberFormat.DECIMAL: r'^\d+\.\d+$',              # 123.45
-            NumberFormat.INTEGER: r'^\d+$',                   # 123
-        }
-        
-        for value in sample:
-            value = str(value).strip()
-            for number_format, pattern in patterns.items():
-                if re.match(pattern, value):
-                    format_scores[number_format] += 1
-                    break
-        
-        # Normalize scores
-        for fmt in format_scores:
-            format_scores[fmt] = format_scores[fmt] / sample_size
+        # One lexer pass; the alternation order makes the first matching format win
+        hits = sample.str.extract(_NUMBER_LEXER).notna().sum()
+        for number_format in _NUMBER_PATTERNS:
+            format_scores[number_format] = int(hits[number_format.name]) / sample_size
         
         # Return best format
         best_format = max(format_scores.items(), key=lambda x: x[1])
         return best_format[0], best_format[1]
     
-    def _detect_string_confidence(self, series: pd.Series) -> float:
-        """Calculate confidence that this is a string column"""
-        sample_size = min(10, len(series))
-        sample = series.head(sample_size)
-        
-        string_indicators = 0
-        
-        for value in sample:
-            value_str = str(value).strip()
-            # Look for string indicators
-            if any(char.isalpha() for char in value_str):
-                string_indicators += 1
-            # Long strings are likely text
-            elif len(value_str) > 20:
-                string_indicators += 1
-        
-        return string_indicators / sample_size if sample_size > 0 else 0.0
+    def _detect_string_confidence(self, sample: pd.Series) -> float:
+        """Calculate confidence that a sample of stripped string values is text"""
+        sample_size = len(sample)
+        if sample_size == 0:
+            return 0.0
+        
+        # Any letter is a string indicator; long strings are likely text
+        string_indicators = sample.str.contains(_LETTER_PATTERN) | (sample.str.len() > 20)
+        
+        return int(string_indicators.sum()) / sample_size
     
-    def _detect_file_type(self, columns_info: Dict[str, ColumnInfo]) -> Tuple[FileType, float]:
+    def _detect_file_type(self, sales_matches: np.ndarray,
+                          lots_matches: np.ndarray) -> Tuple[FileType, float]:
         """Determine the most likely file type"""
-        sales_score = self._calculate_sales_score(columns_info)
-        lots_score = self._calculate_lots_score(columns_info)
+        sales_score = self._calculate_sales_score(sales_matches)
+        lots_score = self._calculate_lots_score(lots_matches)
         
         if sales_score > lots_score and sales_score > 0.3:
             return FileType.SALES_DATA, sales_score
@@ -388,106 +524,57 @@ class FormatDetector:
         else:
             return FileType.UNKNOWN, 0.0
     
-    def _calculate_sales_score(self, columns_info: Dict[str, ColumnInfo]) -> float:
+    def _match_matrix(self, column_names: pd.Index,
+                      patterns: Dict[str, re.Pattern]) -> np.ndarray:
+        """(field, column) matrix of pattern weights, 0 where a column does not match"""
+        matrix = np.zeros((len(patterns), len(column_names)), dtype=np.int64)
+        if len(column_names) > 0:
+            for i, pattern in enumerate(patterns.values()):
+                matrix[i] = [_pattern_weight(pattern, name) for name in column_names]
+        return matrix
+    
+    def _pattern_hits(self, columns_info: Dict[str, ColumnInfo], patterns: Dict[str, re.Pattern],
+                      matches: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """Matching columns per field with their pattern weights, in column order"""
+        original_names = list(columns_info)
+        return {
+            field: {original_names[j]: int(row[j]) for j in np.flatnonzero(row)}
+            for field, row in zip(patterns, matches)
+        }
+    
+    def _calculate_sales_score(self, sales_matches: np.ndarray) -> float:
         """Calculate likelihood this is sales data"""
-        score = 0.0
-        column_names = [col.name for col in columns_info.values()]
-        
-        # Check for sales-specific patterns
-        for required_field, patterns in self.SALES_PATTERNS.items():
-            field_score = 0.0
-            for col_name in column_names:
-                for pattern in patterns:
-                    if re.search(pattern, col_name, re.IGNORECASE):
-                        field_score = max(field_score, 1.0)
-                        break
-            score += field_score
-        
-        # Normalize by number of required fields
-        score = score / len(self.SALES_PATTERNS)
+        # Fraction of sales-specific fields matched by some column
+        score = int(sales_matches.any(axis=1).sum()) / len(self.SALES_PATTERNS)
         
         # Bonus for typical sales data characteristics
-        if len(column_names) <= 5:  # Sales data is typically simpler
+        if sales_matches.shape[1] <= 5:  # Sales data is typically simpler
             score += 0.1
         
         return min(score, 1.0)
     
-    def _calculate_lots_score(self, columns_info: Dict[str, ColumnInfo]) -> float:
+    def _calculate_lots_score(self, lots_matches: np.ndarray) -> float:
         """Calculate likelihood this is lots data"""
-        score = 0.0
-        column_names = [col.name for col in columns_info.values()]
-        
-        # Check for lots-specific patterns  
-        for required_field, patterns in self.LOTS_PATTERNS.items():
-            field_score = 0.0
-            for col_name in column_names:
-                for pattern in patterns:
-                    if re.search(pattern, col_name, re.IGNORECASE):
-                        field_score = max(field_score, 1.0)
-                        break
-            score += field_score
-        
-        # Normalize by number of required fields
-        score = score / len(self.LOTS_PATTERNS)
+        # Fraction of lots-specific fields matched by some column
+        score = int(lots_matches.any(axis=1).sum()) / len(self.LOTS_PATTERNS)
         
         # Bonus for typical lots data characteristics
-        if len(column_names) >= 5:  # Lots data is typically more complex
+        if lots_matches.shape[1] >= 5:  # Lots data is typically more complex
             score += 0.1
         
         return min(score, 1.0)
     
-    def _suggest_sales_mapping(self, columns_info: Dict[str, ColumnInfo]) -> Dict[str, str]:
-        """Suggest column mapping for sales data"""
-        mapping = {}
-        column_names = [(col.name, col.original_name) for col in columns_info.values()]
-        
-        for standard_field, patterns in self.SALES_PATTERNS.items():
-            best_match = None
-            best_score = 0.0
-            
-            for col_name, original_name in column_names:
-                for pattern in patterns:
-                    if re.search(pattern, col_name, re.IGNORECASE):
-                        score = len(re.findall(pattern, col_name, re.IGNORECASE))
-                        if score > best_score:
-                            best_score = score
-                            best_match = original_name
-            
-            if best_match:
-                mapping[standard_field] = best_match
-        
-        return mapping
-    
-    def _suggest_lots_mapping(self, columns_info: Dict[str, ColumnInfo]) -> Dict[str, str]:
-        """Suggest column mapping for lots data"""
-        mapping = {}
-        column_names = [(col.name, col.original_name) for col in columns_info.values()]
-        
-        for standard_field, patterns in self.LOTS_PATTERNS.items():
-            best_match = None
-            best_score = 0.0
-            
-            for col_name, original_name in column_names:
-                for pattern in patterns:
-                    if re.search(pattern, col_name, re.IGNORECASE):
-                        score = len(re.findall(pattern, col_name, re.IGNORECASE))
-                        if score > best_score:
-                            best_score = score
-                            best_match = original_name
-            
-            if best_match:
-                mapping[standard_field] = best_match
-        
-        return mapping
-    
-    def _generate_recommendations(self, columns_info: Dict[str, ColumnInfo], file_type: FileType):
+    def _generate_recommendations(self, columns_meta: pd.DataFrame, file_type: FileType):
         """Generate recommendations based on analysis"""
         # Check for common issues
-        empty_columns = [col.original_name for col in columns_info.values() if col.null_percentage > 0.9]
+        null_percentages = columns_meta['null_percentage'].to_numpy()
+        names = columns_meta.index.to_numpy()
+        
+        empty_columns = names[null_percentages > 0.9].tolist()
         if empty_columns:
             self.recommendations.append(f"Consider removing mostly empty columns: {', '.join(empty_columns)}")
         
-        high_null_columns = [col.original_name for col in columns_info.values() if 0.3 < col.null_percentage <= 0.9]
+        high_null_columns = names[(null_percentages > 0.3) & (null_percentages <= 0.9)].tolist()
         if high_null_columns:
             self.recommendations.append(f"Review columns with high null rates: {', '.join(high_null_columns)}")
         
@@ -500,8 +587,7 @@ class FormatDetector:
             self.recommendations.append("Could not determine file type - check column names and data structure")
         
         # Date format recommendations
-        date_columns = [col for col in columns_info.values() if col.data_type == datetime]
-        if date_columns:
-            mixed_date_cols = [col.original_name for col in date_columns if col.format_type == DateFormat.MIXED]
-            if mixed_date_cols:
-                self.recommendations.append(f"Standardize date formats in columns: {', '.join(mixed_date_cols)}")
\ No newline at end of file
+        mixed_dates = (columns_meta['data_type'] == datetime) & (columns_meta['format_type'] == DateFormat.MIXED)
+        mixed_date_cols = names[mixed_dates.to_numpy()].tolist()
+        if mixed_date_cols:
+            self.recommendations.append(f"Standardize date formats in columns: {', '.join(mixed_date_cols)}")
\ No newline at end of file
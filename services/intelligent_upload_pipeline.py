@@ -3,41 +3,178 @@ Complete intelligent upload pipeline that integrates all components
 for seamless handling of messy real-world data.
 """
 
-from typing import Dict, List, Any, Optional, Tuple
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Any, Literal, Optional, Set, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import lru_cache, partial
+from itertools import chain
+import hashlib
+import mmap
+import os
+import pickle
+import threading
 import pandas as pd
-from pathlib import Path
+import io
 import logging
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pv
+except ImportError:  # optional; CSVs are parsed with pandas and materialize='arrow' is unavailable
+    pa = None
+    pv = None
+
 from .format_detector import FormatDetector, FormatDetectionResult
 from .upload_validator import UploadValidator, ValidationResult
 from .data_preview import DataPreviewService, DataPreview
 from .quarantine_manager import QuarantineManager, QuarantineBatch
 
 
+@lru_cache(maxsize=None)
+def _shared_preview_service() -> DataPreviewService:
+    """Process-wide preview service; it keeps no per-upload state"""
+    return DataPreviewService()
+
+
+@lru_cache(maxsize=16)
+def _shared_quarantine_manager(quarantine_dir: str) -> QuarantineManager:
+    """Process-wide quarantine manager per absolute quarantine directory"""
+    return QuarantineManager(quarantine_dir)
+
+
+@dataclass(slots=True, frozen=True)
+class UploadResult:
+    """Flat outcome of one processed upload; ``to_dict`` gives the nested results layout"""
+    status: str
+    filename: str
+    file_type: Optional[str] = None
+    detection_confidence: float = 0.0
+    total_rows: int = 0
+    processable_rows: int = 0
+    quarantined_rows: int = 0
+    success_rate: float = 0.0
+    preview_status: Optional[str] = None
+    safe_to_import: bool = False
+    requires_review: bool = False
+    actionable_steps: List[str] = field(default_factory=list)
+    critical_count: int = 0
+    warning_count: int = 0
+    info_count: int = 0
+    sample_issues: List[str] = field(default_factory=list)
+    quarantine_batch_id: Optional[str] = None
+    quarantine_rate: float = 0.0
+    quarantine_export_path: Optional[str] = None
+    quarantine_inline_rows: Optional[List[Dict[str, Any]]] = None
+    recommendations: List[str] = field(default_factory=list)
+    preview_report: Optional[Callable[[], str]] = None
+    normalized_data: Any = None
+    column_mapping: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+    
+    @property
+    def processing_summary(self) -> Dict[str, Any]:
+        return {
+            'total_rows': self.total_rows,
+            'processable_rows': self.processable_rows,
+            'quarantined_rows': self.quarantined_rows,
+            'success_rate': self.success_rate
+        }
+    
+    @property
+    def issues(self) -> Dict[str, Any]:
+        return {
+            'critical_count': self.critical_count,
+            'warning_count': self.warning_count,
+            'info_count': self.info_count,
+            'sample_issues': self.sample_issues
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Nested results dict as returned by process_upload, with the preview report formatted"""
+        if self.status != 'success':
+            return {
+                'status': self.status,
+                'error': self.error,
+                'filename': self.filename,
+                'recommendations': self.recommendations
+            }
+        return {
+            'status': self.status,
+            'filename': self.filename,
+            'file_type': self.file_type,
+            'detection_confidence': self.detection_confidence,
+            'processing_summary': self.processing_summary,
+            'preview': {
+                'status': self.preview_status,
+                'safe_to_import': self.safe_to_import,
+                'requires_review': self.requires_review,
+                'actionable_steps': self.actionable_steps
+            },
+            'issues': self.issues,
+            'quarantine': {
+                'batch_id': self.quarantine_batch_id,
+                'quarantine_rate': self.quarantine_rate,
+                'export_path': self.quarantine_export_path,
+                'inline_rows': self.quarantine_inline_rows
+            },
+            'recommendations': self.recommendations,
+            'preview_report': self.preview_report() if self.preview_report else '',
+            'normalized_data': self.normalized_data,
+            'column_mapping': self.column_mapping
+        }
+
+
 class IntelligentUploadPipeline:
     """
     Complete pipeline for intelligently processing uploaded CSV files.
     Handles real-world messy data gracefully while never losing information.
     """
     
-    def __init__(self, quarantine_dir: Optional[str] = None):
+    # Rows read up front for format detection
+    DETECTION_SAMPLE_ROWS = 2000
+    
+    # Bytes per block for the pyarrow CSV reader
+    ARROW_BLOCK_SIZE = 16 << 20
+    
+    # Quarantines smaller than this are returned inline instead of exported to CSV
+    INLINE_QUARANTINE_ROWS = 32
+    
+    def __init__(
+        self,
+        quarantine_dir: Optional[str] = None,
+        chunk_size: int = 50_000,
+        speculative_validation: bool = False
+    ):
         """
         Initialize the upload pipeline.
         
         Args:
             quarantine_dir: Directory for quarantine storage (optional)
+            chunk_size: Rows parsed and validated per chunk of the upload
+            speculative_validation: Start validating as sales data on a worker
+                thread while format detection runs (one extra thread per upload)
         """
+        self.chunk_size = chunk_size
+        self.speculative_validation = speculative_validation
+        # The detector and validator keep per-call scratch state, so each
+        # pipeline gets its own; their pattern tables are class-level anyway
         self.detector = FormatDetector()
         self.validator = UploadValidator()
-        self.preview_service = DataPreviewService()
-        self.quarantine_manager = QuarantineManager(quarantine_dir)
+        # Stateless services are shared by every pipeline in the process
+        self.preview_service = _shared_preview_service()
+        self.quarantine_manager = _shared_quarantine_manager(
+            os.path.abspath(quarantine_dir or "./quarantine")
+        )
         self.logger = logging.getLogger(__name__)
     
     def process_upload(
         self,
         file_path: str,
         tenant_id: Optional[str] = None,
-        filename: Optional[str] = None
+        filename: Optional[str] = None,
+        materialize: Literal['records', 'arrow', 'none'] = 'none'
     ) -> Dict[str, Any]:
         """
         Process an uploaded file through the complete pipeline.
@@ -46,30 +183,103 @@ class IntelligentUploadPipeline:
             file_path: Path to uploaded CSV file
             tenant_id: Optional tenant identifier
             filename: Optional original filename
+            materialize: Form of ``normalized_data`` in the results: 'records' for
+                a list of dicts, 'arrow' for a list of pyarrow RecordBatches, or
+                'none' for a callable that iterates the rows as namedtuples
             
         Returns:
             Complete processing results with recommendations
         """
-        try:
-            # Load file
-            df = pd.read_csv(file_path)
-            original_filename = filename or Path(file_path).name
-            
-            self.logger.info(f"Processing upload: {original_filename} ({len(df)} rows)")
+        return self.run_upload_file(file_path, tenant_id, filename, materialize).to_dict()
+    
+    def process_upload_buffer(
+        self,
+        buf: IO[bytes],
+        tenant_id: Optional[str] = None,
+        filename: Optional[str] = None,
+        materialize: Literal['records', 'arrow', 'none'] = 'none'
+    ) -> Dict[str, Any]:
+        """
+        Process an uploaded CSV held in a seekable binary buffer.
+        
+        Args:
+            buf: Seekable buffer with the CSV bytes (e.g. io.BytesIO)
+            tenant_id: Optional tenant identifier
+            filename: Optional original filename
+            materialize: Form of ``normalized_data`` in the results (see process_upload)
             
-            # Step 1: Format Detection
-            detection_result = self.detector.detect_format(df)
-            self.logger.info(f"Detected format: {detection_result.file_type.value} "
-                           f"(confidence: {detection_result.confidence:.1%})")
+        Returns:
+            Complete processing results with recommendations
+        """
+        return self.run_upload_buffer(buf, tenant_id, filename, materialize).to_dict()
+    
+    def run_upload_file(
+        self,
+        file_path: str,
+        tenant_id: Optional[str] = None,
+        filename: Optional[str] = None,
+        materialize: Literal['records', 'arrow', 'none'] = 'none'
+    ) -> UploadResult:
+        """Like process_upload, but returns the flat UploadResult"""
+        original_filename = filename or os.path.basename(file_path)
+        try:
+            with self._mapped_file(file_path) as buf:
+                return self.run_upload_buffer(buf, tenant_id, original_filename, materialize)
+        except OSError as e:
+            return self._error_result(file_path, original_filename, e)
+    
+    @staticmethod
+    @contextmanager
+    def _mapped_file(file_path: str) -> Iterator[IO[bytes]]:
+        """
+        Read-only memory map of a file, so parsers read the page cache directly.
+        
+        Files that cannot be mapped (empty files, pipes) are read through the
+        open file object instead.
+        """
+        with open(file_path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mapped = None
+            if mapped is None:
+                yield f
+            else:
+                with mapped:
+                    yield mapped
+    
+    def run_upload_buffer(
+        self,
+        buf: IO[bytes],
+        tenant_id: Optional[str] = None,
+        filename: Optional[str] = None,
+        materialize: Literal['records', 'arrow', 'none'] = 'none'
+    ) -> UploadResult:
+        """Like process_upload_buffer, but returns the flat UploadResult"""
+        original_filename = filename or "uploaded_file.csv"
+        # Skip formatting progress messages nobody will see
+        log_info = self.logger.isEnabledFor(logging.INFO)
+        try:
+            if log_info:
+                self.logger.info(f"Processing upload: {original_filename}")
             
-            # Step 2: Data Validation
-            if detection_result.file_type.value == "sales_data":
-                validation_result = self.validator.validate_sales_data(df)
-            elif detection_result.file_type.value == "lots_data":
-                validation_result = self.validator.validate_lots_data(df)
+            # Step 1: Format Detection on a leading sample of the file
+            sample = next(self._read_csv_chunks(buf, self.DETECTION_SAMPLE_ROWS))
+            sample = sample.head(self.DETECTION_SAMPLE_ROWS)
+            buf.seek(0)
+            if self.speculative_validation:
+                detection_result, validation_result = self._detect_with_speculation(sample, buf)
             else:
-                # Unknown format - try sales data as default
-                validation_result = self.validator.validate_sales_data(df)
+                detection_result = self.detector.detect_format(sample)
+                validation_result = None
+            if log_info:
+                self.logger.info(f"Detected format: {detection_result.file_type.value} "
+                               f"(confidence: {detection_result.confidence:.1%})")
+            
+            # Step 2: Data Validation, one chunk at a time
+            if validation_result is None:
+                buf.seek(0)
+                validation_result = self._validate_chunks(buf, detection_result.file_type.value)
             
             # Step 3: Create Preview
             preview = self.preview_service.create_preview(
@@ -88,69 +298,333 @@ class IntelligentUploadPipeline:
                     tenant_id
                 )
             
-            # Generate comprehensive results
-            results = {
-                'status': 'success',
-                'filename': original_filename,
-                'file_type': detection_result.file_type.value,
-                'detection_confidence': detection_result.confidence,
-                'processing_summary': {
-                    'total_rows': validation_result.summary.get('total_rows', 0),
-                    'processable_rows': validation_result.processable_rows,
-                    'quarantined_rows': validation_result.quarantined_rows,
-                    'success_rate': validation_result.processable_rows / validation_result.summary.get('total_rows', 1)
-                },
-                'preview': {
-                    'status': preview.status.value,
-                    'safe_to_import': preview.is_safe_to_import,
-                    'requires_review': preview.requires_manual_review,
-                    'actionable_steps': self.preview_service.get_actionable_steps(preview)
-                },
-                'issues': {
-                    'critical_count': len(preview.issues_by_severity.get('critical', [])),
-                    'warning_count': len(preview.issues_by_severity.get('warning', [])),
-                    'info_count': len(preview.issues_by_severity.get('info', [])),
-                    'sample_issues': [
-                        f"Row {issue.row_index}: {issue.message}"
-                        for issue in validation_result.issues[:5]
-                    ]
-                },
-                'quarantine': {
-                    'batch_id': quarantine_batch.batch_id if quarantine_batch else None,
-                    'quarantine_rate': quarantine_batch.quarantine_rate if quarantine_batch else 0.0,
-                    'export_path': None
-                },
-                'recommendations': preview.recommendations,
-                'preview_report': self.preview_service.generate_preview_report(preview),
-                'normalized_data': validation_result.normalized_data.to_dict('records') if not validation_result.normalized_data.empty else [],
-                'column_mapping': validation_result.summary.get('column_mapping', {})
-            }
-            
-            # Export quarantine data if available
-            if quarantine_batch:
+            # Return a few quarantined rows inline; export larger quarantines
+            export_path = None
+            inline_rows = None
+            if quarantine_batch and validation_result.quarantined_rows < self.INLINE_QUARANTINE_ROWS:
+                quarantined = validation_result.quarantined_data.astype(object)
+                inline_rows = quarantined.where(quarantined.notna(), None).to_dict('records')
+            elif quarantine_batch:
                 export_path = self.quarantine_manager.export_quarantine_csv(
                     quarantine_batch.batch_id, 
                     include_metadata=True
                 )
-                results['quarantine']['export_path'] = export_path
             
-            self.logger.info(f"Processing completed: {validation_result.processable_rows} processable, "
-                           f"{validation_result.quarantined_rows} quarantined")
+            # Generate comprehensive results
+            summary = validation_result.summary
+            total_rows = summary.get('total_rows', 0)
+            processable_rows = validation_result.processable_rows
+            issues_by_severity = preview.issues_by_severity
+            result = UploadResult(
+                status='success',
+                filename=original_filename,
+                file_type=detection_result.file_type.value,
+                detection_confidence=detection_result.confidence,
+                total_rows=total_rows,
+                processable_rows=processable_rows,
+                quarantined_rows=validation_result.quarantined_rows,
+                success_rate=processable_rows / total_rows if total_rows > 0 else 0.0,
+                preview_status=preview.status.value,
+                safe_to_import=preview.is_safe_to_import,
+                requires_review=preview.requires_manual_review,
+                actionable_steps=self.preview_service.get_actionable_steps(preview),
+                critical_count=len(issues_by_severity.get('critical', [])),
+                warning_count=len(issues_by_severity.get('warning', [])),
+                info_count=len(issues_by_severity.get('info', [])),
+                sample_issues=self._issue_lines(validation_result.issues_df.iloc[:5]),
+                quarantine_batch_id=quarantine_batch.batch_id if quarantine_batch else None,
+                quarantine_rate=quarantine_batch.quarantine_rate if quarantine_batch else 0.0,
+                quarantine_export_path=export_path,
+                quarantine_inline_rows=inline_rows,
+                recommendations=preview.recommendations,
+                preview_report=partial(self.preview_service.generate_preview_report, preview),
+                normalized_data=self._materialize(validation_result.normalized_data, materialize),
+                column_mapping=summary.get('column_mapping', {})
+            )
+            
+            if log_info:
+                self.logger.info(f"Processing completed: {result.processable_rows} processable, "
+                               f"{result.quarantined_rows} quarantined")
             
-            return results
+            return result
             
         except Exception as e:
-            self.logger.error(f"Pipeline error processing {file_path}: {str(e)}")
-            return {
-                'status': 'error',
-                'error': str(e),
-                'filename': filename or Path(file_path).name,
-                'recommendations': [
-                    'Check file format and structure',
-                    'Ensure file is a valid CSV',
-                    'Contact support if the issue persists'
-                ]
-            }
+            return self._error_result(original_filename, original_filename, e)
+    
+    def _error_result(self, source: str, filename: str, error: Exception) -> UploadResult:
+        """Log a pipeline failure and build the error result"""
+        self.logger.error(f"Pipeline error processing {source}: {str(error)}")
+        return UploadResult(
+            status='error',
+            filename=filename,
+            error=str(error),
+            recommendations=[
+                'Check file format and structure',
+                'Ensure file is a valid CSV',
+                'Contact support if the issue persists'
+            ]
+        )
+    
+    def _read_csv_chunks(self, buf: IO[bytes], chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Parse a CSV buffer into DataFrame chunks with every cell read as text.
+        
+        Text cells give every chunk the same dtypes. With pyarrow installed the
+        file is parsed by its multi-threaded reader in blocks of
+        ``ARROW_BLOCK_SIZE`` bytes, and columns arrive dictionary-encoded as
+        pandas categoricals, so repeated values (SKUs, months) are stored and
+        validated once per chunk. Otherwise pandas yields ``chunk_size`` rows
+        of object columns at a time. At least one (possibly empty) chunk is
+        always yielded.
+        
+        Args:
+            buf: Seekable buffer positioned at the start of the CSV; a memory
+                map is handed to pyarrow as a zero-copy buffer
+            chunk_size: Rows per chunk for the pandas parser
+        """
+        if pv is None:
+            with pd.read_csv(buf, chunksize=chunk_size, dtype=str) as reader:
+                yield from reader
+            return
+        
+        # Take header names from pandas so unnamed and duplicate columns are
+        # labelled exactly as the pandas parser would label them
+        columns = list(pd.read_csv(buf, nrows=0).columns)
+        buf.seek(0)
+        reader = pv.open_csv(
+            pa.BufferReader(pa.py_buffer(buf)) if isinstance(buf, mmap.mmap) else buf,
+            read_options=pv.ReadOptions(
+                column_names=columns, skip_rows=1,
+                block_size=self.ARROW_BLOCK_SIZE, use_threads=True
+            ),
+            convert_options=pv.ConvertOptions(
+                column_types={column: pa.dictionary(pa.int32(), pa.string()) for column in columns},
+                strings_can_be_null=True
+            )
+        )
+        start = 0
+        for batch in reader:
+            # Row count from the parser's batch rather than the converted frame
+            n_rows = batch.num_rows
+            chunk = batch.to_pandas(split_blocks=True, self_destruct=True)
+            chunk.index = pd.RangeIndex(start, start + n_rows)
+            start += n_rows
+            yield chunk
+        if start == 0:
+            yield pd.DataFrame(columns=columns, dtype=object)
+    
+    def _detect_with_speculation(
+        self,
+        sample: pd.DataFrame,
+        buf: IO[bytes]
+    ) -> Tuple[FormatDetectionResult, Optional[ValidationResult]]:
+        """
+        Detect the format while a worker thread validates the file as sales data.
+        
+        Sales validation is also used for unknown formats, so only lots files
+        waste the speculative work; it is stopped at the next chunk boundary.
+        
+        Returns:
+            Detection result, and the validation result if it can be used
+        """
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            speculative = executor.submit(self._validate_chunks, buf, "sales_data", stop)
+            detection_result = self.detector.detect_format(sample)
+            if detection_result.file_type.value == "lots_data":
+                stop.set()
+            validation_result = speculative.result()
+        
+        if stop.is_set():
+            return detection_result, None
+        return detection_result, validation_result
+    
+    def _validate_chunks(
+        self,
+        source: IO[bytes],
+        file_type: str,
+        stop: Optional[threading.Event] = None
+    ) -> Optional[ValidationResult]:
+        """
+        Validate a CSV in chunks of ``chunk_size`` rows and merge the results.
+        
+        Args:
+            source: Seekable binary buffer of the CSV file
+            file_type: Detected file type value
+            stop: Event that abandons validation between chunks (optional)
+            
+        Returns:
+            ValidationResult covering every chunk, or None if stopped
+        """
+        if file_type == "lots_data":
+            validate = self.validator.validate_lots_data
+        else:
+            # Sales data, also the default for unknown formats
+            validate = self.validator.validate_sales_data
+        
+        chunks = self._read_csv_chunks(source, self.chunk_size)
+        first = next(chunks)
+        second = next(chunks, None)
+        if second is None:
+            # The only chunk is the whole file: validate it exactly as a whole
+            if stop is not None and stop.is_set():
+                return None
+            return validate(first)
+        
+        validated = self._validate_chunk_stream(validate, chain([first, second], chunks), stop)
+        if validated is None:
+            return None
+        results, filled = validated
+        
+        # A trailing column empty in every chunk is trimmed by a whole-file
+        # validation; if it was mapped, validate again without it
+        empty = self._trailing_empty_columns(first.columns, filled)
+        mapping = results[0].summary.get('column_mapping') or {}
+        if empty and self._clean_column_names(empty).isin(list(mapping.values())).any():
+            source.seek(0)
+            validated = self._validate_chunk_stream(
+                validate, self._read_csv_chunks(source, self.chunk_size), stop, drop_columns=empty
+            )
+            if validated is None:
+                return None
+            results, _ = validated
+        
+        summary = {}
+        issues = []
+        for result in results:
+            issues.extend(result.issues)
+            for key, value in result.summary.items():
+                if key == 'column_mapping':
+                    summary.setdefault(key, value)
+                else:
+                    summary[key] = summary.get(key, 0) + value
+        
+        return ValidationResult(
+            normalized_data=self._concat_frames(
+                [result.normalized_data for result in results], ignore_index=True
+            ),
+            quarantined_data=self._concat_frames(
+                [result.quarantined_data for result in results], ignore_index=False
+            ),
+            issues=issues,
+            summary=summary
+        )
+    
+    def _validate_chunk_stream(
+        self,
+        validate: Callable[..., ValidationResult],
+        chunks: Iterable[pd.DataFrame],
+        stop: Optional[threading.Event],
+        drop_columns: Optional[List[str]] = None
+    ) -> Optional[Tuple[List[ValidationResult], Set[str]]]:
+        """
+        Validate chunks of one file, reusing the mapping detected on the first.
+        
+        The mapping comes from the first chunk's full header, empty columns
+        included, so a column blank only at the top of the file stays mapped.
+        If the header is not recognized, later chunks are quarantined whole
+        without validating them again.
+        
+        Args:
+            drop_columns: Columns left out of validation; quarantined rows
+                still carry them (optional)
+        
+        Returns:
+            Per-chunk results and the columns with a value in any chunk, or
+            None if stopped
+        """
+        results = []
+        filled = set()
+        column_mapping = None
+        for chunk in chunks:
+            if stop is not None and stop.is_set():
+                return None
+            filled.update(chunk.columns[chunk.notna().any()])
+            if results and not column_mapping:
+                results.append(ValidationResult(
+                    normalized_data=pd.DataFrame(),
+                    quarantined_data=chunk,
+                    summary={
+                        'total_rows': len(chunk),
+                        'processed_rows': 0,
+                        'quarantined_rows': len(chunk),
+                        'critical_issues': 0,
+                        'warnings': 0,
+                        'column_mapping': {}
+                    }
+                ))
+                continue
+            if drop_columns:
+                result = validate(chunk.drop(columns=drop_columns), column_mapping, trim_empty_columns=False)
+                result = replace(result, quarantined_data=chunk.loc[result.quarantined_data.index])
+            else:
+                result = validate(chunk, column_mapping, trim_empty_columns=False)
+            column_mapping = column_mapping or result.summary.get('column_mapping')
+            results.append(result)
+        return results, filled
+    
+    @staticmethod
+    def _trailing_empty_columns(columns: pd.Index, filled: Set[str]) -> List[str]:
+        """Named columns at the end of the header with no value anywhere in the file"""
+        named = [column for column in columns if not str(column).startswith('Unnamed')]
+        empty = []
+        for column in reversed(named):
+            if column in filled:
+                break
+            empty.append(column)
+        return empty
+    
+    @staticmethod
+    def _clean_column_names(columns: List[str]) -> pd.Index:
+        """Column names as the validator cleans them"""
+        return pd.Index(columns).str.strip().str.replace('\n', ' ').str.replace('\r', ' ')
+    
+    @staticmethod
+    def _materialize(df: pd.DataFrame, materialize: str) -> Any:
+        """Build the ``normalized_data`` payload in the requested form"""
+        if materialize == 'records':
+            return df.to_dict('records') if len(df.index) > 0 else []
+        if materialize == 'arrow':
+            if pa is None:
+                raise ImportError("pyarrow is required for materialize='arrow'")
+            return pa.Table.from_pandas(df, preserve_index=False).to_batches()
+        if materialize == 'none':
+            return partial(df.itertuples, index=False)
+        raise ValueError(f"Unknown materialize option: {materialize}")
+    
+    @staticmethod
+    def dumps_normalized_data(data: Any) -> Tuple[bytes, List[pickle.PickleBuffer]]:
+        """
+        Pickle normalized data for another process with protocol 5.
+        
+        Column buffers of DataFrames and Arrow batches are returned out of band
+        instead of being copied into the payload, so a worker pool can hand them
+        over through shared memory.
+        
+        Returns:
+            Pickle payload and its out-of-band buffers, for loads_normalized_data
+        """
+        buffers = []
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        return payload, buffers
+    
+    @staticmethod
+    def loads_normalized_data(payload: bytes, buffers: List[Any]) -> Any:
+        """Rebuild data pickled by dumps_normalized_data, viewing the buffers without copying"""
+        return pickle.loads(payload, buffers=buffers)
+    
+    @staticmethod
+    def _issue_lines(issues: pd.DataFrame) -> List[str]:
+        """'Row <index>: <message>' lines built column-wise"""
+        return ("Row " + issues['row_index'].astype(str) + ": " + issues['message']).tolist()
+    
+    @staticmethod
+    def _concat_frames(frames: List[pd.DataFrame], ignore_index: bool) -> pd.DataFrame:
+        """Concatenate non-empty chunk frames, keeping the first frame's columns if all are empty"""
+        non_empty = [frame for frame in frames if not frame.empty]
+        if not non_empty:
+            return frames[0]
+        return pd.concat(non_empty, ignore_index=ignore_index)
     
     def get_import_ready_data(self, batch_id: str) -> pd.DataFrame:
         """
@@ -227,8 +701,12 @@ class UploadAPIIntegration:
     Shows how to integrate with the current FIFO system safely.
     """
     
-    def __init__(self, pipeline: IntelligentUploadPipeline):
+    def __init__(self, pipeline: IntelligentUploadPipeline, preview_cache_size: int = 128):
         self.pipeline = pipeline
+        # Most recent preview responses, keyed by (content digest, tenant_id),
+        # each stored with the quarantine batch it created
+        self.preview_cache_size = preview_cache_size
+        self._preview_cache: "OrderedDict[tuple, Tuple[Optional[str], Dict[str, Any]]]" = OrderedDict()
         
     def enhanced_upload_handler(
         self,
@@ -242,58 +720,51 @@ class UploadAPIIntegration:
         This can replace or enhance existing upload endpoints.
         """
         try:
-            # Save uploaded file temporarily
-            import tempfile
-            with tempfile.NamedTemporaryFile(mode='w+b', suffix='.csv', delete=False) as temp_file:
-                content = uploaded_file.file.read()
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-            
-            # Process through pipeline
-            results = self.pipeline.process_upload(
-                temp_file_path,
+            # Process the upload straight from memory
+            result = self.pipeline.run_upload_buffer(
+                io.BytesIO(uploaded_file.file.read()),
                 tenant_id=tenant_id,
                 filename=uploaded_file.filename
             )
             
-            # Clean up temp file
-            Path(temp_file_path).unlink()
-            
             # Determine response based on results
-            if results['status'] == 'success':
-                if results['preview']['safe_to_import']:
+            if result.status == 'success':
+                if result.safe_to_import:
+                    # Rows are only turned into records for the branch that returns them
                     return {
                         'status': 'ready_for_import',
                         'message': 'Data is ready to import immediately',
-                        'data': results['normalized_data'],
-                        'summary': results['processing_summary'],
-                        'recommendations': results['recommendations']
+                        'data': [row._asdict() for row in result.normalized_data()],
+                        'summary': result.processing_summary,
+                        'recommendations': result.recommendations
                     }
-                elif results['preview']['requires_review']:
+                elif result.requires_review:
                     return {
                         'status': 'needs_review',
                         'message': 'Data needs review before import',
-                        'quarantine_batch_id': results['quarantine']['batch_id'],
-                        'quarantine_export_path': results['quarantine']['export_path'],
-                        'summary': results['processing_summary'],
-                        'issues': results['issues'],
-                        'actionable_steps': results['preview']['actionable_steps'],
-                        'recommendations': results['recommendations']
+                        'quarantine_batch_id': result.quarantine_batch_id,
+                        'quarantine_export_path': result.quarantine_export_path,
+                        'quarantine_inline_rows': result.quarantine_inline_rows,
+                        'summary': result.processing_summary,
+                        'issues': result.issues,
+                        'actionable_steps': result.actionable_steps,
+                        'recommendations': result.recommendations
                     }
                 else:
                     return {
                         'status': 'cannot_import',
                         'message': 'Data has critical issues that prevent import',
-                        'quarantine_batch_id': results['quarantine']['batch_id'],
-                        'quarantine_export_path': results['quarantine']['export_path'],
-                        'issues': results['issues'],
-                        'recommendations': results['recommendations']
+                        'quarantine_batch_id': result.quarantine_batch_id,
+                        'quarantine_export_path': result.quarantine_export_path,
+                        'quarantine_inline_rows': result.quarantine_inline_rows,
+                        'issues': result.issues,
+                        'recommendations': result.recommendations
                     }
             else:
                 return {
                     'status': 'error',
-                    'message': f"Processing failed: {results.get('error', 'Unknown error')}",
-                    'recommendations': results.get('recommendations', [])
+                    'message': f"Processing failed: {result.error or 'Unknown error'}",
+                    'recommendations': result.recommendations
                 }
                 
         except Exception as e:
@@ -310,13 +781,39 @@ class UploadAPIIntegration:
     def create_preview_endpoint_handler(self) -> callable:
         """Create a preview endpoint that shows what will be imported"""
         def preview_handler(file_path: str, tenant_id: str = None):
-            results = self.pipeline.process_upload(file_path, tenant_id)
-            return {
-                'preview_report': results.get('preview_report', ''),
-                'processing_summary': results.get('processing_summary', {}),
-                'actionable_steps': results.get('preview', {}).get('actionable_steps', []),
-                'recommendations': results.get('recommendations', [])
+            # Previewing the same content again reuses the earlier response
+            # instead of re-running (and re-quarantining) the whole pipeline
+            filename = os.path.basename(file_path)
+            try:
+                with open(file_path, 'rb') as f:
+                    content = f.read()
+            except OSError:
+                content = None
+            key = None
+            if content is not None:
+                key = (hashlib.blake2b(content, digest_size=16).hexdigest(), tenant_id)
+                cached = self._preview_cache.get(key)
+                if cached is not None:
+                    self._preview_cache.move_to_end(key)
+                    return cached[1]
+                result = self.pipeline.run_upload_buffer(
+                    io.BytesIO(content), tenant_id, filename
+                )
+            else:
+                result = self.pipeline.run_upload_file(file_path, tenant_id, filename)
+            
+            success = result.status == 'success'
+            response = {
+                'preview_report': result.preview_report() if success else '',
+                'processing_summary': result.processing_summary if success else {},
+                'actionable_steps': result.actionable_steps,
+                'recommendations': result.recommendations
             }
+            if key is not None and success and self.preview_cache_size > 0:
+                self._preview_cache[key] = (result.quarantine_batch_id, response)
+                if len(self._preview_cache) > self.preview_cache_size:
+                    self._preview_cache.popitem(last=False)
+            return response
         return preview_handler
     
     def create_quarantine_review_endpoint_handler(self) -> callable:
@@ -332,6 +829,11 @@ class UploadAPIIntegration:
             success = self.pipeline.review_quarantined_record(
                 batch_id, record_id, reviewer, action, corrected_data, notes
             )
+            if success:
+                # Previews of this batch no longer reflect its review state
+                for key, (cached_batch_id, _) in list(self._preview_cache.items()):
+                    if cached_batch_id == batch_id:
+                        del self._preview_cache[key]
             return {
                 'success': success,
                 'message': 'Review completed successfully' if success else 'Review failed'
@@ -1,24 +1,67 @@
 """
 Journaled FIFO calculator that tracks all operations for rollback support.
 """
+import os
+import time
 import uuid
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from decimal import Decimal
 import logging
 
+import numpy as np
+
 from core.models import PurchaseLot, Sale, InventorySnapshot
 from core.fifo_engine import FIFOEngine
 from core.db_models import COGSRun, RunStatus, InventoryMovement, InventorySnapshot as DBInventorySnapshot
 from services.tenant_service import TenantService, TenantContext
 
 
+def _uuid7_batch(n: int) -> List[str]:
+    """
+    n time-ordered UUIDv7 strings (RFC 9562) from one clock read and one urandom read.
+    
+    The ids share the millisecond timestamp and count up from a random 74-bit
+    start, so a batch sorts in creation order and appends to the end of a
+    primary key index instead of splitting random pages.
+    """
+    if n <= 0:
+        return []
+    unix_ms = time.time_ns() // 1_000_000
+    start = (int.from_bytes(os.urandom(10), 'big') >> 6) % ((1 << 74) - n)
+    ids = []
+    for offset in range(n):
+        rand = start + offset
+        value = (unix_ms << 80) | (0x7 << 76) | ((rand >> 62) << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+        h = f'{value:032x}'
+        ids.append(f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}')
+    return ids
+
+
+def _chunked(iterable: Iterable, n: int) -> Iterator[list]:
+    """Successive lists of up to n items from iterable."""
+    it = iter(iterable)
+    while chunk := list(islice(it, n)):
+        yield chunk
+
+
 class JournaledCalculator:
     """FIFO calculator with complete journaling and rollback support"""
     
-    def __init__(self, engine: FIFOEngine, db_adapter=None):
+    # Rows per bulk snapshot/movement write; bounds memory for very large runs
+    JOURNAL_CHUNK_SIZE = 10_000
+    
+    def __init__(self, engine: FIFOEngine, db_adapter=None, journal_final_snapshots: bool = True):
         self.engine = engine
         self.db_adapter = db_adapter  # Database adapter for persistence
+        # Post-run snapshots duplicate what the pre-run snapshots and the
+        # movements already record; readers of is_current snapshots need them,
+        # otherwise get_final_inventory rebuilds the same rows
+        self.journal_final_snapshots = journal_final_snapshots
         self.logger = logging.getLogger(__name__)
     
     def create_and_execute_run(
@@ -44,12 +87,7 @@ class JournaledCalculator:
         Returns:
             Dict with run results and metadata
         """
-        with TenantContext(tenant_id):
-            # Check for concurrent runs
-            active_runs = self._get_active_runs(tenant_id)
-            if active_runs:
-                raise ValueError(f"Tenant {tenant_id} has active run {active_runs[0]}. Wait for completion or rollback.")
-            
+        with TenantContext(tenant_id), self._tenant_lock(tenant_id):
             # Create run record
             run_id = str(uuid.uuid4())
             run = COGSRun(
@@ -115,39 +153,43 @@ class JournaledCalculator:
         mode: str
     ) -> Dict[str, Any]:
         """Execute calculation with full journaling"""
+        # One wall-clock stamp for every journal row of the run
+        now = datetime.now()
         
-        # Save initial inventory snapshots
-        self._save_initial_inventory_snapshots(run_id, tenant_id, lots)
-        
-        # Create working inventory
-        initial_inventory = InventorySnapshot(
-            timestamp=datetime.now(),
-            lots=[self._copy_lot(lot) for lot in lots]
-        )
-        
-        # Process transactions
-        attributions, final_inventory = self.engine.process_transactions(
-            initial_inventory, sales
-        )
-        
-        # Journal all inventory movements
-        self._journal_inventory_movements(run_id, tenant_id, initial_inventory, final_inventory, sales)
-        
-        # Save final inventory snapshots
-        self._save_final_inventory_snapshots(run_id, tenant_id, final_inventory)
-        
-        # Save COGS attributions
-        self._save_cogs_attributions(run_id, tenant_id, attributions)
-        
-        # Generate and save summaries
-        summaries = self.engine.calculate_summary(attributions)
-        self._save_cogs_summaries(run_id, tenant_id, summaries)
-        
-        # Save validation errors
-        validation_errors = self.engine.get_validation_errors()
-        self._save_validation_errors(run_id, tenant_id, validation_errors)
+        # All journal writes for the run commit together, or not at all
+        with self._transaction():
+            # Save initial inventory snapshots
+            self._save_initial_inventory_snapshots(run_id, tenant_id, lots, now)
+            
+            # Create working inventory
+            initial_inventory = InventorySnapshot(
+                timestamp=now,
+                lots=[self._copy_lot(lot) for lot in lots]
+            )
+            
+            # Process transactions
+            attributions, final_inventory = self.engine.process_transactions(
+                initial_inventory, sales
+            )
+            
+            # Journal all inventory movements
+            self._journal_inventory_movements(run_id, tenant_id, initial_inventory, final_inventory, sales, now)
+            
+            # Generate summaries and collect validation errors
+            summaries = self.engine.calculate_summary(attributions)
+            validation_errors = self.engine.get_validation_errors()
+            
+            # Save final snapshots, attributions, summaries and validation errors
+            saves = [
+                partial(self._save_cogs_attributions, run_id, tenant_id, attributions),
+                partial(self._save_cogs_summaries, run_id, tenant_id, summaries),
+                partial(self._save_validation_errors, run_id, tenant_id, validation_errors),
+            ]
+            if self.journal_final_snapshots:
+                saves.insert(0, partial(self._save_final_inventory_snapshots, run_id, tenant_id, final_inventory, now))
+            self._run_independent_saves(saves)
         
-        total_cogs = sum(attr.total_cogs for attr in attributions)
+        total_cogs = self._sum_cogs(run_id, attributions)
         
         return {
             'attributions': attributions,
@@ -189,7 +231,7 @@ class JournaledCalculator:
         with TenantContext(tenant_id):
             try:
                 # Restore inventory from snapshots
-                restored_lots = self._restore_inventory_from_snapshots(run_id, tenant_id)
+                restored_lots = self._restore_inventory_from_snapshots(run_id, tenant_id, datetime.now())
                 
                 # Mark COGS data as invalid
                 self._invalidate_cogs_data(run_id, tenant_id)
@@ -214,43 +256,40 @@ class JournaledCalculator:
                 self.logger.error(f"Failed to rollback run {run_id}: {e}")
                 raise
     
-    def _save_initial_inventory_snapshots(self, run_id: str, tenant_id: str, lots: List[PurchaseLot]):
+    def _save_initial_inventory_snapshots(self, run_id: str, tenant_id: str, lots: List[PurchaseLot], now: datetime):
         """Save inventory state before processing"""
-        for lot in lots:
-            snapshot = DBInventorySnapshot(
-                snapshot_id=str(uuid.uuid4()),
-                tenant_id=tenant_id,
-                run_id=run_id,
-                lot_id=lot.lot_id,
-                sku=lot.sku,
-                remaining_quantity=lot.remaining_quantity,
-                original_quantity=lot.original_quantity,
-                unit_price=lot.unit_price,
-                freight_cost_per_unit=lot.freight_cost_per_unit,
-                received_date=lot.received_date.date(),
-                is_current=False,  # Pre-run snapshot
-                created_at=datetime.now()
+        if not lots:
+            return
+        # Positional in core.db_models field order; this runs once per lot
+        snapshots = (
+            DBInventorySnapshot(
+                snapshot_id, tenant_id, run_id, lot.lot_id, lot.sku,
+                lot.remaining_quantity, lot.original_quantity,
+                lot.unit_price, lot.freight_cost_per_unit,
+                lot.received_date.date(), now,
+                False  # is_current: pre-run snapshot
             )
-            self._save_inventory_snapshot(snapshot)
+            for snapshot_id, lot in zip(_uuid7_batch(len(lots)), lots)
+        )
+        self._save_inventory_snapshots(snapshots)
     
-    def _save_final_inventory_snapshots(self, run_id: str, tenant_id: str, inventory: InventorySnapshot):
+    def _save_final_inventory_snapshots(self, run_id: str, tenant_id: str, inventory: InventorySnapshot,
+                                        now: datetime):
         """Save inventory state after processing"""
-        for lot in inventory.lots:
-            snapshot = DBInventorySnapshot(
-                snapshot_id=str(uuid.uuid4()),
-                tenant_id=tenant_id,
-                run_id=run_id,
-                lot_id=lot.lot_id,
-                sku=lot.sku,
-                remaining_quantity=lot.remaining_quantity,
-                original_quantity=lot.original_quantity,
-                unit_price=lot.unit_price,
-                freight_cost_per_unit=lot.freight_cost_per_unit,
-                received_date=lot.received_date.date(),
-                is_current=True,  # Post-run snapshot
-                created_at=datetime.now()
+        if not inventory.lots:
+            return
+        # Positional in core.db_models field order; this runs once per lot
+        snapshots = (
+            DBInventorySnapshot(
+                snapshot_id, tenant_id, run_id, lot.lot_id, lot.sku,
+                lot.remaining_quantity, lot.original_quantity,
+                lot.unit_price, lot.freight_cost_per_unit,
+                lot.received_date.date(), now,
+                True  # is_current: post-run snapshot
             )
-            self._save_inventory_snapshot(snapshot)
+            for snapshot_id, lot in zip(_uuid7_batch(len(inventory.lots)), inventory.lots)
+        )
+        self._save_inventory_snapshots(snapshots)
     
     def _journal_inventory_movements(
         self,
@@ -258,79 +297,187 @@ class JournaledCalculator:
         tenant_id: str,
         initial: InventorySnapshot,
         final: InventorySnapshot,
-        sales: List[Sale]
+        sales: List[Sale],
+        now: datetime
     ):
         """Journal all inventory movements"""
-        # Create lookup for final quantities
-        final_quantities = {lot.lot_id: lot.remaining_quantity for lot in final.lots}
+        if not initial.lots:
+            return
+        initial_lots = initial.lots
+        init_qty = np.fromiter(
+            (lot.remaining_quantity for lot in initial_lots), dtype=np.int64, count=len(initial_lots)
+        )
+        
+        # The engine returns its working lots in input order; only fall back to
+        # an id lookup (missing lots count as fully consumed) when it did not
+        if [lot.lot_id for lot in final.lots] == [lot.lot_id for lot in initial_lots]:
+            final_qty = np.fromiter(
+                (lot.remaining_quantity for lot in final.lots), dtype=np.int64, count=len(initial_lots)
+            )
+        else:
+            final_quantities = {lot.lot_id: lot.remaining_quantity for lot in final.lots}
+            final_qty = np.fromiter(
+                (final_quantities.get(lot.lot_id, 0) for lot in initial_lots),
+                dtype=np.int64, count=len(initial_lots)
+            )
         
         # Track changes per lot
-        for initial_lot in initial.lots:
-            final_qty = final_quantities.get(initial_lot.lot_id, 0)
-            change = final_qty - initial_lot.remaining_quantity
-            
-            if change != 0:
-                movement = InventoryMovement(
-                    movement_id=str(uuid.uuid4()),
-                    tenant_id=tenant_id,
-                    run_id=run_id,
-                    lot_id=initial_lot.lot_id,
-                    sku=initial_lot.sku,
-                    movement_type='sale' if change < 0 else 'return',
-                    quantity=change,
-                    remaining_after=final_qty,
-                    unit_cost=initial_lot.total_unit_cost,
-                    reference_id=None,  # Could link to specific sale
-                    created_at=datetime.now()
-                )
-                self._save_inventory_movement(movement)
-    
-    def _restore_inventory_from_snapshots(self, run_id: str, tenant_id: str) -> List[Dict[str, Any]]:
+        delta = final_qty - init_qty
+        changed = np.nonzero(delta)[0]
+        changes = zip(
+            (initial_lots[i] for i in changed.tolist()), final_qty[changed].tolist(), delta[changed].tolist()
+        )
+        
+        # Positional in core.db_models field order; this runs once per changed lot
+        movements = (
+            InventoryMovement(
+                movement_id, tenant_id, run_id, initial_lot.lot_id, initial_lot.sku,
+                'sale' if change < 0 else 'return', change, remaining,
+                initial_lot.total_unit_cost, now,
+                None  # reference_id: could link to specific sale
+            )
+            for movement_id, (initial_lot, remaining, change) in zip(_uuid7_batch(len(changed)), changes)
+        )
+        self._save_inventory_movements(movements)
+    
+    def _restore_inventory_from_snapshots(self, run_id: str, tenant_id: str, now: datetime) -> List[Dict[str, Any]]:
         """Restore inventory to pre-run state using snapshots"""
         # Get pre-run snapshots (is_current=False)
         pre_run_snapshots = self._get_inventory_snapshots(run_id, tenant_id, is_current=False)
         
-        restored_lots = []
-        for snapshot in pre_run_snapshots:
-            # This would update the actual inventory table
-            restored_lots.append({
+        # This would update the actual inventory table
+        restored_lots = [
+            {
                 'lot_id': snapshot['lot_id'],
                 'sku': snapshot['sku'],
                 'restored_quantity': snapshot['remaining_quantity']
-            })
-            
-            # Create rollback movement
-            rollback_movement = InventoryMovement(
-                movement_id=str(uuid.uuid4()),
-                tenant_id=tenant_id,
-                run_id=run_id,
-                lot_id=snapshot['lot_id'],
-                sku=snapshot['sku'],
-                movement_type='rollback',
-                quantity=0,  # Restoration, not a change
-                remaining_after=snapshot['remaining_quantity'],
-                unit_cost=snapshot['unit_price'] + snapshot['freight_cost_per_unit'],
-                reference_id=run_id,
-                created_at=datetime.now()
+            }
+            for snapshot in pre_run_snapshots
+        ]
+        
+        # Create rollback movements
+        rollback_movements = (
+            InventoryMovement(
+                movement_id, tenant_id, run_id, snapshot['lot_id'], snapshot['sku'],
+                'rollback', 0,  # Restoration, not a change
+                snapshot['remaining_quantity'],
+                self._snapshot_unit_cost(snapshot), now,
+                run_id  # reference_id
             )
-            self._save_inventory_movement(rollback_movement)
+            for movement_id, snapshot in zip(_uuid7_batch(len(pre_run_snapshots)), pre_run_snapshots)
+        )
+        self._save_inventory_movements(rollback_movements)
         
         return restored_lots
     
+    @staticmethod
+    def _snapshot_unit_cost(snapshot: Dict[str, Any]) -> Decimal:
+        """Landed unit cost of a snapshot row, preferring the adapter's computed total_unit_cost"""
+        total_unit_cost = snapshot.get('total_unit_cost')
+        if total_unit_cost is None:
+            return snapshot['unit_price'] + snapshot['freight_cost_per_unit']
+        return total_unit_cost
+    
+    def get_final_inventory(self, run_id: str, tenant_id: str) -> List[Dict[str, Any]]:
+        """
+        Post-run inventory of a run, rebuilt from its pre-run snapshots and movements.
+        
+        Returns:
+            Pre-run snapshot dicts with remaining_quantity set to the quantity
+            left after the run
+        """
+        remaining_after = {
+            movement['lot_id']: movement['remaining_after']
+            for movement in self._get_inventory_movements(run_id, tenant_id)
+            if movement['movement_type'] != 'rollback'
+        }
+        return [
+            {
+                **snapshot,
+                'remaining_quantity': remaining_after.get(snapshot['lot_id'], snapshot['remaining_quantity']),
+                'is_current': True
+            }
+            for snapshot in self._get_inventory_snapshots(run_id, tenant_id, is_current=False)
+        ]
+    
     def _copy_lot(self, lot: PurchaseLot) -> PurchaseLot:
-        """Create a deep copy of a lot"""
-        return PurchaseLot(
-            lot_id=lot.lot_id,
-            sku=lot.sku,
-            received_date=lot.received_date,
-            original_quantity=lot.original_quantity,
-            remaining_quantity=lot.remaining_quantity,
-            unit_price=lot.unit_price,
-            freight_cost_per_unit=lot.freight_cost_per_unit,
-            tenant_id=lot.tenant_id
-        )
+        """
+        Create an independent copy of a lot.
+        
+        Every field holds an immutable value, so copying the instance dict is a
+        full copy; it skips the generated __init__ and its keyword arguments.
+        """
+        copied = object.__new__(PurchaseLot)
+        copied.__dict__.update(lot.__dict__)
+        return copied
     
     # Database adapter methods (would be implemented based on your DB choice)
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """
+        Group adapter writes into one transaction when the adapter supports it.
+        
+        Commits on success; on error rolls back and re-raises, so the caller can
+        record the failure in a fresh transaction.
+        """
+        begin = getattr(self.db_adapter, 'begin', None)
+        if begin is None:
+            yield
+            return
+        begin()
+        try:
+            yield
+        except BaseException:
+            self.db_adapter.rollback()
+            raise
+        self.db_adapter.commit()
+    
+    def _run_independent_saves(self, saves: List[Callable[[], None]]) -> None:
+        """
+        Run journal saves that do not depend on each other.
+        
+        A transactional adapter holds one connection, which cannot run
+        statements concurrently, so its saves stay sequential. Adapters without
+        transactions issue each call independently and get the saves submitted
+        together, so the stage costs the slowest save rather than their sum.
+        """
+        if not self.db_adapter or len(saves) < 2 or getattr(self.db_adapter, 'begin', None) is not None:
+            for save in saves:
+                save()
+            return
+        with ThreadPoolExecutor(max_workers=len(saves)) as executor:
+            futures = [executor.submit(save) for save in saves]
+            for future in futures:
+                future.result()
+    
+    @contextmanager
+    def _tenant_lock(self, tenant_id: str) -> Iterator[None]:
+        """
+        Hold the tenant's run lock for the duration of a run.
+        
+        Adapters exposing ``try_tenant_lock`` take a database lock (e.g. a
+        Postgres advisory lock) so the check and the run cannot race; others
+        fall back to querying for pending or running runs.
+        """
+        try_lock = getattr(self.db_adapter, 'try_tenant_lock', None)
+        if try_lock is None:
+            active_runs = self._get_active_runs(tenant_id)
+            if active_runs:
+                raise ValueError(f"Tenant {tenant_id} has active run {active_runs[0]}. Wait for completion or rollback.")
+            yield
+            return
+        if not try_lock(tenant_id):
+            # Only the contended path pays for the lookup, to name the blocking run
+            active_runs = self._get_active_runs(tenant_id)
+            holder = f"active run {active_runs[0]}" if active_runs else "an active run"
+            raise ValueError(f"Tenant {tenant_id} has {holder}. Wait for completion or rollback.")
+        try:
+            yield
+        finally:
+            release = getattr(self.db_adapter, 'release_tenant_lock', None)
+            if release is not None:
+                release(tenant_id)
+    
     def _save_run(self, run: COGSRun):
         """Save run to database"""
         if self.db_adapter:
@@ -353,15 +500,27 @@ class JournaledCalculator:
             return self.db_adapter.get_active_runs(tenant_id)
         return []
     
-    def _save_inventory_snapshot(self, snapshot: DBInventorySnapshot):
-        """Save inventory snapshot"""
+    def _save_inventory_snapshots(self, snapshots: Iterable[DBInventorySnapshot]):
+        """Save inventory snapshots in chunked bulk writes when the adapter supports it"""
         if self.db_adapter:
-            self.db_adapter.save_inventory_snapshot(snapshot)
+            save_many = getattr(self.db_adapter, 'save_inventory_snapshots', None)
+            if save_many is not None:
+                for chunk in _chunked(snapshots, self.JOURNAL_CHUNK_SIZE):
+                    save_many(chunk)
+            else:
+                for snapshot in snapshots:
+                    self.db_adapter.save_inventory_snapshot(snapshot)
     
-    def _save_inventory_movement(self, movement: InventoryMovement):
-        """Save inventory movement"""
+    def _save_inventory_movements(self, movements: Iterable[InventoryMovement]):
+        """Save inventory movements in chunked bulk writes when the adapter supports it"""
         if self.db_adapter:
-            self.db_adapter.save_inventory_movement(movement)
+            save_many = getattr(self.db_adapter, 'save_inventory_movements', None)
+            if save_many is not None:
+                for chunk in _chunked(movements, self.JOURNAL_CHUNK_SIZE):
+                    save_many(chunk)
+            else:
+                for movement in movements:
+                    self.db_adapter.save_inventory_movement(movement)
     
     def _save_cogs_attributions(self, run_id: str, tenant_id: str, attributions):
         """Save COGS attributions"""
@@ -378,12 +537,25 @@ class JournaledCalculator:
         if self.db_adapter:
             self.db_adapter.save_validation_errors(run_id, tenant_id, errors)
     
+    def _sum_cogs(self, run_id: str, attributions) -> Decimal:
+        """Total COGS of a run, aggregated by the database when the adapter supports it"""
+        sum_cogs = getattr(self.db_adapter, 'sum_cogs', None)
+        if sum_cogs is not None:
+            return sum_cogs(run_id)
+        return sum(attr.total_cogs for attr in attributions)
+    
     def _get_inventory_snapshots(self, run_id: str, tenant_id: str, is_current: bool) -> List[Dict[str, Any]]:
         """Get inventory snapshots"""
         if self.db_adapter:
             return self.db_adapter.get_inventory_snapshots(run_id, tenant_id, is_current)
         return []
     
+    def _get_inventory_movements(self, run_id: str, tenant_id: str) -> List[Dict[str, Any]]:
+        """Get inventory movements of a run in journal order"""
+        if self.db_adapter:
+            return self.db_adapter.get_inventory_movements(run_id, tenant_id)
+        return []
+    
     def _invalidate_cogs_data(self, run_id: str, tenant_id: str):
         """Mark COGS data as invalid"""
         if self.db_adapter:
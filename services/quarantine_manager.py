@@ -12,6 +12,13 @@ from dataclasses import dataclass, field
 from enum import Enum
 import uuid
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pv
+except ImportError:  # optional; exports are written with pandas
+    pa = None
+    pv = None
+
 from .upload_validator import ValidationResult, ValidationIssue
 
 
@@ -108,6 +115,9 @@ class QuarantineManager:
     Ensures no data is ever lost and provides tools for manual review and correction.
     """
     
+    # Rows per batch for the pyarrow CSV writer
+    EXPORT_BATCH_SIZE = 65536
+    
     def __init__(self, quarantine_dir: Optional[str] = None):
         """
         Initialize quarantine manager.
@@ -322,13 +332,20 @@ class QuarantineManager:
         
         return pd.DataFrame()
     
-    def export_quarantine_csv(self, batch_id: str, include_metadata: bool = True) -> Optional[str]:
+    def export_quarantine_csv(
+        self,
+        batch_id: str,
+        include_metadata: bool = True,
+        use_arrow: bool = True
+    ) -> Optional[str]:
         """
         Export quarantine batch to CSV for manual review/correction.
         
         Args:
             batch_id: Batch identifier
             include_metadata: Whether to include quarantine metadata columns
+            use_arrow: Write with the pyarrow CSV writer when available; False
+                forces the pandas writer
             
         Returns:
             Path to exported CSV file, or None if failed
@@ -347,6 +364,7 @@ class QuarantineManager:
                 row['_quarantine_reason'] = record.quarantine_reason.value
                 row['_quarantine_status'] = record.status.value
                 row['_issues'] = '; '.join([issue.message for issue in record.issues])
+            rows.append(row)
         
         if not rows:
             return None
@@ -354,6 +372,14 @@ class QuarantineManager:
         # Create DataFrame and save
         df = pd.DataFrame(rows)
         export_path = self.quarantine_dir / f"{batch_id}_export.csv"
+        if use_arrow and pv is not None:
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                table = None  # mixed-type column; let pandas stringify it
+            if table is not None:
+                pv.write_csv(table, str(export_path), write_options=pv.WriteOptions(batch_size=self.EXPORT_BATCH_SIZE))
+                return str(export_path)
         df.to_csv(export_path, index=False)
         
         return str(export_path)
@@ -3,15 +3,42 @@ Core validation and normalization service for handling messy real-world data for
 This service never fails completely - it quarantines problematic data and provides clear feedback.
 """
 
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Callable, Dict, List, Tuple, Any, Optional
 from datetime import datetime
+from functools import cached_property, partial
 from decimal import Decimal, InvalidOperation
 import pandas as pd
 import numpy as np
 import re
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
+try:
+    import re2 as _value_regex
+except ImportError:  # optional; google-re2 matches cell values in linear time
+    _value_regex = re
+
+
+# Cell cleanup: a leading "SKU:" label, and separators inside quantities
+_SKU_PREFIX = re.compile(r'^SKU:\s*')
+_QUANTITY_NOISE = re.compile(r'[,$\s]')
+
+
+def _compile_value_patterns(patterns: List[Tuple[str, Any]], flags: str = "") -> List[Tuple[re.Pattern, Any]]:
+    """Compile (pattern, payload) pairs once; flags are inline, which re2 also takes"""
+    return [(_value_regex.compile(flags + pattern), payload) for pattern, payload in patterns]
+
+
+# Per-field validation status codes
+FIELD_OK = 0
+FIELD_WARNING = 1
+FIELD_CRITICAL = 2
+
+
+def _quarantine_kernel(status: np.ndarray) -> np.ndarray:
+    """Rows of a (row, field) status matrix with any FIELD_CRITICAL field"""
+    return (status == FIELD_CRITICAL).any(axis=1)
+
 
 class ValidationSeverity(Enum):
     """Severity levels for validation issues"""
@@ -51,6 +78,16 @@ class ValidationResult:
     @property
     def quarantined_rows(self) -> int:
         return len(self.quarantined_data)
+    
+    @cached_property
+    def issues_df(self) -> pd.DataFrame:
+        """Issues as columns (row_index, column, severity, message) for vectorized reporting"""
+        return pd.DataFrame({
+            'row_index': pd.Series([issue.row_index for issue in self.issues], dtype=object),
+            'column': pd.Series([issue.column for issue in self.issues], dtype='string'),
+            'severity': pd.Series([issue.severity.value for issue in self.issues], dtype='string'),
+            'message': pd.Series([issue.message for issue in self.issues], dtype='string'),
+        })
 
 
 class UploadValidator:
@@ -78,19 +115,32 @@ class UploadValidator:
     
     # SKU normalization patterns  
     SKU_PATTERNS = [
-        (r'^SKU:\s*(.+)$', lambda x: re.sub(r'^SKU:\s*', '', x)),  # SKU: ABC-123
+        (r'^SKU:\s*(.+)$', lambda x: _SKU_PREFIX.sub('', x)),     # SKU: ABC-123
         (r'^(.+)\s+(.+)$', lambda x: x.replace(' ', '-')),         # ABC 123 -> ABC-123
     ]
     
+    # Compiled once per process and shared by every validator instance
+    _DATE_REGEXES = _compile_value_patterns(DATE_PATTERNS)
+    _NUMBER_REGEXES = _compile_value_patterns(NUMBER_PATTERNS)
+    _SKU_REGEXES = _compile_value_patterns(SKU_PATTERNS, flags="(?i)")
+    
     def __init__(self):
         self.issues = []
         
-    def validate_sales_data(self, df: pd.DataFrame) -> ValidationResult:
+    def validate_sales_data(
+        self,
+        df: pd.DataFrame,
+        column_mapping: Optional[Dict[str, str]] = None,
+        trim_empty_columns: bool = True
+    ) -> ValidationResult:
         """
         Validate and normalize sales data with comprehensive error handling.
         
         Args:
             df: Raw sales dataframe
+            column_mapping: Column mapping from an earlier chunk of the same file (optional)
+            trim_empty_columns: Drop trailing all-empty columns before detecting the
+                mapping; chunks of a larger file keep them, as they may be empty only locally
             
         Returns:
             ValidationResult with normalized data and issues
@@ -98,15 +148,12 @@ class UploadValidator:
         self.issues = []
         original_df = df.copy()
         
-        # Initialize result containers
-        normalized_rows = []
-        quarantined_rows = []
-        
         # Clean up the dataframe structure first
-        df = self._clean_dataframe_structure(df)
+        df = self._clean_dataframe_structure(df, trim_empty_columns=trim_empty_columns and column_mapping is None)
         
-        # Detect and map columns
-        column_mapping = self._detect_sales_columns(df)
+        # Detect and map columns unless an earlier chunk already did
+        if column_mapping is None:
+            column_mapping = self._detect_sales_columns(df)
         if not column_mapping or len(column_mapping) < 3:
             return ValidationResult(
                 normalized_data=pd.DataFrame(),
@@ -117,38 +164,33 @@ class UploadValidator:
                     column="structure",
                     original_value="Unknown",
                     message="Could not identify required columns (SKU, quantity, date)"
-                )]
+                )],
+                summary=self._structure_failure_summary(original_df)
             )
         
-        # Process each row individually to avoid losing good data
-        for idx, row in df.iterrows():
-            try:
-                normalized_row = self._validate_sales_row(row, column_mapping, idx)
-                if normalized_row is not None:
-                    normalized_rows.append(normalized_row)
-                else:
-                    quarantined_rows.append(original_df.iloc[idx])
-            except Exception as e:
-                # Log the error but don't fail completely
-                self.issues.append(ValidationIssue(
-                    severity=ValidationSeverity.CRITICAL,
-                    row_index=idx,
-                    column="row",
-                    original_value=str(row.to_dict()),
-                    message=f"Unexpected error processing row: {str(e)}"
-                ))
-                quarantined_rows.append(original_df.iloc[idx])
+        # Validate column by column; every row keeps its own issues
+        qty_col = column_mapping.get('quantity')
+        date_col = column_mapping.get('date')
+        values, valid = self._validate_fields(df, [
+            ('sku', column_mapping.get('sku'), self._normalize_sku, bool),
+            ('quantity_sold', qty_col, partial(self._normalize_quantity, column=qty_col),
+             lambda qty: qty is not None),
+            ('sale_date', date_col, partial(self._normalize_date, column=date_col), bool),
+        ])
         
         # Create result dataframes
-        if normalized_rows:
-            normalized_df = pd.DataFrame(normalized_rows)
+        if valid.any():
+            stamp = int(datetime.now().timestamp())
+            normalized_df = pd.DataFrame({
+                'sku': values['sku'][valid].tolist(),
+                'quantity_sold': values['quantity_sold'][valid].tolist(),
+                'sale_date': values['sale_date'][valid].tolist(),
+                'sale_id': [f"SALE_{idx}_{stamp}" for idx in df.index[valid]]
+            })
         else:
             normalized_df = pd.DataFrame(columns=['sku', 'quantity_sold', 'sale_date', 'sale_id'])
-            
-        if quarantined_rows:
-            quarantined_df = pd.DataFrame(quarantined_rows)
-        else:
-            quarantined_df = pd.DataFrame()
+        
+        quarantined_df = self._quarantined_rows(original_df, df.index[~valid])
         
         # Generate summary
         summary = {
@@ -167,12 +209,20 @@ class UploadValidator:
             summary=summary
         )
     
-    def validate_lots_data(self, df: pd.DataFrame) -> ValidationResult:
+    def validate_lots_data(
+        self,
+        df: pd.DataFrame,
+        column_mapping: Optional[Dict[str, str]] = None,
+        trim_empty_columns: bool = True
+    ) -> ValidationResult:
         """
         Validate and normalize lots data with comprehensive error handling.
         
         Args:
             df: Raw lots dataframe
+            column_mapping: Column mapping from an earlier chunk of the same file (optional)
+            trim_empty_columns: Drop trailing all-empty columns before detecting the
+                mapping; chunks of a larger file keep them, as they may be empty only locally
             
         Returns:
             ValidationResult with normalized data and issues
@@ -180,15 +230,12 @@ class UploadValidator:
         self.issues = []
         original_df = df.copy()
         
-        # Initialize result containers
-        normalized_rows = []
-        quarantined_rows = []
-        
         # Clean up the dataframe structure first
-        df = self._clean_dataframe_structure(df)
+        df = self._clean_dataframe_structure(df, trim_empty_columns=trim_empty_columns and column_mapping is None)
         
-        # Detect and map columns
-        column_mapping = self._detect_lots_columns(df)
+        # Detect and map columns unless an earlier chunk already did
+        if column_mapping is None:
+            column_mapping = self._detect_lots_columns(df)
         if not column_mapping or len(column_mapping) < 5:
             return ValidationResult(
                 normalized_data=pd.DataFrame(),
@@ -199,39 +246,51 @@ class UploadValidator:
                     column="structure", 
                     original_value="Unknown",
                     message="Could not identify required columns (lot_id, SKU, received_date, quantities, prices)"
-                )]
+                )],
+                summary=self._structure_failure_summary(original_df)
             )
         
-        # Process each row individually
-        for idx, row in df.iterrows():
-            try:
-                normalized_row = self._validate_lots_row(row, column_mapping, idx)
-                if normalized_row is not None:
-                    normalized_rows.append(normalized_row)
-                else:
-                    quarantined_rows.append(original_df.iloc[idx])
-            except Exception as e:
-                self.issues.append(ValidationIssue(
-                    severity=ValidationSeverity.CRITICAL,
-                    row_index=idx,
-                    column="row",
-                    original_value=str(row.to_dict()),
-                    message=f"Unexpected error processing row: {str(e)}"
-                ))
-                quarantined_rows.append(original_df.iloc[idx])
+        # Validate column by column; every row keeps its own issues
+        orig_qty_col = column_mapping.get('original_quantity')
+        rem_qty_col = column_mapping.get('remaining_quantity')
+        date_col = column_mapping.get('received_date')
+        price_col = column_mapping.get('unit_price')
+        freight_col = column_mapping.get('freight_cost_per_unit')
+        values, valid = self._validate_fields(df, [
+            ('lot_id', column_mapping.get('lot_id'), self._normalize_lot_id, bool),
+            ('sku', column_mapping.get('sku'), self._normalize_sku, bool),
+            ('received_date', date_col, partial(self._normalize_date, column=date_col), bool),
+            ('original_quantity', orig_qty_col, partial(self._normalize_quantity, column=orig_qty_col),
+             lambda qty: qty is not None and qty > 0),
+            ('remaining_quantity', rem_qty_col, partial(self._normalize_quantity, column=rem_qty_col), None),
+            ('unit_price', price_col, partial(self._normalize_currency, column=price_col),
+             lambda price: price is not None and price >= 0),
+            ('freight_cost_per_unit', freight_col, partial(self._normalize_currency, column=freight_col), None),
+        ])
         
         # Create result dataframes
-        if normalized_rows:
-            normalized_df = pd.DataFrame(normalized_rows)
+        if valid.any():
+            original_qty = values['original_quantity'][valid]
+            remaining_qty = values['remaining_quantity'][valid]
+            freight = values['freight_cost_per_unit'][valid]
+            normalized_df = pd.DataFrame({
+                'lot_id': values['lot_id'][valid].tolist(),
+                'sku': values['sku'][valid].tolist(),
+                'received_date': values['received_date'][valid].tolist(),
+                'original_quantity': original_qty.tolist(),
+                # Remaining quantity defaults to original, freight to 0.0
+                'remaining_quantity': np.where(
+                    remaining_qty == None, original_qty, remaining_qty  # noqa: E711
+                ).tolist(),
+                'unit_price': values['unit_price'][valid].tolist(),
+                'freight_cost_per_unit': np.where(freight == None, 0.0, freight).tolist()  # noqa: E711
+            })
         else:
             columns = ['lot_id', 'sku', 'received_date', 'original_quantity', 
                       'remaining_quantity', 'unit_price', 'freight_cost_per_unit']
             normalized_df = pd.DataFrame(columns=columns)
-            
-        if quarantined_rows:
-            quarantined_df = pd.DataFrame(quarantined_rows)
-        else:
-            quarantined_df = pd.DataFrame()
+        
+        quarantined_df = self._quarantined_rows(original_df, df.index[~valid])
         
         # Generate summary
         summary = {
@@ -250,7 +309,19 @@ class UploadValidator:
             summary=summary
         )
     
-    def _clean_dataframe_structure(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _structure_failure_summary(original_df: pd.DataFrame) -> Dict[str, Any]:
+        """Summary of a dataframe quarantined whole because its columns were not recognized"""
+        return {
+            'total_rows': len(original_df),
+            'processed_rows': 0,
+            'quarantined_rows': len(original_df),
+            'critical_issues': 1,
+            'warnings': 0,
+            'column_mapping': {}
+        }
+    
+    def _clean_dataframe_structure(self, df: pd.DataFrame, trim_empty_columns: bool = True) -> pd.DataFrame:
         """Clean up common dataframe structural issues"""
         # Remove completely unnamed columns
         df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
@@ -262,11 +333,13 @@ class UploadValidator:
         df.columns = df.columns.str.strip().str.replace('\n', ' ').str.replace('\r', ' ')
         
         # Remove trailing empty columns that are just commas in CSV
-        for col in df.columns[::-1]:  # Check from right to left
-            if df[col].isna().all():
-                df = df.drop(columns=[col])
-            else:
-                break
+        # (skipped for later chunks, whose columns may be empty only locally)
+        if trim_empty_columns:
+            for col in df.columns[::-1]:  # Check from right to left
+                if df[col].isna().all():
+                    df = df.drop(columns=[col])
+                else:
+                    break
         
         return df
     
@@ -370,126 +443,134 @@ class UploadValidator:
             return mapping
         return None
     
-    def _validate_sales_row(self, row: pd.Series, column_mapping: Dict[str, str], idx: int) -> Optional[Dict[str, Any]]:
-        """Validate and normalize a single sales row"""
-        result = {}
-        has_critical_error = False
-        
-        # Validate SKU
-        sku_col = column_mapping.get('sku')
-        if sku_col and sku_col in row:
-            sku = self._normalize_sku(row[sku_col], idx)
-            if sku:
-                result['sku'] = sku
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
-        
-        # Validate quantity
-        qty_col = column_mapping.get('quantity')
-        if qty_col and qty_col in row:
-            quantity = self._normalize_quantity(row[qty_col], idx, qty_col)
-            if quantity is not None:
-                result['quantity_sold'] = quantity
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
-        
-        # Validate date
-        date_col = column_mapping.get('date')
-        if date_col and date_col in row:
-            date = self._normalize_date(row[date_col], idx, date_col)
-            if date:
-                result['sale_date'] = date
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
+    def _validate_fields(
+        self,
+        df: pd.DataFrame,
+        fields: List[Tuple[str, Optional[str], Callable[[Any, int], Any], Optional[Callable[[Any], bool]]]]
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Validate mapped columns, normalizing each distinct cell value once.
         
-        # Generate sale ID
-        result['sale_id'] = f"SALE_{idx}_{int(datetime.now().timestamp())}"
+        Fields are checked in row order, so issues come out exactly as a
+        row-by-row pass would produce them: by row, then by field. A normalizer
+        that raises quarantines the row and skips its later fields.
         
-        return result if not has_critical_error else None
+        Args:
+            df: Cleaned dataframe
+            fields: (name, column, normalizer, accept) tuples; ``accept`` tells
+                whether a normalized value is usable, or is None for optional
+                fields whose missing values get defaults
+            
+        Returns:
+            Normalized values per field name and a mask of valid rows
+        """
+        n_rows = len(df)
+        status = np.zeros((n_rows, len(fields)), dtype=np.int8)  # FIELD_* code per row and field
+        failed = np.zeros(n_rows, dtype=bool)  # rows whose validation raised
+        values = {}
+        pending = []  # (position, field order, issue order, issue)
+        
+        for order, (name, column, normalize, accept) in enumerate(fields):
+            if not column or column not in df.columns:
+                values[name] = np.full(n_rows, None, dtype=object)
+                if accept is not None:
+                    status[:, order] = FIELD_CRITICAL
+                continue
+            
+            series = df[column]
+            codes, outcomes = self._column_outcomes(series, normalize)
+            results = np.empty(len(outcomes), dtype=object)
+            results[:] = [result for result, _, _ in outcomes]
+            values[name] = results[codes]
+            status[:, order] = np.array([
+                self._field_status(result, issues, error, accept)
+                for result, issues, error in outcomes
+            ], dtype=np.int8)[codes]
+            
+            # Expand captured issues and errors onto the rows that hit them
+            noisy = np.array([bool(issues) or error is not None for _, issues, error in outcomes])
+            positions = np.flatnonzero(noisy[codes] & ~failed)
+            for pos in positions:
+                _, issues, error = outcomes[codes[pos]]
+                label = df.index[pos]
+                for k, issue in enumerate(issues):
+                    pending.append((pos, order, k, replace(
+                        issue, row_index=label, original_value=series.iloc[pos]
+                    )))
+                if error is not None:
+                    pending.append((pos, order, len(issues), ValidationIssue(
+                        severity=ValidationSeverity.CRITICAL,
+                        row_index=label,
+                        column="row",
+                        original_value=str(df.iloc[pos].to_dict()),
+                        message=f"Unexpected error processing row: {str(error)}"
+                    )))
+                    failed[pos] = True
+        
+        pending.sort(key=lambda entry: entry[:3])
+        self.issues.extend(issue for *_, issue in pending)
+        return values, ~_quarantine_kernel(status)
     
-    def _validate_lots_row(self, row: pd.Series, column_mapping: Dict[str, str], idx: int) -> Optional[Dict[str, Any]]:
-        """Validate and normalize a single lots row"""
-        result = {}
-        has_critical_error = False
-        
-        # Validate lot_id
-        lot_col = column_mapping.get('lot_id')
-        if lot_col and lot_col in row:
-            lot_id = str(row[lot_col]).strip() if pd.notna(row[lot_col]) else None
-            if lot_id:
-                result['lot_id'] = lot_id
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
-        
-        # Validate SKU
-        sku_col = column_mapping.get('sku')
-        if sku_col and sku_col in row:
-            sku = self._normalize_sku(row[sku_col], idx)
-            if sku:
-                result['sku'] = sku
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
-        
-        # Validate received date
-        date_col = column_mapping.get('received_date')
-        if date_col and date_col in row:
-            date = self._normalize_date(row[date_col], idx, date_col)
-            if date:
-                result['received_date'] = date
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
-        
-        # Validate quantities
-        orig_qty_col = column_mapping.get('original_quantity')
-        if orig_qty_col and orig_qty_col in row:
-            qty = self._normalize_quantity(row[orig_qty_col], idx, orig_qty_col)
-            if qty is not None and qty > 0:
-                result['original_quantity'] = qty
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
-        
-        # Remaining quantity (optional, defaults to original)
-        rem_qty_col = column_mapping.get('remaining_quantity')
-        if rem_qty_col and rem_qty_col in row:
-            qty = self._normalize_quantity(row[rem_qty_col], idx, rem_qty_col)
-            result['remaining_quantity'] = qty if qty is not None else result.get('original_quantity', 0)
-        else:
-            result['remaining_quantity'] = result.get('original_quantity', 0)
-        
-        # Validate unit price
-        price_col = column_mapping.get('unit_price')
-        if price_col and price_col in row:
-            price = self._normalize_currency(row[price_col], idx, price_col)
-            if price is not None and price >= 0:
-                result['unit_price'] = price
-            else:
-                has_critical_error = True
-        else:
-            has_critical_error = True
+    @staticmethod
+    def _field_status(
+        result: Any,
+        issues: List[ValidationIssue],
+        error: Optional[Exception],
+        accept: Optional[Callable[[Any], bool]]
+    ) -> int:
+        """FIELD_* code for one normalized value"""
+        if error is not None or (accept is not None and not accept(result)):
+            return FIELD_CRITICAL
+        if any(issue.severity == ValidationSeverity.WARNING for issue in issues):
+            return FIELD_WARNING
+        return FIELD_OK
+    
+    def _column_outcomes(
+        self,
+        series: pd.Series,
+        normalize: Callable[[Any, int], Any]
+    ) -> Tuple[np.ndarray, List[Tuple[Any, List[ValidationIssue], Optional[Exception]]]]:
+        """
+        Run a scalar normalizer once per distinct value of a column.
         
-        # Freight cost (optional, defaults to 0)
-        freight_col = column_mapping.get('freight_cost_per_unit')
-        if freight_col and freight_col in row:
-            freight = self._normalize_currency(row[freight_col], idx, freight_col)
-            result['freight_cost_per_unit'] = freight if freight is not None else 0.0
-        else:
-            result['freight_cost_per_unit'] = 0.0
+        Returns:
+            Codes mapping each row to an outcome, and per distinct value its
+            normalized result, captured issues and any exception raised
+        """
+        codes, uniques = pd.factorize(series)
+        # Missing cells share one outcome, stored after the distinct values
+        codes = np.where(codes < 0, len(uniques), codes)
         
-        return result if not has_critical_error else None
+        outcomes = []
+        for value in [*uniques, np.nan]:
+            start = len(self.issues)
+            try:
+                result, error = normalize(value, -1), None
+            except Exception as e:
+                result, error = None, e
+            outcomes.append((result, self.issues[start:], error))
+            del self.issues[start:]
+        return codes, outcomes
+    
+    @staticmethod
+    def _quarantined_rows(original_df: pd.DataFrame, labels: pd.Index) -> pd.DataFrame:
+        """Original rows for the given labels, or an empty frame"""
+        if len(labels) == 0:
+            return pd.DataFrame()
+        rows = original_df.loc[labels]
+        # Categorical input columns come back as plain values
+        categorical = {
+            column: object for column, dtype in rows.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+        }
+        if categorical:
+            rows = rows.astype(categorical)
+        return rows.infer_objects()
+    
+    @staticmethod
+    def _normalize_lot_id(value: Any, row_idx: int) -> Optional[str]:
+        """Normalize a lot identifier"""
+        return str(value).strip() if pd.notna(value) else None
     
     def _normalize_sku(self, value: Any, row_idx: int) -> Optional[str]:
         """Normalize SKU values with intelligent cleaning"""
@@ -507,8 +588,8 @@ class UploadValidator:
         sku = str(value).strip().upper()
         
         # Apply SKU normalization patterns
-        for pattern, transformer in self.SKU_PATTERNS:
-            if re.match(pattern, sku, re.IGNORECASE):
+        for pattern, transformer in self._SKU_REGEXES:
+            if pattern.match(sku):
                 normalized = transformer(sku)
                 if normalized != sku:
                     self.issues.append(ValidationIssue(
@@ -539,7 +620,7 @@ class UploadValidator:
         # Handle string representations
         if isinstance(value, str):
             # Remove common non-numeric characters
-            cleaned = re.sub(r'[,$\s]', '', value.strip())
+            cleaned = _QUANTITY_NOISE.sub('', value.strip())
             try:
                 quantity = float(cleaned)
             except ValueError:
@@ -594,8 +675,8 @@ class UploadValidator:
         if isinstance(value, str):
             # Apply number cleaning patterns
             cleaned = value.strip()
-            for pattern, cleaner in self.NUMBER_PATTERNS:
-                if re.match(pattern, cleaned):
+            for pattern, cleaner in self._NUMBER_REGEXES:
+                if pattern.match(cleaned):
                     cleaned = cleaner(cleaned)
                     break
             
@@ -640,8 +721,8 @@ class UploadValidator:
         date_str = str(value).strip()
         
         # Try each date pattern
-        for pattern, date_format in self.DATE_PATTERNS:
-            if re.match(pattern, date_str):
+        for pattern, date_format in self._DATE_REGEXES:
+            if pattern.match(date_str):
                 try:
                     parsed_date = datetime.strptime(date_str, date_format)
                     
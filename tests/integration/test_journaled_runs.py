@@ -10,6 +10,7 @@ from decimal import Decimal
 from typing import Dict, Any, List
 import uuid
 import tempfile
+import threading
 import shutil
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
@@ -17,7 +18,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 from core.models import PurchaseLot, Sale, InventorySnapshot
 from core.fifo_engine import FIFOEngine
 from core.db_models import COGSRun, RunStatus, InventoryMovement
-from services.journaled_calculator import JournaledCalculator
+from services.journaled_calculator import JournaledCalculator, _chunked, _uuid7_batch
 
 
 class MockDBAdapter:
@@ -30,6 +31,29 @@ class MockDBAdapter:
         self.cogs_attributions = {}
         self.cogs_summaries = {}
         self.validation_errors = {}
+        self.bulk_writes = []  # (table, row count) per bulk call
+        self.transactions = []  # 'begin', 'commit' and 'rollback' calls in order
+        self.tenant_locks = set()
+        self.cogs_sums = []  # run ids whose total COGS was aggregated by the adapter
+    
+    def begin(self):
+        self.transactions.append('begin')
+    
+    def commit(self):
+        self.transactions.append('commit')
+    
+    def rollback(self):
+        self.transactions.append('rollback')
+    
+    def try_tenant_lock(self, tenant_id):
+        # A pending or running run stands in for another session holding the lock
+        if tenant_id in self.tenant_locks or self.get_active_runs(tenant_id):
+            return False
+        self.tenant_locks.add(tenant_id)
+        return True
+    
+    def release_tenant_lock(self, tenant_id):
+        self.tenant_locks.discard(tenant_id)
     
     def save_run(self, run: COGSRun):
         self.runs[run.run_id] = {
@@ -79,6 +103,11 @@ class MockDBAdapter:
             'is_current': snapshot.is_current
         })
     
+    def save_inventory_snapshots(self, snapshots):
+        self.bulk_writes.append(('inventory_snapshots', len(snapshots)))
+        for snapshot in snapshots:
+            self.save_inventory_snapshot(snapshot)
+    
     def save_inventory_movement(self, movement):
         if movement.run_id not in self.inventory_movements:
             self.inventory_movements[movement.run_id] = []
@@ -91,9 +120,18 @@ class MockDBAdapter:
             'unit_cost': movement.unit_cost
         })
     
+    def save_inventory_movements(self, movements):
+        self.bulk_writes.append(('inventory_movements', len(movements)))
+        for movement in movements:
+            self.save_inventory_movement(movement)
+    
     def save_cogs_attributions(self, run_id, tenant_id, attributions):
         self.cogs_attributions[run_id] = attributions
     
+    def sum_cogs(self, run_id):
+        self.cogs_sums.append(run_id)
+        return sum(attr.total_cogs for attr in self.cogs_attributions.get(run_id, []))
+    
     def save_cogs_summaries(self, run_id, tenant_id, summaries):
         self.cogs_summaries[run_id] = summaries
     
@@ -104,6 +142,9 @@ class MockDBAdapter:
         snapshots = self.inventory_snapshots.get(run_id, [])
         return [s for s in snapshots if s['is_current'] == is_current]
     
+    def get_inventory_movements(self, run_id: str, tenant_id: str) -> List[Dict[str, Any]]:
+        return list(self.inventory_movements.get(run_id, []))
+    
     def invalidate_cogs_data(self, run_id: str, tenant_id: str):
         # Mark COGS data as invalid
         if run_id in self.cogs_attributions:
@@ -481,6 +522,304 @@ class TestJournaledRuns(unittest.TestCase):
         # Verify run record includes error count
         run_data = self.db_adapter.get_run(run_id)
         self.assertGreaterEqual(run_data['validation_errors_count'], 0)
+    
+    def test_snapshots_are_saved_in_one_bulk_write_per_stage(self):
+        """Test: initial and final snapshots each go to the adapter in a single call"""
+        result = self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        snapshot_writes = [w for w in self.db_adapter.bulk_writes if w[0] == 'inventory_snapshots']
+        self.assertEqual(snapshot_writes, [('inventory_snapshots', 2), ('inventory_snapshots', 2)])
+        snapshots = self.db_adapter.inventory_snapshots[result['run_id']]
+        self.assertEqual(len({s['is_current'] for s in snapshots}), 2)
+    
+    def test_movements_are_saved_in_one_bulk_write_per_stage(self):
+        """Test: run and rollback movements each go to the adapter in a single call"""
+        result = self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        self.calculator.rollback_run(result['run_id'])
+        
+        movement_writes = [w for w in self.db_adapter.bulk_writes if w[0] == 'inventory_movements']
+        self.assertEqual(movement_writes, [('inventory_movements', 2), ('inventory_movements', 2)])
+        movement_types = [m['movement_type'] for m in self.db_adapter.inventory_movements[result['run_id']]]
+        self.assertEqual(movement_types, ['sale', 'sale', 'rollback', 'rollback'])
+    
+    def test_bulk_writes_are_chunked(self):
+        """Test: large stages are split into bulk writes of at most JOURNAL_CHUNK_SIZE rows"""
+        self.calculator.JOURNAL_CHUNK_SIZE = 1
+        result = self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        self.assertEqual(self.db_adapter.bulk_writes, [
+            ('inventory_snapshots', 1), ('inventory_snapshots', 1),
+            ('inventory_movements', 1), ('inventory_movements', 1),
+            ('inventory_snapshots', 1), ('inventory_snapshots', 1),
+        ])
+        self.assertEqual(len(self.db_adapter.inventory_snapshots[result['run_id']]), 4)
+        self.assertEqual(list(_chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+    
+    def test_adapters_without_bulk_methods_save_row_by_row(self):
+        """Test: adapters that only implement per-row saves still get every snapshot"""
+        class PerRowAdapter(MockDBAdapter):
+            save_inventory_snapshots = None
+            save_inventory_movements = None
+        
+        adapter = PerRowAdapter()
+        result = JournaledCalculator(self.engine, adapter).create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        self.assertEqual(len(adapter.inventory_snapshots[result['run_id']]), 4)
+        self.assertEqual(len(adapter.inventory_movements[result['run_id']]), 2)
+        self.assertEqual(adapter.bulk_writes, [])
+    
+    def test_journaling_commits_once_per_run(self):
+        """Test: every journal write of a run shares one transaction"""
+        self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        self.assertEqual(self.db_adapter.transactions, ['begin', 'commit'])
+    
+    def test_failed_journaling_rolls_back_and_marks_run_failed(self):
+        """Test: a failing journal write rolls back the transaction and fails the run"""
+        def fail(run_id, tenant_id, summaries):
+            raise RuntimeError("summary insert failed")
+        self.db_adapter.save_cogs_summaries = fail
+        
+        with self.assertRaises(RuntimeError):
+            self.calculator.create_and_execute_run(
+                tenant_id=self.tenant_id,
+                lots=self.lots,
+                sales=self.sales
+            )
+        
+        self.assertEqual(self.db_adapter.transactions, ['begin', 'rollback'])
+        (run,) = self.db_adapter.runs.values()
+        self.assertEqual(run['status'], 'failed')
+        self.assertEqual(run['error_message'], "summary insert failed")
+    
+    def test_rollback_uses_adapter_computed_unit_cost(self):
+        """Test: rollback movements take total_unit_cost from the adapter when it returns one"""
+        class ComputedCostAdapter(MockDBAdapter):
+            def get_inventory_snapshots(self, run_id, tenant_id, is_current):
+                return [
+                    {**snapshot, 'total_unit_cost': Decimal("99.00")}
+                    for snapshot in super().get_inventory_snapshots(run_id, tenant_id, is_current)
+                ]
+        
+        for adapter, expected in ((MockDBAdapter(), [Decimal("11.00"), Decimal("22.00")]),
+                                  (ComputedCostAdapter(), [Decimal("99.00"), Decimal("99.00")])):
+            calculator = JournaledCalculator(self.engine, adapter)
+            result = calculator.create_and_execute_run(tenant_id=self.tenant_id, lots=self.lots, sales=self.sales)
+            calculator.rollback_run(result['run_id'])
+            
+            rollback_costs = [
+                m['unit_cost'] for m in adapter.inventory_movements[result['run_id']]
+                if m['movement_type'] == 'rollback'
+            ]
+            self.assertEqual(rollback_costs, expected)
+    
+    def test_total_cogs_is_aggregated_by_the_adapter(self):
+        """Test: run totals come from the adapter's sum, or a Python sum without one"""
+        result = self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        self.assertEqual(self.db_adapter.cogs_sums, [result['run_id']])
+        self.assertEqual(result['total_cogs'], sum(a.total_cogs for a in result['attributions']))
+        self.assertEqual(self.db_adapter.get_run(result['run_id'])['total_cogs_calculated'], result['total_cogs'])
+        
+        in_memory = JournaledCalculator(FIFOEngine()).create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        self.assertEqual(in_memory['total_cogs'], result['total_cogs'])
+    
+    def test_copied_lots_are_equal_and_independent(self):
+        """Test: working inventory copies match the input lots without sharing state"""
+        copies = [self.calculator._copy_lot(lot) for lot in self.lots]
+        
+        self.assertEqual(copies, self.lots)
+        copies[0].allocate(30)
+        self.assertEqual(self.lots[0].remaining_quantity, 100)
+        self.assertEqual(copies[0].total_unit_cost, Decimal("11.00"))
+    
+    def test_final_inventory_is_rebuilt_without_final_snapshots(self):
+        """Test: runs can skip post-run snapshots and still report final inventory"""
+        journaled = self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        expected = self.db_adapter.get_inventory_snapshots(journaled['run_id'], self.tenant_id, is_current=True)
+        
+        adapter = MockDBAdapter()
+        calculator = JournaledCalculator(FIFOEngine(), adapter, journal_final_snapshots=False)
+        result = calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        self.assertEqual(adapter.get_inventory_snapshots(result['run_id'], self.tenant_id, is_current=True), [])
+        self.assertEqual(calculator.get_final_inventory(result['run_id'], self.tenant_id), expected)
+        self.assertEqual(self.calculator.get_final_inventory(journaled['run_id'], self.tenant_id), expected)
+    
+    def test_movements_match_lots_by_id_when_final_order_differs(self):
+        """Test: reordered or missing final lots still journal the right changes"""
+        initial = InventorySnapshot(timestamp=datetime.now(), lots=[self.calculator._copy_lot(l) for l in self.lots])
+        final_lot = self.calculator._copy_lot(self.lots[1])
+        final_lot.allocate(20)
+        final = InventorySnapshot(timestamp=datetime.now(), lots=[final_lot])
+        
+        self.calculator._journal_inventory_movements('run-x', self.tenant_id, initial, final, self.sales, datetime.now())
+        
+        movements = self.db_adapter.inventory_movements['run-x']
+        self.assertEqual(
+            [(m['lot_id'], m['quantity'], m['remaining_after']) for m in movements],
+            [('LOT001', -100, 0), ('LOT002', -20, 30)]
+        )
+        self.assertIsInstance(movements[0]['quantity'], int)
+    
+    def test_runs_without_lots_skip_snapshot_and_movement_writes(self):
+        """Test: empty inventories make no journal writes at all"""
+        result = self.calculator.create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=[],
+            sales=[]
+        )
+        
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(self.db_adapter.bulk_writes, [])
+        self.assertNotIn(result['run_id'], self.db_adapter.inventory_snapshots)
+        self.assertNotIn(result['run_id'], self.db_adapter.inventory_movements)
+    
+    def test_tenant_lock_is_held_for_the_run_and_released(self):
+        """Test: the tenant lock guards the run and is released on success and failure"""
+        held = []
+        save_cogs_summaries = self.db_adapter.save_cogs_summaries
+        
+        def record_lock(run_id, tenant_id, summaries):
+            held.append(set(self.db_adapter.tenant_locks))
+            save_cogs_summaries(run_id, tenant_id, summaries)
+        self.db_adapter.save_cogs_summaries = record_lock
+        
+        self.calculator.create_and_execute_run(tenant_id=self.tenant_id, lots=self.lots, sales=self.sales)
+        self.assertEqual(held, [{self.tenant_id}])
+        self.assertEqual(self.db_adapter.tenant_locks, set())
+        
+        def fail(run_id, tenant_id, summaries):
+            raise RuntimeError("summary insert failed")
+        self.db_adapter.save_cogs_summaries = fail
+        with self.assertRaises(RuntimeError):
+            self.calculator.create_and_execute_run(tenant_id=self.tenant_id, lots=self.lots, sales=self.sales)
+        self.assertEqual(self.db_adapter.tenant_locks, set())
+    
+    def test_held_tenant_lock_rejects_run_without_active_run_record(self):
+        """Test: a lock held by another session blocks the run before any record is saved"""
+        self.db_adapter.tenant_locks.add(self.tenant_id)
+        
+        with self.assertRaises(ValueError) as context:
+            self.calculator.create_and_execute_run(tenant_id=self.tenant_id, lots=self.lots, sales=self.sales)
+        
+        self.assertIn("active run", str(context.exception))
+        self.assertEqual(self.db_adapter.runs, {})
+        self.assertEqual(self.db_adapter.tenant_locks, {self.tenant_id})
+    
+    def test_adapters_without_tenant_lock_check_active_runs(self):
+        """Test: adapters without a lock still reject runs while another is active"""
+        class UnlockedAdapter(MockDBAdapter):
+            try_tenant_lock = None
+        
+        adapter = UnlockedAdapter()
+        adapter.runs['busy'] = {'run_id': 'busy', 'tenant_id': self.tenant_id, 'status': 'running'}
+        
+        with self.assertRaises(ValueError) as context:
+            JournaledCalculator(self.engine, adapter).create_and_execute_run(
+                tenant_id=self.tenant_id,
+                lots=self.lots,
+                sales=self.sales
+            )
+        
+        self.assertIn("active run busy", str(context.exception))
+    
+    def test_journal_rows_of_a_run_share_one_timestamp(self):
+        """Test: snapshots and movements written by one run carry the same created_at"""
+        stamps = []
+        
+        class StampingAdapter(MockDBAdapter):
+            def save_inventory_snapshots(self, snapshots):
+                stamps.extend(s.created_at for s in snapshots)
+                super().save_inventory_snapshots(snapshots)
+            
+            def save_inventory_movements(self, movements):
+                stamps.extend(m.created_at for m in movements)
+                super().save_inventory_movements(movements)
+        
+        JournaledCalculator(self.engine, StampingAdapter()).create_and_execute_run(
+            tenant_id=self.tenant_id,
+            lots=self.lots,
+            sales=self.sales
+        )
+        
+        self.assertEqual(len(stamps), 6)
+        self.assertEqual(len(set(stamps)), 1)
+    
+    def test_final_saves_run_concurrently_only_without_transactions(self):
+        """Test: independent final saves use worker threads unless they share a transaction"""
+        def run_with(adapter):
+            threads = {}
+            for name in ('save_cogs_attributions', 'save_cogs_summaries', 'save_validation_errors'):
+                def record(run_id, tenant_id, rows, name=name, save=getattr(adapter, name)):
+                    threads[name] = threading.get_ident()
+                    save(run_id, tenant_id, rows)
+                setattr(adapter, name, record)
+            result = JournaledCalculator(self.engine, adapter).create_and_execute_run(
+                tenant_id=self.tenant_id,
+                lots=self.lots,
+                sales=self.sales
+            )
+            return result, threads
+        
+        result, threads = run_with(MockDBAdapter())
+        self.assertEqual(set(threads.values()), {threading.get_ident()})
+        
+        class NonTransactionalAdapter(MockDBAdapter):
+            begin = None
+        
+        adapter = NonTransactionalAdapter()
+        result, threads = run_with(adapter)
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads.values())
+        self.assertIn(result['run_id'], adapter.cogs_summaries)
+        self.assertEqual(len(adapter.inventory_snapshots[result['run_id']]), 4)
+    
+    def test_journal_ids_are_time_ordered_uuid7(self):
+        """Test: batch ids are unique version-7 UUIDs that sort in creation order"""
+        ids = _uuid7_batch(1000)
+        
+        self.assertEqual(len(set(ids)), 1000)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual({uuid.UUID(i).version for i in ids}, {7})
+        self.assertEqual({uuid.UUID(i).variant for i in ids}, {uuid.RFC_4122})
+        self.assertEqual(_uuid7_batch(0), [])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,194 @@
+"""Tests for error recovery bookkeeping and summary statistics."""
+import csv
+import datetime
+import json
+
+import pytest
+
+from services import error_recovery_manager
+from services.error_recovery_manager import (
+    ErrorCategory,
+    ErrorRecoveryManager,
+    ErrorSeverity,
+)
+
+
+def _manager(tmp_path):
+    return ErrorRecoveryManager(str(tmp_path / "errors"))
+
+
+def test_error_summary_tracks_counts_incrementally(tmp_path):
+    manager = _manager(tmp_path)
+    manager.handle_missing_lots("SKU-A", 5, "2026-05-01")
+    manager.handle_date_mismatch("SKU-A", "2026-04-01", "2026-05-01")
+    manager.handle_cost_anomaly("SKU-B", 15.0, 10.0, 50.0)
+
+    summary = manager._get_error_summary()
+
+    assert summary["total_errors"] == 3
+    assert summary["by_category"] == {
+        "missing_lots": 1,
+        "date_mismatch": 1,
+        "cost_anomaly": 1,
+    }
+    assert summary["by_severity"] == {"high": 1, "medium": 1, "low": 1}
+    assert summary["affected_skus"] == 2
+    assert summary["top_problem_skus"] == [("SKU-A", 2), ("SKU-B", 1)]
+
+
+def test_error_summary_is_empty_without_errors(tmp_path):
+    assert _manager(tmp_path)._get_error_summary() == {"total_errors": 0}
+
+
+def test_can_continue_processing_excludes_blocked_skus(tmp_path):
+    manager = _manager(tmp_path)
+    manager.handle_missing_lots("SKU-A", 5, "2026-05-01")
+    manager.handle_cost_anomaly("SKU-B", 15.0, 10.0, 50.0)
+
+    can_continue, processable = manager.can_continue_processing()
+    assert can_continue is True
+    assert processable == ["SKU-B"]
+
+    manager.record_error(
+        ErrorCategory.SYSTEM_ERROR,
+        ErrorSeverity.CRITICAL,
+        "SKU-C",
+        "boom",
+        "retry",
+    )
+    assert manager.can_continue_processing() == (False, [])
+
+
+def test_export_error_report_writes_valid_json_log(tmp_path):
+    manager = _manager(tmp_path)
+    manager.handle_negative_inventory(
+        "SKU-A",
+        requested_qty=10,
+        available_qty=4,
+        lot_details=[{"lot_id": "LOT-1", "received_date": "2026-05-01", "remaining": 4}],
+    )
+    manager.handle_missing_lots("SKU-B", 3, "2026-05-02")
+
+    reports = manager.export_error_report()
+
+    with open(reports["error_log"]) as f:
+        log = json.load(f)
+    assert log["total_errors"] == 2
+    assert log["error_summary"]["affected_skus"] == 2
+    assert [error["sku"] for error in log["errors"]] == ["SKU-A", "SKU-B"]
+    assert log["errors"][0]["category"] == "negative_inventory"
+    assert log["errors"][0]["data_context"]["lot_details"][0]["lot_id"] == "LOT-1"
+
+
+def test_export_error_report_writes_quarantine_csv(tmp_path):
+    manager = _manager(tmp_path)
+    manager.handle_missing_lots("SKU-A", 5, "2026-05-01")
+    manager.handle_cost_anomaly("SKU-B", 15.0, 10.0, 50.0)
+
+    reports = manager.export_error_report()
+
+    with open(reports["quarantine_report"], newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["SKU"] for row in rows] == ["SKU-A", "SKU-B"]
+    assert rows[0]["Severity"] == "high"
+    assert json.loads(rows[0]["Data_Context"]) == {"sales_qty": 5, "sale_date": "2026-05-01"}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_export_error_report_is_compact_unless_pretty(tmp_path, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(error_recovery_manager, "orjson", None)
+    manager = _manager(tmp_path)
+    manager.handle_missing_lots("SKU-A", 5, "2026-05-01")
+
+    compact = open(manager.export_error_report()["error_log"]).read()
+    assert "\n" not in compact
+    assert '"total_errors":1' in compact
+
+    pretty = open(manager.export_error_report(pretty=True)["error_log"]).read()
+    assert '\n  "total_errors": 1' in pretty
+    assert json.loads(pretty)["errors"] == json.loads(compact)["errors"]
+
+
+def test_output_dir_is_created_only_on_export(tmp_path):
+    manager = _manager(tmp_path)
+    manager.handle_missing_lots("SKU-A", 5, "2026-05-01")
+    assert not (tmp_path / "errors").exists()
+
+    reports = manager.export_error_report()
+
+    assert (tmp_path / "errors").is_dir()
+    assert reports["error_log"] == manager.error_log_file
+
+
+def test_error_filters_are_lazy_unless_materialized(tmp_path):
+    manager = _manager(tmp_path)
+    manager.handle_missing_lots("SKU-A", 5, "2026-05-01")
+    manager.handle_cost_anomaly("SKU-B", 15.0, 10.0, 50.0)
+
+    lazy = manager.get_errors_by_severity(ErrorSeverity.HIGH)
+    assert not isinstance(lazy, list)
+    assert [error.sku for error in lazy] == ["SKU-A"]
+
+    blocking = manager.get_blocking_errors(materialize=True)
+    assert [error.sku for error in blocking] == ["SKU-A"]
+    assert len(manager.get_errors_by_sku("SKU-B", materialize=True)) == 1
+    assert manager.get_actionable_steps()[-1] == "📦 Upload missing purchase lots for: SKU-A"
+
+
+def test_identical_data_contexts_are_shared(tmp_path):
+    manager = _manager(tmp_path)
+    lot_details = [{"lot_id": "LOT-1", "received_date": "2026-05-01", "remaining": 4}]
+    manager.handle_negative_inventory("SKU-A", 10, 4, [dict(lot) for lot in lot_details])
+    manager.handle_negative_inventory("SKU-A", 10, 4, [dict(lot) for lot in lot_details])
+    manager.handle_negative_inventory("SKU-A", 12, 4, [dict(lot) for lot in lot_details])
+
+    first, second, third = manager.errors
+    assert first.data_context is second.data_context
+    assert third.data_context is not first.data_context
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_contexts_with_non_str_keys_are_not_interned(tmp_path, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(error_recovery_manager, "orjson", None)
+    manager = _manager(tmp_path)
+    for context in ({1: "x"}, {"1": "x"}, {"lots": [{1: "x"}]}, {"lots": [{"1": "x"}]}, {"1": "x"}):
+        manager.record_error(
+            category=ErrorCategory.DATA_CONFLICT,
+            severity=ErrorSeverity.LOW,
+            sku="SKU-A",
+            message="context",
+            suggested_fix="none",
+            data_context=context,
+        )
+
+    contexts = [error.data_context for error in manager.errors]
+    assert contexts == [{1: "x"}, {"1": "x"}, {"lots": [{1: "x"}]}, {"lots": [{"1": "x"}]}, {"1": "x"}]
+    assert contexts[4] is contexts[1]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize("first, second", [
+    ({"v": None}, {"v": float("nan")}),
+    ({"d": datetime.date(2024, 1, 1)}, {"d": "2024-01-01"}),
+    ({"x": (1, 2)}, {"x": [1, 2]}),
+])
+def test_contexts_that_serialize_alike_keep_their_own_values(
+    tmp_path, monkeypatch, use_orjson, first, second
+):
+    if not use_orjson:
+        monkeypatch.setattr(error_recovery_manager, "orjson", None)
+    manager = _manager(tmp_path)
+    for context in (first, second):
+        manager.record_error(
+            category=ErrorCategory.DATA_CONFLICT,
+            severity=ErrorSeverity.LOW,
+            sku="SKU-A",
+            message="context",
+            suggested_fix="none",
+            data_context=context,
+        )
+
+    assert manager.errors[0].data_context is first
+    assert manager.errors[1].data_context is second
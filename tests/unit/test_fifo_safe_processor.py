@@ -0,0 +1,348 @@
+"""Tests for the error-isolating FIFO safe processor."""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "services"))
+
+import fifo_safe_processor  # noqa: E402
+from fifo_safe_processor import FIFOSafeProcessor, _fifo_allocate_kernel  # noqa: E402
+
+
+def _sales():
+    return pd.DataFrame({
+        "SKU": ["ABC123", "DEF456", "ABC123", "XYZ789", "GHI999"],
+        "Quantity_Sold": [100, 50, 200, 75, 0],
+        "Sale_Date": pd.to_datetime([
+            "2025-01-15", "2025-01-16", "2025-01-20", "2025-01-10", "2025-01-25"
+        ]),
+    })
+
+
+def _lots():
+    return pd.DataFrame({
+        "SKU": ["ABC123", "ABC123", "DEF456", "GHI999"],
+        "Lot_ID": ["LOT001", "LOT002", "LOT003", "LOT004"],
+        "Received_Date": pd.to_datetime([
+            "2025-01-01", "2025-01-10", "2025-01-18", "2025-01-05"
+        ]),
+        "Original_Unit_Qty": [200, 150, 100, 50],
+        "Remaining_Unit_Qty": [200, 150, 100, -10],
+        "Unit_Price": [10.0, 11.0, 15.0, 8.0],
+        "Freight_Cost_Per_Unit": [1.0, 1.0, 2.0, 0.5],
+    })
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return FIFOSafeProcessor(str(tmp_path / "safe_processing"))
+
+
+def test_batch_isolates_failing_skus(processor):
+    report = processor.process_batch_safely(_sales(), _lots())
+
+    assert report["status"] == "completed_with_errors"
+    stats = report["statistics"]
+    assert stats["total_skus"] == 4
+    assert stats["processed_skus"] == 2
+    assert stats["skipped_skus"] == 1
+    assert stats["inventory_only_skus"] == 1
+    assert stats["total_sales"] == 4
+    assert stats["processed_sales"] == 3
+    assert report["skipped_skus"] == ["XYZ789"]
+
+    categories = sorted(
+        (error.category.value, error.sku) for error in processor.error_manager.errors
+    )
+    assert categories == [
+        ("data_conflict", "GHI999"),
+        ("date_mismatch", "DEF456"),
+        ("missing_lots", "XYZ789"),
+    ]
+    assert report["can_continue_processing"] is True
+    assert report["processable_skus"] == ["DEF456"]
+
+
+def _attributions(report):
+    with open(report["output_files"]["attributions_jsonl"]) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_allocates_sales_in_fifo_order(processor):
+    report = processor.process_batch_safely(_sales(), _lots())
+
+    results = {result["sku"]: result for result in report["successful_results"]}
+    abc = results["ABC123"]
+    assert "attributions" not in abc
+    assert [
+        (attr["lot_id"], attr["allocated_qty"], attr["unit_cost"])
+        for attr in _attributions(report)
+        if attr["sku"] == "ABC123"
+    ] == [("LOT001", 100, 11.0), ("LOT001", 100, 11.0), ("LOT002", 100, 12.0)]
+    assert _attributions(report)[0]["sale_date"] == "2025-01-15 00:00:00"
+    assert abc["total_cogs"] == pytest.approx(3400.0)
+    assert abc["total_quantity"] == 300
+    assert results["DEF456"]["total_cogs"] == pytest.approx(850.0)
+    assert results["DEF456"]["average_cost"] == pytest.approx(17.0)
+
+
+def test_missing_required_columns_fails_batch(processor):
+    report = processor.process_batch_safely(_sales().drop(columns=["Sale_Date"]), _lots())
+
+    assert report["status"] == "failed"
+    assert "Sale_Date" in report["error"]
+
+
+def test_allocation_kernel_skips_depleted_lots_and_reports_shortfall():
+    lot_remaining = np.array([4, 0, -2, 20])
+    sale_idx, lot_idx, allocated, failed_sale = _fifo_allocate_kernel(
+        np.array([5, 10, 3]), lot_remaining
+    )
+    assert sale_idx.tolist() == [0, 0, 1, 2]
+    assert lot_idx.tolist() == [0, 3, 3, 3]
+    assert allocated.tolist() == [4, 1, 10, 3]
+    assert failed_sale == -1
+    assert lot_remaining.tolist() == [0, 0, -2, 6]
+
+    *_, failed_sale = _fifo_allocate_kernel(np.array([5, 30]), np.array([4, 20]))
+    assert failed_sale == 1
+
+
+def test_close_flushes_log_and_detaches_handler(processor, tmp_path):
+    processor.process_batch_safely(_sales(), _lots())
+
+    assert processor._queue_handler not in processor.logger.handlers
+    log = (tmp_path / "safe_processing" / "processing.log").read_text()
+    assert "Starting safe batch processing..." in log
+    assert "Successfully processed SKU" not in log
+    processor.close()
+
+
+def test_processor_can_run_another_batch_after_closing(processor, tmp_path):
+    first = processor.process_batch_safely(_sales(), _lots())
+    second = processor.process_batch_safely(_sales().iloc[:2], _lots())
+
+    assert second["status"] == first["status"]
+    assert [r["sku"] for r in second["successful_results"]] == ["ABC123", "DEF456"]
+    assert {a["sku"] for a in _attributions(second)} == {"ABC123", "DEF456"}
+    log = (tmp_path / "safe_processing" / "processing.log").read_text()
+    assert log.count("Starting safe batch processing...") == 2
+    assert processor._queue_handler not in processor.logger.handlers
+
+
+def test_batch_isolates_skus_when_lots_have_no_received_date(processor):
+    report = processor.process_batch_safely(_sales(), _lots().drop(columns="Received_Date"))
+
+    assert report["status"] == "completed_with_errors"
+    assert report["statistics"]["processed_skus"] == 0
+    assert sorted(
+        error.sku for error in processor.error_manager.errors if error.category.value == "system_error"
+    ) == ["ABC123", "DEF456"]
+
+def test_validation_reports_duplicates_and_bad_lots(processor):
+    sales = pd.concat([_sales(), _sales().iloc[[0]]], ignore_index=True)
+    processor.validate_sales_data(sales)
+    lots = _lots().drop(columns=["Lot_ID"])
+    lots.loc[0, "Remaining_Unit_Qty"] = 250
+    processor.validate_inventory_data(lots)
+
+    assert [(error.sku, error.message) for error in processor.error_manager.errors] == [
+        ("ABC123", "Potential duplicate sale: 100 units on 2025-01-15 00:00:00"),
+        ("GHI999", "Lot UNKNOWN has negative remaining quantity: -10"),
+        ("ABC123", "Lot UNKNOWN has impossible quantities: remaining 250 > original 200"),
+    ]
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 100])
+def test_streaming_matches_batch_processing(processor, tmp_path, chunksize):
+    sales_path = tmp_path / "sales.csv"
+    lots_path = tmp_path / "lots.csv"
+    _sales().sort_values("SKU", kind="stable").to_csv(sales_path, index=False)
+    _lots().sort_values("SKU", kind="stable").to_csv(lots_path, index=False)
+
+    batch = processor.process_batch_safely(_sales(), _lots())
+    streaming = FIFOSafeProcessor(str(tmp_path / "streaming")).process_batch_streaming(
+        str(sales_path), str(lots_path), chunksize=chunksize
+    )
+
+    assert streaming["successful_results"] == batch["successful_results"]
+    assert _attributions(streaming) == _attributions(batch)
+    assert streaming["skipped_skus"] == batch["skipped_skus"]
+    for key in ("total_skus", "processed_skus", "skipped_skus", "inventory_only_skus",
+                "total_sales", "processed_sales"):
+        assert streaming["statistics"][key] == batch["statistics"][key]
+
+
+def test_streaming_isolates_skus_when_lots_have_no_received_date(processor, tmp_path):
+    sales_path = tmp_path / "sales.csv"
+    lots_path = tmp_path / "lots.csv"
+    _sales().sort_values("SKU", kind="stable").to_csv(sales_path, index=False)
+    _lots().drop(columns="Received_Date").sort_values("SKU", kind="stable").to_csv(lots_path, index=False)
+
+    report = processor.process_batch_streaming(str(sales_path), str(lots_path))
+
+    assert report["status"] == "completed_with_errors"
+    assert report["statistics"]["processed_skus"] == 0
+    assert sorted(
+        error.sku for error in processor.error_manager.errors if error.category.value == "system_error"
+    ) == ["ABC123", "DEF456"]
+
+def test_streaming_rejects_unsorted_input(processor, tmp_path):
+    sales_path = tmp_path / "sales.csv"
+    lots_path = tmp_path / "lots.csv"
+    _sales().to_csv(sales_path, index=False)
+    _lots().to_csv(lots_path, index=False)
+
+    report = processor.process_batch_streaming(str(sales_path), str(lots_path))
+
+    assert report["status"] == "failed"
+    assert "sorted by SKU" in report["error"]
+
+
+def test_worker_pool_matches_in_process_results(processor, tmp_path):
+    serial = processor.process_batch_safely(_sales(), _lots())
+    pooled_processor = FIFOSafeProcessor(str(tmp_path / "pooled"))
+    pooled = pooled_processor.process_batch_safely(_sales(), _lots(), processes=2)
+
+    assert pooled["successful_results"] == serial["successful_results"]
+    assert pooled["statistics"]["total_errors"] == serial["statistics"]["total_errors"]
+    assert pooled["processable_skus"] == serial["processable_skus"]
+    assert _attributions(pooled) == _attributions(serial)
+    assert sorted(error.message for error in pooled_processor.error_manager.errors) == sorted(
+        error.message for error in processor.error_manager.errors
+    )
+
+
+def test_pool_tasks_carry_only_their_own_sku_category():
+    sales, lots = fifo_safe_processor._with_shared_sku_categories(_sales(), _lots())
+    one_sku = sales[sales["SKU"] == "ABC123"]
+
+    trimmed = fifo_safe_processor._with_used_sku_categories(one_sku)
+
+    assert list(one_sku["SKU"].cat.categories) == ["ABC123", "DEF456", "GHI999", "XYZ789"]
+    assert list(trimmed["SKU"].cat.categories) == ["ABC123"]
+    pd.testing.assert_frame_equal(trimmed.astype({"SKU": str}), one_sku.astype({"SKU": str}))
+
+
+def test_validation_coerces_string_dates(processor):
+    sales = _sales().assign(Sale_Date=lambda df: df["Sale_Date"].dt.strftime("%Y-%m-%d"))
+    lots = _lots().assign(Received_Date=lambda df: df["Received_Date"].dt.strftime("%Y-%m-%d"))
+
+    clean_sales, _ = processor.validate_sales_data(sales)
+    clean_lots, _ = processor.validate_inventory_data(lots)
+
+    assert clean_sales["Sale_Date"].dtype.kind == "M"
+    assert clean_lots["Received_Date"].dtype.kind == "M"
+    assert lots["Received_Date"].dtype == object
+    report = processor.process_batch_safely(sales, lots)
+    assert report["statistics"]["processed_skus"] == 2
+
+
+def test_unparseable_dates_are_reported_and_excluded(processor):
+    sales = _sales().assign(Sale_Date=["2025-01-15", "2025-01-16", "not a date", "2025-01-10", "2025-01-25"])
+    lots = _lots().assign(Received_Date=["2025-01-01", "sometime", "2025-01-18", "2025-01-05"])
+
+    report = processor.process_batch_safely(sales, lots)
+
+    messages = [error.message for error in processor.error_manager.errors]
+    assert "Unparseable Sale_Date 'not a date'; row excluded from processing" in messages
+    assert "Unparseable Received_Date 'sometime'; row excluded from processing" in messages
+    assert report["status"] == "completed_with_errors"
+    attributions = _attributions(report)
+    assert "NaT" not in {str(a.get("sale_date")) for a in attributions}
+    assert "LOT002" not in {a.get("lot_id") for a in attributions}
+
+
+
+def test_mixed_date_formats_are_all_parsed(processor):
+    sales = _sales().assign(Sale_Date=["2025-01-15", "01/16/2025", "2025-01-20", "2025-01-10", "Jan 25, 2025"])
+
+    clean_sales, warnings = processor.validate_sales_data(sales)
+
+    assert warnings == ["Removed 1 rows with invalid quantities"]
+    assert processor.error_manager.errors == []
+    assert clean_sales["Sale_Date"].tolist() == list(pd.to_datetime(
+        ["2025-01-15", "2025-01-16", "2025-01-20", "2025-01-10"]
+    ))
+
+
+def test_unparseable_dates_past_detail_cap_are_summarized_as_validation_errors(tmp_path):
+    processor = FIFOSafeProcessor(str(tmp_path / "capped"), max_detail_errors=1)
+    lots = _lots().assign(Received_Date="unknown")
+
+    clean_lots, _ = processor.validate_inventory_data(lots)
+
+    assert clean_lots.empty
+    assert [error.category.value for error in processor.error_manager.errors] == [
+        "validation_error", "validation_error"
+    ]
+    assert processor.error_manager.errors[1].message == "3 more lots with unparseable Received_Date not itemized"
+
+
+@pytest.mark.parametrize("chunksize", [1, 100])
+def test_streaming_reports_and_excludes_unparseable_dates(processor, tmp_path, chunksize):
+    sales = _sales().assign(Sale_Date=["2025-01-15", "2025-01-16", "not a date", "2025-01-10", "2025-01-25"])
+    lots = _lots().assign(Received_Date=["2025-01-01", "sometime", "2025-01-18", "2025-01-05"])
+    sales_path = tmp_path / "sales.csv"
+    lots_path = tmp_path / "lots.csv"
+    sales.sort_values("SKU", kind="stable").to_csv(sales_path, index=False)
+    lots.sort_values("SKU", kind="stable").to_csv(lots_path, index=False)
+
+    batch = processor.process_batch_safely(sales, lots)
+    streaming_processor = FIFOSafeProcessor(str(tmp_path / "streaming"))
+    streaming = streaming_processor.process_batch_streaming(
+        str(sales_path), str(lots_path), chunksize=chunksize
+    )
+
+    assert streaming["status"] == "completed_with_errors"
+    assert streaming["successful_results"] == batch["successful_results"]
+    assert _attributions(streaming) == _attributions(batch)
+    messages = [error.message for error in streaming_processor.error_manager.errors]
+    assert "Unparseable Sale_Date 'not a date'; row excluded from processing" in messages
+    assert "Unparseable Received_Date 'sometime'; row excluded from processing" in messages
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_results_json_matches_report(processor, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fifo_safe_processor, "orjson", None)
+    report = processor.process_batch_safely(_sales(), _lots())
+
+    with open(report["output_files"]["results_json"], encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["statistics"]["start_time"] == str(report["statistics"]["start_time"])
+    assert saved["successful_results"] == report["successful_results"]
+    assert saved["actionable_steps"] == report["actionable_steps"]
+
+
+def test_single_lot_sku_allocates_each_sale_from_the_lot(processor):
+    lots = _lots()
+    lots.loc[lots["SKU"] == "ABC123", "Remaining_Unit_Qty"] = [400, 0]
+    report = processor.process_batch_safely(_sales(), lots.iloc[[0, 2, 3]])
+
+    assert [
+        (attr["sku"], attr["lot_id"], attr["allocated_qty"], attr["total_cost"])
+        for attr in _attributions(report)
+    ] == [
+        ("ABC123", "LOT001", 100, 1100.0),
+        ("ABC123", "LOT001", 200, 2200.0),
+        ("DEF456", "LOT003", 50, 850.0),
+    ]
+
+
+def test_validation_summarizes_errors_past_detail_cap(tmp_path):
+    processor = FIFOSafeProcessor(str(tmp_path / "capped"), max_detail_errors=1)
+    lots = _lots()
+    lots["Remaining_Unit_Qty"] = -1
+
+    processor.validate_inventory_data(lots)
+
+    errors = processor.error_manager.errors
+    assert [error.sku for error in errors] == ["ABC123", "SYSTEM"]
+    assert errors[1].message == "3 more lots with negative remaining quantities not itemized"
+    assert errors[1].data_context == {"affected_skus": ["ABC123", "DEF456", "GHI999"]}
@@ -0,0 +1,165 @@
+"""Tests for CSV format and column detection."""
+import re
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from services.format_detector import DateFormat, FileType, FormatDetector, NumberFormat
+
+
+def _sales():
+    return pd.DataFrame({
+        "SKU": ["ABC-1", "DEF-2", "GHI-3"],
+        "Units Moved": ["5", "7", "12"],
+        "Month": ["July 2024", "Aug 2024", "September 2024"],
+    })
+
+
+def test_detects_sales_data_and_suggests_mapping():
+    detector = FormatDetector()
+    result = detector.detect_format(_sales())
+
+    assert result.file_type == FileType.SALES_DATA
+    assert result.confidence == 1.0
+    assert detector.suggest_column_mapping(result) == {
+        "sku": "SKU",
+        "quantity": "Units Moved",
+        "date": "Month",
+    }
+
+
+def test_detects_value_formats():
+    df = pd.DataFrame({
+        "Month": ["July 2024", "2024-07-31", "Jul 2024"],
+        "Received": ["2024-07-31", "7/5/24", "Jul-24"],
+        "Rate": ["15.5%", "2%", "n/a"],
+    })
+    result = FormatDetector().detect_format(df)
+    columns = result.columns
+
+    assert (columns["Month"].data_type, columns["Month"].format_type) == (datetime, DateFormat.MIXED)
+    assert "Standardize date formats in columns: Month" in result.recommendations
+    assert result.columns_meta.loc["Rate", "null_percentage"] == 0.0
+    assert result.columns_meta["confidence"].tolist() == [info.confidence for info in columns.values()]
+    assert columns["Received"].format_type == DateFormat.FULL_DATE
+    assert columns["Received"].confidence == 1.0
+    assert columns["Rate"].format_type == NumberFormat.PERCENTAGE
+    assert columns["Rate"].confidence == 2 / 3
+
+
+def test_detection_results_are_cached_by_content():
+    detector = FormatDetector(cache_size=1)
+    df = _sales()
+
+    first = detector.detect_format(df)
+    assert detector.detect_format(df.copy()).columns is first.columns
+
+    changed = df.copy()
+    changed.loc[2, "Units Moved"] = None
+    second = detector.detect_format(changed)
+    assert second.columns is not first.columns
+    assert second.columns["Units Moved"].null_count == 1
+    assert detector.detect_format(df).columns is not first.columns
+
+
+def test_cached_results_do_not_share_issue_and_recommendation_lists():
+    detector = FormatDetector()
+    df = _sales()
+
+    first = detector.detect_format(df)
+    recommendations = list(first.recommendations)
+    first.recommendations.append("added by caller")
+    first.issues.append("added by caller")
+    second = detector.detect_format(df)
+    second.recommendations.clear()
+
+    third = detector.detect_format(df)
+    assert third.recommendations == recommendations
+    assert "added by caller" not in third.issues
+
+
+def test_cleaning_drops_unnamed_and_trailing_empty_columns():
+    df = pd.DataFrame({
+        "SKU ": ["ABC-1", None],
+        "Blank": [None, None],
+        "Unnamed: 2": [1, 2],
+        "Units\nMoved": ["5", None],
+        "Notes": [None, None],
+        "Unnamed: 5": [3, 4],
+    })
+
+    result = FormatDetector().detect_format(df)
+
+    assert list(result.columns) == ["SKU", "Blank", "Units Moved"]
+    assert result.row_count == 1
+    assert result.columns["Blank"].issues == [
+        "High null percentage: 100.0%",
+        "Column is completely empty",
+    ]
+
+
+def test_typed_columns_skip_pattern_matching():
+    df = pd.DataFrame({
+        "Sale Date": pd.to_datetime(["2024-07-31 10:30", "2024-08-01 09:00"]),
+        "Qty": [-5, 12],
+        "Unit Price": [1.5, 2.25],
+    })
+    columns = FormatDetector().detect_format(df).columns
+
+    assert columns["Sale Date"].format_type == DateFormat.FULL_DATE
+    assert (columns["Qty"].data_type, columns["Qty"].format_type) == (float, NumberFormat.INTEGER)
+    assert columns["Unit Price"].format_type == NumberFormat.DECIMAL
+    assert all(info.confidence == 1.0 for info in columns.values())
+
+
+def test_mapping_prefers_higher_priority_patterns():
+    df = pd.DataFrame({
+        "Product": ["Widget"],
+        "SKU": ["ABC-1"],
+        "Units": ["5"],
+        "Units Moved": ["5"],
+        "Sale Date": ["2024-07-31"],
+    })
+    detector = FormatDetector()
+    result = detector.detect_format(df)
+
+    assert result.pattern_hits["quantity"] == {"Units": 3, "Units Moved": 7}
+    assert detector.suggest_column_mapping(result) == {
+        "sku": "SKU",
+        "quantity": "Units Moved",
+        "date": "Sale Date",
+    }
+
+
+def test_specific_date_column_beats_month():
+    df = pd.DataFrame({
+        "SKU": ["ABC-1"],
+        "Month": ["Jul-24"],
+        "Units Moved": ["5"],
+        "Sale Date": ["2024-07-31"],
+    })
+    detector = FormatDetector()
+
+    assert detector.suggest_column_mapping(detector.detect_format(df))["date"] == "Sale Date"
+
+
+@pytest.mark.parametrize("patterns", [FormatDetector.SALES_PATTERNS, FormatDetector.LOTS_PATTERNS])
+def test_no_pattern_is_shadowed_by_an_earlier_one(patterns):
+    for field, pattern_list in patterns.items():
+        for position, pattern in enumerate(pattern_list):
+            # The plainest name a pattern is written for, e.g. 'sale date'
+            name = " ".join(part for part in pattern.split(".*") if part)
+            first_hit = next(p for p in pattern_list if re.search(p, name))
+            assert first_hit == pattern, f"{field}: {pattern} is shadowed by {first_hit}"
+
+
+def test_large_inputs_are_analyzed_from_a_sample():
+    df = pd.concat([_sales()] * 4, ignore_index=True)
+    df.loc[6:, "Units Moved"] = None
+
+    result = FormatDetector().detect_format(df, max_rows=6)
+
+    assert result.row_count == 12
+    assert result.columns["Units Moved"].null_count == 0
+    assert FormatDetector().detect_format(df, max_rows=None).columns["Units Moved"].null_count == 6
@@ -0,0 +1,461 @@
+"""Tests for the intelligent upload pipeline."""
+import io
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from services import intelligent_upload_pipeline
+from services.intelligent_upload_pipeline import (
+    IntelligentUploadPipeline,
+    UploadAPIIntegration,
+    UploadResult,
+)
+
+
+def _sales():
+    return pd.DataFrame({
+        "SKU": ["ABC 123", "SKU: X1", None, "DEF-1", "G1", "H2"] * 3,
+        "Units Moved": ["10", "1,200", "5", "abc", "7.5", "3"] * 3,
+        "Month": ["Jul-24", "2024-07-31", "7/5/24", "July 2024", "garbage", "2024-01-01"] * 3,
+    })
+
+
+def _lots():
+    return pd.DataFrame({
+        "PO_Number": ["L1", "L2", "L3"],
+        "SKU": ["A", "B", "C"],
+        "Received": ["2024-07-01", "7/5/24", "bad"],
+        "Original_Unit_Qty": [10, 5, 3],
+        "Unit_Price": ["$1.50", "2", "3"],
+        "Actual_Freight_Cost_Per_Unit": [1, None, 0.5],
+        "remaining_unit_qty": [10, 5, 3],
+    })
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    _sales().to_csv(path, index=False)
+    return str(path)
+
+
+def _pipeline(tmp_path, **kwargs):
+    return IntelligentUploadPipeline(str(tmp_path / "quarantine"), **kwargs)
+
+
+def _validate(pipeline, path):
+    with open(path, "rb") as buf:
+        return pipeline._validate_chunks(buf, "sales_data")
+
+
+def test_process_upload_validates_sales(tmp_path, sales_csv):
+    results = _pipeline(tmp_path).process_upload(sales_csv, tenant_id="t1", materialize="records")
+
+    assert results["status"] == "success"
+    assert results["file_type"] == "sales_data"
+    assert results["processing_summary"] == {
+        "total_rows": 18,
+        "processable_rows": 9,
+        "quarantined_rows": 9,
+        "success_rate": 0.5,
+    }
+    assert results["column_mapping"] == {"sku": "SKU", "quantity": "Units Moved", "date": "Month"}
+    assert [row["sku"] for row in results["normalized_data"][:3]] == ["ABC-123", "X1", "H2"]
+    assert results["quarantine"]["batch_id"] is not None
+
+
+def test_normalized_data_streams_rows_by_default(tmp_path, sales_csv):
+    pipeline = _pipeline(tmp_path)
+    records = pipeline.process_upload(sales_csv, materialize="records")["normalized_data"]
+    rows = pipeline.process_upload(sales_csv)["normalized_data"]
+
+    assert callable(rows)
+    assert [row.sku for row in rows()] == [record["sku"] for record in records]
+    assert [row._asdict()["quantity_sold"] for row in rows()][:2] == [10, 1200]
+
+
+def test_normalized_data_as_arrow_batches(tmp_path, sales_csv):
+    pytest.importorskip("pyarrow")
+    batches = _pipeline(tmp_path).process_upload(sales_csv, materialize="arrow")["normalized_data"]
+
+    assert sum(batch.num_rows for batch in batches) == 9
+    assert batches[0].schema.names == ["sku", "quantity_sold", "sale_date", "sale_id"]
+
+
+def test_unknown_materialize_option_is_an_error(tmp_path, sales_csv):
+    results = _pipeline(tmp_path).process_upload(sales_csv, materialize="rows")
+
+    assert results["status"] == "error"
+    assert "materialize" in results["error"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 5])
+def test_chunked_validation_matches_single_chunk(tmp_path, sales_csv, monkeypatch, chunk_size):
+    monkeypatch.setattr(intelligent_upload_pipeline, "pv", None)
+    whole = _validate(_pipeline(tmp_path), sales_csv)
+    chunked = _validate(_pipeline(tmp_path, chunk_size=chunk_size), sales_csv)
+
+    pd.testing.assert_frame_equal(
+        chunked.normalized_data.drop(columns="sale_id"),
+        whole.normalized_data.drop(columns="sale_id"),
+    )
+    pd.testing.assert_frame_equal(chunked.quarantined_data, whole.quarantined_data)
+    assert [(i.row_index, i.message) for i in chunked.issues] == [
+        (i.row_index, i.message) for i in whole.issues
+    ]
+    assert chunked.summary == whole.summary
+
+
+def test_later_chunks_keep_columns_empty_in_that_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(intelligent_upload_pipeline, "pv", None)
+    path = tmp_path / "sales.csv"
+    sales = _sales().iloc[:4].copy()
+    sales.loc[2:, "Month"] = None
+    sales.to_csv(path, index=False)
+
+    result = _validate(_pipeline(tmp_path, chunk_size=2), path)
+
+    assert result.summary["column_mapping"]["date"] == "Month"
+    assert result.summary["total_rows"] == 4
+    assert [i.row_index for i in result.issues if i.column == "Month"] == [2, 3]
+
+
+def _assert_chunked_matches_whole(tmp_path, path, file_type, chunk_size):
+    with open(path, "rb") as buf:
+        whole = _pipeline(tmp_path)._validate_chunks(buf, file_type)
+    with open(path, "rb") as buf:
+        chunked = _pipeline(tmp_path, chunk_size=chunk_size)._validate_chunks(buf, file_type)
+
+    assert chunked.summary == whole.summary
+    pd.testing.assert_frame_equal(
+        chunked.normalized_data.drop(columns="sale_id", errors="ignore"),
+        whole.normalized_data.drop(columns="sale_id", errors="ignore"),
+        check_dtype=False,
+    )
+    pd.testing.assert_frame_equal(chunked.quarantined_data, whole.quarantined_data, check_dtype=False)
+    assert [(i.row_index, i.column, i.message) for i in chunked.issues] == [
+        (i.row_index, i.column, i.message) for i in whole.issues
+    ]
+    return chunked
+
+
+def test_first_chunk_blank_column_stays_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(intelligent_upload_pipeline, "pv", None)
+    lots = pd.concat([_lots()] * 14, ignore_index=True).iloc[:40].drop(columns="Actual_Freight_Cost_Per_Unit")
+    lots["PO_Number"] = [f"L{i}" for i in range(40)]
+    lots["Received"] = "2024-07-01"
+    lots["Freight_Cost_Per_Unit"] = [None] * 10 + [1.25] * 30
+    lots_path = tmp_path / "lots.csv"
+    lots.to_csv(lots_path, index=False)
+
+    result = _assert_chunked_matches_whole(tmp_path, lots_path, "lots_data", chunk_size=5)
+
+    assert result.summary["column_mapping"]["freight_cost_per_unit"] == "Freight_Cost_Per_Unit"
+    assert result.normalized_data["freight_cost_per_unit"].tolist() == [0.0] * 10 + [1.25] * 30
+    assert result.summary["warnings"] == 10
+
+    sales = _sales().iloc[:6].copy()
+    sales.loc[:2, "Month"] = None
+    sales_path = tmp_path / "sales.csv"
+    sales.to_csv(sales_path, index=False)
+
+    result = _assert_chunked_matches_whole(tmp_path, sales_path, "sales_data", chunk_size=3)
+
+    assert result.summary["total_rows"] == 6
+    assert result.summary["column_mapping"]["date"] == "Month"
+
+
+def test_column_empty_in_whole_file_is_trimmed_like_a_single_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(intelligent_upload_pipeline, "pv", None)
+    lots = pd.concat([_lots()] * 4, ignore_index=True).drop(columns="Actual_Freight_Cost_Per_Unit")
+    lots["Freight_Cost_Per_Unit"] = None
+    path = tmp_path / "lots.csv"
+    lots.to_csv(path, index=False)
+
+    result = _assert_chunked_matches_whole(tmp_path, path, "lots_data", chunk_size=5)
+
+    assert "freight_cost_per_unit" not in result.summary["column_mapping"]
+
+
+def test_unrecognized_header_quarantines_every_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(intelligent_upload_pipeline, "pv", None)
+    path = tmp_path / "sales.csv"
+    _sales().rename(columns={"Month": "Notes"}).to_csv(path, index=False)
+
+    result = _assert_chunked_matches_whole(tmp_path, path, "sales_data", chunk_size=4)
+
+    assert result.summary["total_rows"] == 18
+    assert result.summary["quarantined_rows"] == 18
+    assert [i.column for i in result.issues] == ["structure"]
+
+
+def test_arrow_reader_matches_pandas_reader(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "sales.csv"
+    path.write_text(
+        "SKU,Units Moved,Month,,SKU\n"
+        "ABC 123,10,Jul-24,,x\n"
+        ",5,7/5/24,,\n"
+        "\n"
+        "DEF-1,N/A,2024-07-31,,\n"
+    )
+    pipeline = _pipeline(tmp_path)
+
+    with open(path, "rb") as buf:
+        arrow_chunks = list(pipeline._read_csv_chunks(buf, 2))
+    monkeypatch.setattr(intelligent_upload_pipeline, "pv", None)
+    with open(path, "rb") as buf:
+        pandas_chunks = list(pipeline._read_csv_chunks(buf, 2))
+
+    assert all(isinstance(dtype, pd.CategoricalDtype) for dtype in arrow_chunks[0].dtypes)
+    pd.testing.assert_frame_equal(pd.concat(arrow_chunks).astype(object), pd.concat(pandas_chunks))
+    assert list(arrow_chunks[0].columns) == ["SKU", "Units Moved", "Month", "Unnamed: 3", "SKU.1"]
+
+
+def test_buffer_upload_matches_file_upload(tmp_path, sales_csv):
+    pipeline = _pipeline(tmp_path)
+    from_file = pipeline.process_upload(sales_csv, materialize="records")
+    with open(sales_csv, "rb") as f:
+        from_buffer = pipeline.process_upload_buffer(
+            io.BytesIO(f.read()), filename="sales.csv", materialize="records"
+        )
+
+    assert from_buffer["filename"] == from_file["filename"] == "sales.csv"
+    assert from_buffer["processing_summary"] == from_file["processing_summary"]
+    assert [row["sku"] for row in from_buffer["normalized_data"]] == [
+        row["sku"] for row in from_file["normalized_data"]
+    ]
+
+
+def test_missing_file_reports_error(tmp_path):
+    results = _pipeline(tmp_path).process_upload(str(tmp_path / "missing.csv"))
+
+    assert results["status"] == "error"
+    assert results["filename"] == "missing.csv"
+
+
+def test_enhanced_upload_handler_reads_upload_in_memory(tmp_path, sales_csv):
+    with open(sales_csv, "rb") as f:
+        upload = SimpleNamespace(file=io.BytesIO(f.read()), filename="sales.csv")
+
+    response = UploadAPIIntegration(_pipeline(tmp_path)).enhanced_upload_handler(
+        upload, tenant_id="t1", file_type="sales"
+    )
+
+    assert response["status"] == "needs_review"
+    assert response["summary"]["processable_rows"] == 9
+
+
+def test_preview_handler_reuses_response_until_batch_is_reviewed(tmp_path, sales_csv):
+    pipeline = _pipeline(tmp_path)
+    integration = UploadAPIIntegration(pipeline)
+    preview = integration.create_preview_endpoint_handler()
+    review = integration.create_quarantine_review_endpoint_handler()
+
+    first = preview(sales_csv, tenant_id="t1")
+    assert preview(sales_csv, tenant_id="t1") is first
+    assert len(pipeline.list_quarantine_batches("t1")) == 1
+    assert first["processing_summary"]["quarantined_rows"] == 9
+
+    batch_id = pipeline.list_quarantine_batches("t1")[0]["batch_id"]
+    record_id = pipeline.quarantine_manager.get_batch(batch_id).records[0].record_id
+    assert review(batch_id, record_id, "reject", "reviewer")["success"]
+
+    assert preview(sales_csv, tenant_id="t1") is not first
+    assert len(pipeline.list_quarantine_batches("t1")) == 2
+
+
+@pytest.mark.parametrize("make_frame,file_type", [(_sales, "sales_data"), (_lots, "lots_data")])
+def test_speculative_validation_matches_sequential(tmp_path, make_frame, file_type):
+    path = tmp_path / "upload.csv"
+    make_frame().to_csv(path, index=False)
+
+    sequential = _pipeline(tmp_path).process_upload(str(path), materialize="records")
+    speculative = _pipeline(tmp_path, speculative_validation=True, chunk_size=1).process_upload(
+        str(path), materialize="records"
+    )
+
+    assert speculative["file_type"] == sequential["file_type"] == file_type
+    assert speculative["processing_summary"] == sequential["processing_summary"]
+    assert speculative["column_mapping"] == sequential["column_mapping"]
+
+
+def test_enhanced_upload_handler_returns_records_when_ready(tmp_path):
+    clean = pd.DataFrame({"SKU": ["A", "B"], "Units Moved": ["10", "5"], "Month": ["2024-07-01", "2024-08-01"]})
+    upload = SimpleNamespace(file=io.BytesIO(clean.to_csv(index=False).encode()), filename="clean.csv")
+    pipeline = _pipeline(tmp_path)
+
+    response = UploadAPIIntegration(pipeline).enhanced_upload_handler(
+        upload, tenant_id="t1", file_type="sales"
+    )
+
+    records = pipeline.process_upload_buffer(
+        io.BytesIO(clean.to_csv(index=False).encode()), materialize="records"
+    )["normalized_data"]
+    assert response["status"] == "ready_for_import"
+    assert [{k: v for k, v in row.items() if k != "sale_id"} for row in response["data"]] == [
+        {k: v for k, v in row.items() if k != "sale_id"} for row in records
+    ]
+    assert type(response["data"][0]["quantity_sold"]) is int
+
+
+def test_sample_issues_use_row_labels_and_messages(tmp_path, sales_csv):
+    results = _pipeline(tmp_path).process_upload(sales_csv)
+
+    assert results["issues"]["sample_issues"][:2] == [
+        "Row 0: SKU normalized from 'ABC 123' to 'ABC-123'",
+        "Row 1: SKU normalized from 'SKU: X1' to 'X1'",
+    ]
+    assert len(results["issues"]["sample_issues"]) == 5
+
+
+def test_preview_report_is_formatted_on_demand(tmp_path, sales_csv, monkeypatch):
+    pipeline = _pipeline(tmp_path)
+    calls = []
+    generate = pipeline.preview_service.generate_preview_report
+    monkeypatch.setattr(
+        pipeline.preview_service, "generate_preview_report",
+        lambda preview: calls.append(preview) or generate(preview),
+    )
+
+    result = pipeline.run_upload_file(sales_csv)
+    assert calls == []
+
+    assert "DATA IMPORT PREVIEW REPORT" in result.preview_report()
+    assert len(calls) == 1
+    assert "DATA IMPORT PREVIEW REPORT" in UploadAPIIntegration(pipeline).create_preview_endpoint_handler()(
+        sales_csv
+    )["preview_report"]
+
+
+def test_process_upload_results_carry_the_report_text(tmp_path, sales_csv):
+    results = _pipeline(tmp_path).process_upload(sales_csv)
+
+    assert "DATA IMPORT PREVIEW REPORT" in results["preview_report"]
+    summary = {key: value for key, value in results.items() if key != "normalized_data"}
+    assert json.loads(json.dumps(summary))["preview_report"] == results["preview_report"]
+
+def test_normalized_data_pickles_columns_out_of_band(tmp_path, sales_csv):
+    normalized = _validate(_pipeline(tmp_path), sales_csv).normalized_data
+
+    payload, buffers = IntelligentUploadPipeline.dumps_normalized_data(normalized)
+    restored = IntelligentUploadPipeline.loads_normalized_data(payload, [b.raw() for b in buffers])
+
+    assert buffers
+    pd.testing.assert_frame_equal(restored, normalized)
+
+
+def test_arrow_batches_pickle_out_of_band(tmp_path, sales_csv):
+    pytest.importorskip("pyarrow")
+    batches = _pipeline(tmp_path).process_upload(sales_csv, materialize="arrow")["normalized_data"]
+
+    payload, buffers = IntelligentUploadPipeline.dumps_normalized_data(batches)
+    restored = IntelligentUploadPipeline.loads_normalized_data(payload, buffers)
+
+    assert buffers
+    assert [batch.equals(original) for batch, original in zip(restored, batches)] == [True]
+
+
+def test_run_upload_returns_flat_result_matching_results_dict(tmp_path, sales_csv):
+    pipeline = _pipeline(tmp_path)
+
+    result = pipeline.run_upload_file(sales_csv, tenant_id="t1", materialize="records")
+    results = pipeline.process_upload(sales_csv, tenant_id="t1", materialize="records")
+
+    assert isinstance(result, UploadResult)
+    assert not hasattr(result, "__dict__")
+    assert result.processing_summary == results["processing_summary"]
+    assert result.issues == results["issues"]
+    assert result.requires_review is results["preview"]["requires_review"]
+    assert result.to_dict().keys() == results.keys()
+    assert result.to_dict()["quarantine"].keys() == results["quarantine"].keys()
+
+
+def test_error_result_keeps_error_layout(tmp_path):
+    result = _pipeline(tmp_path).run_upload_file(str(tmp_path / "missing.csv"))
+
+    assert result.status == "error"
+    assert list(result.to_dict()) == ["status", "error", "filename", "recommendations"]
+
+
+def test_progress_messages_are_logged_only_when_info_is_enabled(tmp_path, sales_csv, caplog):
+    pipeline = _pipeline(tmp_path)
+
+    with caplog.at_level("WARNING", logger=intelligent_upload_pipeline.__name__):
+        pipeline.process_upload(sales_csv)
+    assert caplog.records == []
+
+    with caplog.at_level("INFO", logger=intelligent_upload_pipeline.__name__):
+        pipeline.process_upload(sales_csv)
+    assert [record.getMessage() for record in caplog.records][-1] == (
+        "Processing completed: 9 processable, 9 quarantined"
+    )
+
+
+def test_file_uploads_are_memory_mapped(tmp_path, sales_csv):
+    pipeline = _pipeline(tmp_path)
+
+    with pipeline._mapped_file(sales_csv) as buf:
+        assert buf[:4] == b"SKU,"
+    with pipeline._mapped_file(sales_csv) as buf:
+        mapped = pipeline.run_upload_buffer(buf, materialize="records")
+    assert buf.closed
+
+    unmapped = pipeline.run_upload_buffer(io.BytesIO(open(sales_csv, "rb").read()), materialize="records")
+    assert mapped.processing_summary == unmapped.processing_summary
+    assert mapped.normalized_data == unmapped.normalized_data
+
+
+def test_empty_file_upload_is_read_without_mapping(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"")
+
+    results = _pipeline(tmp_path).process_upload(str(path))
+
+    assert results["status"] == "error"
+    assert results["filename"] == "empty.csv"
+
+
+def test_small_quarantines_are_returned_inline(tmp_path, sales_csv):
+    pipeline = _pipeline(tmp_path)
+
+    quarantine = pipeline.process_upload(sales_csv)["quarantine"]
+
+    assert quarantine["export_path"] is None
+    assert len(quarantine["inline_rows"]) == 9
+    assert quarantine["inline_rows"][0] == {"SKU": None, "Units Moved": "5", "Month": "7/5/24"}
+    assert len(pipeline.quarantine_manager.get_batch(quarantine["batch_id"]).records) == 9
+
+
+def test_large_quarantines_are_exported(tmp_path, sales_csv, monkeypatch):
+    pipeline = _pipeline(tmp_path)
+    monkeypatch.setattr(pipeline, "INLINE_QUARANTINE_ROWS", 9)
+
+    quarantine = pipeline.process_upload(sales_csv)["quarantine"]
+
+    assert quarantine["inline_rows"] is None
+    assert len(pd.read_csv(quarantine["export_path"])) == 9
+
+
+def test_pipelines_share_stateless_services(tmp_path):
+    first, second = _pipeline(tmp_path), _pipeline(tmp_path)
+    other_dir = IntelligentUploadPipeline(str(tmp_path / "elsewhere"))
+
+    assert first.preview_service is second.preview_service is other_dir.preview_service
+    assert first.quarantine_manager is second.quarantine_manager
+    assert other_dir.quarantine_manager is not first.quarantine_manager
+    assert first.validator is not second.validator
+    assert first.detector is not second.detector
+
+
+def test_header_only_upload_has_zero_success_rate(tmp_path):
+    path = tmp_path / "header_only.csv"
+    path.write_text("SKU,Units Moved,Month\n")
+
+    results = _pipeline(tmp_path).process_upload(str(path))
+
+    assert results["status"] == "success"
+    assert results["processing_summary"]["total_rows"] == 0
+    assert results["processing_summary"]["success_rate"] == 0.0
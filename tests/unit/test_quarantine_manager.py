@@ -0,0 +1,49 @@
+"""Tests for quarantine export and import."""
+import pandas as pd
+import pytest
+
+from services import quarantine_manager
+from services.quarantine_manager import QuarantineManager, QuarantineStatus
+from services.upload_validator import UploadValidator
+
+
+def _batch(tmp_path):
+    sales = pd.DataFrame({
+        "sku": ["A", None, "C", "D"],
+        "quantity": ["1", "2", "abc", "4"],
+        "date": ["2024-01-01", "2024-01-02", "2024-01-03", "bad"],
+    })
+    manager = QuarantineManager(str(tmp_path / "quarantine"))
+    batch = manager.quarantine_data(UploadValidator().validate_sales_data(sales), "sales.csv", "sales_data", "t1")
+    return manager, batch
+
+
+@pytest.mark.parametrize("use_arrow", [True, False])
+def test_export_writes_every_quarantined_record(tmp_path, use_arrow):
+    manager, batch = _batch(tmp_path)
+
+    path = manager.export_quarantine_csv(batch.batch_id, use_arrow=use_arrow)
+
+    exported = pd.read_csv(path, dtype=str)
+    assert exported["_quarantine_record_id"].tolist() == [r.record_id for r in batch.records]
+    assert exported["quantity"].tolist() == ["2", "abc", "4"]
+    assert exported["_quarantine_reason"].tolist()[0] == "missing_required_field"
+
+
+def test_arrow_export_matches_pandas_export(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    manager, batch = _batch(tmp_path)
+
+    arrow = pd.read_csv(manager.export_quarantine_csv(batch.batch_id))
+    monkeypatch.setattr(quarantine_manager, "pv", None)
+    plain = pd.read_csv(manager.export_quarantine_csv(batch.batch_id))
+
+    pd.testing.assert_frame_equal(arrow, plain)
+
+
+def test_exported_csv_round_trips_through_import(tmp_path):
+    manager, batch = _batch(tmp_path)
+    path = manager.export_quarantine_csv(batch.batch_id)
+
+    assert manager.import_corrected_csv(batch.batch_id, path, "reviewer") == 3
+    assert all(r.status == QuarantineStatus.FIXED for r in manager.get_batch(batch.batch_id).records)
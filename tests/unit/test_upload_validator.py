@@ -0,0 +1,111 @@
+"""Tests for upload validation and normalization."""
+import numpy as np
+import pandas as pd
+
+from services.upload_validator import (
+    FIELD_CRITICAL,
+    FIELD_OK,
+    FIELD_WARNING,
+    UploadValidator,
+    _quarantine_kernel,
+)
+
+
+def test_sales_issues_are_reported_by_row_then_field():
+    sales = pd.DataFrame({
+        "SKU": ["ABC 123", None, "ABC 123", "G1"],
+        "Units Moved": ["7.5", "abc", "7.5", "3"],
+        "Month": ["Jul-24", "garbage", "Jul-24", "2024-07-31"],
+    })
+
+    result = UploadValidator().validate_sales_data(sales)
+
+    assert [(issue.row_index, issue.column, issue.message) for issue in result.issues] == [
+        (0, "sku", "SKU normalized from 'ABC 123' to 'ABC-123'"),
+        (0, "Units Moved", "Quantity rounded from 7.5 to 7"),
+        (1, "sku", "SKU is empty or null"),
+        (1, "Units Moved", "Cannot parse quantity 'abc' in column 'Units Moved'"),
+        (1, "Month", "Cannot parse date 'garbage' in column 'Month'"),
+        (2, "sku", "SKU normalized from 'ABC 123' to 'ABC-123'"),
+        (2, "Units Moved", "Quantity rounded from 7.5 to 7"),
+    ]
+    assert result.issues[2].original_value is None
+    assert result.normalized_data["sku"].tolist() == ["ABC-123", "ABC-123", "G1"]
+    assert result.normalized_data["quantity_sold"].tolist() == [7, 7, 3]
+    assert result.quarantined_data.index.tolist() == [1]
+
+
+def test_unexpected_errors_quarantine_the_row_and_skip_later_fields():
+    sales = pd.DataFrame({"sku": ["A", "B"], "quantity": ["inf", "2"], "date": ["bad", "2024-01-01"]})
+
+    result = UploadValidator().validate_sales_data(sales)
+
+    assert [(issue.row_index, issue.column) for issue in result.issues] == [(0, "row")]
+    assert result.issues[0].message.startswith("Unexpected error processing row")
+    assert result.normalized_data["sku"].tolist() == ["B"]
+    assert result.quarantined_data.index.tolist() == [0]
+
+
+def test_lots_default_remaining_quantity_and_freight():
+    lots = pd.DataFrame({
+        "lot_id": ["L1", "L2", None],
+        "sku": ["A", "B", "C"],
+        "received_date": ["2024-01-01", "2024-01-02", "2024-01-03"],
+        "original_quantity": [10, 5, 3],
+        "remaining_quantity": [4, np.nan, 3],
+        "unit_price": ["$1,234.50", "2", "3"],
+        "freight_cost_per_unit": [1, None, 0.5],
+    })
+
+    result = UploadValidator().validate_lots_data(lots)
+
+    normalized = result.normalized_data
+    assert normalized["lot_id"].tolist() == ["L1", "L2"]
+    assert normalized["remaining_quantity"].tolist() == [4, 5]
+    assert normalized["unit_price"].tolist() == [1234.5, 2.0]
+    assert normalized["freight_cost_per_unit"].tolist() == [1.0, 0.0]
+    assert result.quarantined_data["lot_id"].isna().tolist() == [True]
+    assert result.summary["warnings"] == 1
+
+
+def test_categorical_columns_validate_like_text_columns():
+    sales = pd.DataFrame({
+        "SKU": ["ABC 123", np.nan, "ABC 123", "G1"],
+        "Units Moved": ["7.5", "abc", "7.5", "3"],
+        "Month": ["Jul-24", "garbage", "Jul-24", "2024-07-31"],
+    })
+
+    text = UploadValidator().validate_sales_data(sales)
+    categorical = UploadValidator().validate_sales_data(sales.astype("category"))
+
+    assert [(i.row_index, i.message) for i in categorical.issues] == [
+        (i.row_index, i.message) for i in text.issues
+    ]
+    pd.testing.assert_frame_equal(
+        categorical.normalized_data.drop(columns="sale_id"),
+        text.normalized_data.drop(columns="sale_id"),
+    )
+    pd.testing.assert_frame_equal(categorical.quarantined_data, text.quarantined_data)
+
+
+def test_quarantine_kernel_flags_rows_with_any_critical_field():
+    status = np.array([
+        [FIELD_OK, FIELD_OK, FIELD_OK],
+        [FIELD_OK, FIELD_WARNING, FIELD_OK],
+        [FIELD_OK, FIELD_WARNING, FIELD_CRITICAL],
+        [FIELD_CRITICAL, FIELD_OK, FIELD_OK],
+    ], dtype=np.int8)
+
+    assert _quarantine_kernel(status).tolist() == [False, False, True, True]
+    assert _quarantine_kernel(np.zeros((0, 3), dtype=np.int8)).tolist() == []
+
+
+def test_issues_df_lists_issues_column_wise():
+    sales = pd.DataFrame({"sku": ["A", None], "quantity": ["1", "2"], "date": ["2024-01-01", "bad"]})
+
+    result = UploadValidator().validate_sales_data(sales)
+
+    assert result.issues_df["row_index"].tolist() == [issue.row_index for issue in result.issues]
+    assert result.issues_df["message"].tolist() == [issue.message for issue in result.issues]
+    assert result.issues_df["severity"].tolist() == ["critical", "critical"]
+    assert UploadValidator().validate_sales_data(sales.iloc[:1]).issues_df.empty